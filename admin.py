@@ -1,9 +1,13 @@
-from flask import Blueprint, render_template, redirect, url_for, request, flash
+from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify, Response
 from flask_login import login_required, current_user
-from models import db, Review, Business, User
-from collections import Counter
+from models import db, Review, Business, User, ReviewDailyRollup
+from sentiment import sentiment_cache, openai_governor
+from review_stats import get_business_stats, get_all_business_stats, top_counters
+from pagination import keyset_paginate, InvalidCursor
+from review_search import search_reviews, search_available
+from review_export import export_reviews, export_filename, parse_filters, InvalidExport, FORMATS
 from sqlalchemy import func
-from datetime import datetime
+from datetime import datetime, date, timedelta
 
 admin = Blueprint('admin', __name__)
 
@@ -14,9 +18,10 @@ def platform_dashboard():
         flash('Access denied.')
         return redirect(url_for('index'))
     
-    # Get platform-wide statistics
+    # Get platform-wide statistics; review numbers come from the per-business aggregates
+    business_stats = get_all_business_stats()
     total_businesses = Business.query.count()
-    total_reviews = Review.query.count()
+    total_reviews = sum(stats.review_count for stats in business_stats.values())
     total_users = User.query.count()
     
     businesses = Business.query.order_by(Business.created_at.desc()).all()
@@ -25,7 +30,24 @@ def platform_dashboard():
                          total_businesses=total_businesses,
                          total_reviews=total_reviews,
                          total_users=total_users,
-                         businesses=businesses)
+                         businesses=businesses,
+                         business_stats=business_stats)
+
+@admin.route('/sentiment-cache')
+@login_required
+def sentiment_cache_stats():
+    if current_user.role != 'platform_admin':
+        return jsonify({'error': 'Access denied.'}), 403
+
+    return jsonify(sentiment_cache.stats())
+
+@admin.route('/openai-governor')
+@login_required
+def openai_governor_stats():
+    if current_user.role != 'platform_admin':
+        return jsonify({'error': 'Access denied.'}), 403
+
+    return jsonify(openai_governor.stats())
 
 @admin.route('/business-dashboard')
 @login_required
@@ -44,57 +66,27 @@ def business_dashboard():
         flash('Business not found.')
         return redirect(url_for('index'))
 
-    reviews = Review.query.filter_by(business_id=current_user.business_id)\
-        .order_by(Review.created_at.desc()).all()
-    
-    total_reviews = len(reviews)
-    
-    # Initialize default values
-    avg_rating = 0
-    new_reviews = 0
-    urgent_reviews = 0
-    sentiment_counts = {'positive': 0, 'neutral': 0, 'negative': 0}
-    common_tags = []
-    rating_distribution = {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
-    source_stats = []
-
-    if total_reviews > 0:
-        # Calculate statistics
-        avg_rating = sum(review.rating for review in reviews) / total_reviews
-        new_reviews = sum(1 for review in reviews if review.status == 'new')
-        urgent_reviews = sum(1 for review in reviews if review.priority == 'urgent')
-        
-        # Calculate sentiment distribution
-        sentiment_counts = {
-            'positive': sum(1 for r in reviews if r.sentiment == 'positive'),
-            'neutral': sum(1 for r in reviews if r.sentiment == 'neutral'),
-            'negative': sum(1 for r in reviews if r.sentiment == 'negative')
-        }
-        
-        # Calculate tag distribution
-        all_tags = []
-        for review in reviews:
-            if review.tags:
-                all_tags.extend(review.tags)
-        common_tags = Counter(all_tags).most_common(10)
-        
-        # Calculate rating distribution
-        rating_distribution = Counter(review.rating for review in reviews)
-        
-        # Calculate source statistics
-        sources = set(review.source for review in reviews if review.source)
-        for source in sources:
-            source_reviews = [r for r in reviews if r.source == source]
-            source_stats.append({
-                'name': source,
-                'count': len(source_reviews),
-                'avg_rating': sum(r.rating for r in source_reviews) / len(source_reviews)
-            })
-        source_stats.sort(key=lambda x: x['count'], reverse=True)
-    
+    # Headline numbers come from the incrementally maintained aggregates
+    stats = get_business_stats(business.id)
+    total_reviews = stats.review_count
+    avg_rating = stats.avg_rating
+    new_reviews = stats.status_new
+    urgent_reviews = stats.priority_urgent
+    sentiment_counts = {
+        'positive': stats.sentiment_positive,
+        'neutral': stats.sentiment_neutral,
+        'negative': stats.sentiment_negative
+    }
+    rating_distribution = {rating: getattr(stats, f'rating_{rating}') for rating in range(1, 6)}
+    common_tags = [(counter.key, counter.count) for counter in top_counters(business.id, 'tag', limit=10)]
+    source_stats = [{
+        'name': counter.key,
+        'count': counter.count,
+        'avg_rating': counter.rating_sum / counter.count
+    } for counter in top_counters(business.id, 'source')]
+
     return render_template('admin/business_dashboard.html',
                          business=business,
-                         reviews=reviews,  # Show all reviews for modal functionality
                          total_reviews=total_reviews,
                          avg_rating=round(avg_rating, 1),
                          new_reviews=new_reviews,
@@ -104,6 +96,249 @@ def business_dashboard():
                          rating_distribution=rating_distribution,
                          source_stats=source_stats)
 
+def rollup_period(day, granularity):
+    """First day of the bucket that a rollup day belongs to."""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+@admin.route('/analytics')
+@login_required
+def analytics():
+    """Review trends for the current business, summed from daily rollups."""
+    if current_user.role != 'business_admin' or not current_user.business_id:
+        return jsonify({'error': 'Access denied. Business admin only.'}), 403
+
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in ('day', 'week', 'month'):
+        return jsonify({'error': 'granularity must be day, week or month'}), 400
+    try:
+        end = date.fromisoformat(request.args['end']) if request.args.get('end') else date.today()
+        start = date.fromisoformat(request.args['start']) if request.args.get('start') else end - timedelta(days=29)
+    except ValueError:
+        return jsonify({'error': 'start and end must be YYYY-MM-DD dates'}), 400
+    if start > end:
+        return jsonify({'error': 'start must not be after end'}), 400
+
+    query = ReviewDailyRollup.query.filter(
+        ReviewDailyRollup.business_id == current_user.business_id,
+        ReviewDailyRollup.day >= start,
+        ReviewDailyRollup.day <= end
+    )
+    source = request.args.get('source')
+    if source:
+        query = query.filter(ReviewDailyRollup.source == ('' if source == 'unknown' else source))
+
+    def empty_bucket():
+        return {'review_count': 0, 'rating_sum': 0, 'sources': {},
+                'sentiment': {'positive': 0, 'neutral': 0, 'negative': 0, 'pending': 0}}
+
+    buckets = {}
+    totals = empty_bucket()
+    for rollup in query.order_by(ReviewDailyRollup.day).all():
+        period = rollup_period(rollup.day, granularity)
+        source_name = rollup.source or 'unknown'
+        for bucket in (buckets.setdefault(period, empty_bucket()), totals):
+            bucket['review_count'] += rollup.review_count
+            bucket['rating_sum'] += rollup.rating_sum
+            bucket['sources'][source_name] = bucket['sources'].get(source_name, 0) + rollup.review_count
+            for sentiment in bucket['sentiment']:
+                bucket['sentiment'][sentiment] += getattr(rollup, f'sentiment_{sentiment}')
+
+    def serialize(bucket):
+        count = bucket.pop('review_count')
+        rating_sum = bucket.pop('rating_sum')
+        return dict(bucket, review_count=count,
+                    avg_rating=round(rating_sum / count, 2) if count else None)
+
+    return jsonify({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'granularity': granularity,
+        'buckets': [dict(serialize(bucket), period=period.isoformat())
+                    for period, bucket in sorted(buckets.items())],
+        'totals': serialize(totals)
+    })
+
+REVIEW_SORT_COLUMNS = {
+    'created_at': Review.created_at,
+    'rating': Review.rating,
+    'status': Review.status,
+    'priority': Review.priority,
+    'sentiment': Review.sentiment
+}
+REVIEW_FILTERS = ('status', 'priority', 'sentiment', 'source')
+MAX_PER_PAGE = 100
+
+def serialize_review(review, detail=False):
+    """JSON for a review; the list view gets an excerpt, the detail view everything."""
+    text = review.text or ''
+    data = {
+        'id': review.id,
+        'created_at': review.created_at.isoformat() if review.created_at else None,
+        'customer_name': review.customer_name,
+        'rating': review.rating,
+        'sentiment': review.sentiment,
+        'source': review.source,
+        'tags': review.tags or [],
+        'priority': review.priority,
+        'status': review.status,
+        'has_contact_info': bool(review.contact_info)
+    }
+    if detail:
+        data.update({
+            'text': text,
+            'improvement_feedback': review.improvement_feedback,
+            'contact_info': review.contact_info,
+            'last_updated': review.last_updated.isoformat() if review.last_updated else None
+        })
+    else:
+        data['excerpt'] = text[:100] + ('...' if len(text) > 100 else '')
+    return data
+
+@admin.route('/api/reviews')
+@login_required
+def api_reviews():
+    """One page of the current business's reviews, sorted and filtered.
+
+    Sorted by created_at (the default), pages are addressed by the after and
+    before cursors of the previous response; other sorts use page numbers.
+    page is echoed back for display either way.
+    """
+    if current_user.role != 'business_admin' or not current_user.business_id:
+        return jsonify({'error': 'Access denied. Business admin only.'}), 403
+
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 10, type=int), 1), MAX_PER_PAGE)
+    sort = request.args.get('sort', 'created_at')
+    if sort not in REVIEW_SORT_COLUMNS:
+        return jsonify({'error': f"sort must be one of {', '.join(REVIEW_SORT_COLUMNS)}"}), 400
+    descending = request.args.get('order', 'desc') != 'asc'
+
+    query = Review.query.filter_by(business_id=current_user.business_id)
+    for name in REVIEW_FILTERS:
+        value = request.args.get(name)
+        if value and value != 'all':
+            query = query.filter(getattr(Review, name) == value)
+    rating = request.args.get('rating', type=int)
+    if rating:
+        query = query.filter(Review.rating == rating)
+
+    if sort == 'created_at':
+        # The default order seeks through the (business_id, created_at, id) index with cursors
+        try:
+            reviews = keyset_paginate(query, per_page, after=request.args.get('after'),
+                                      before=request.args.get('before'), descending=descending)
+        except InvalidCursor:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        return jsonify({
+            'page': page,
+            'per_page': per_page,
+            'has_prev': reviews.has_prev,
+            'has_next': reviews.has_next,
+            'prev_cursor': reviews.prev_cursor,
+            'next_cursor': reviews.next_cursor,
+            'reviews': [serialize_review(review) for review in reviews.items]
+        })
+
+    column = REVIEW_SORT_COLUMNS[sort]
+    order = [column.desc(), Review.id.desc()] if descending else [column.asc(), Review.id.asc()]
+    # Fetch one extra row to know whether there is a next page without a COUNT(*)
+    rows = query.order_by(*order).offset((page - 1) * per_page).limit(per_page + 1).all()
+
+    return jsonify({
+        'page': page,
+        'per_page': per_page,
+        'has_prev': page > 1,
+        'has_next': len(rows) > per_page,
+        'reviews': [serialize_review(review) for review in rows[:per_page]]
+    })
+
+@admin.route('/api/reviews/<int:review_id>')
+@login_required
+def api_review_detail(review_id):
+    if current_user.role != 'business_admin' or not current_user.business_id:
+        return jsonify({'error': 'Access denied. Business admin only.'}), 403
+
+    review = Review.query.filter_by(id=review_id, business_id=current_user.business_id).first()
+    if review is None:
+        return jsonify({'error': 'Review not found'}), 404
+    return jsonify(serialize_review(review, detail=True))
+
+@admin.route('/api/reviews/search')
+@login_required
+def api_search_reviews():
+    """Full-text search over the current business's reviews, best match first."""
+    if current_user.role != 'business_admin' or not current_user.business_id:
+        return jsonify({'error': 'Access denied. Business admin only.'}), 403
+    if not search_available(db.session.connection()):
+        return jsonify({'error': 'Search is only available with SQLite.'}), 501
+
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'q is required'}), 400
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 10, type=int), 1), MAX_PER_PAGE)
+    filters = {name: request.args[name] for name in REVIEW_FILTERS
+               if request.args.get(name) and request.args[name] != 'all'}
+
+    results = search_reviews(current_user.business_id, query, filters,
+                             rating=request.args.get('rating', type=int),
+                             limit=per_page + 1, offset=(page - 1) * per_page)
+
+    reviews = []
+    for review, rank, highlights in results[:per_page]:
+        data = serialize_review(review)
+        data['rank'] = rank
+        data['highlights'] = highlights
+        reviews.append(data)
+    return jsonify({
+        'q': query,
+        'page': page,
+        'per_page': per_page,
+        'has_prev': page > 1,
+        'has_next': len(results) > per_page,
+        'reviews': reviews
+    })
+
+@admin.route('/api/reviews/export')
+@login_required
+def api_export_reviews():
+    """Stream the current business's reviews as csv, ndjson or columnar."""
+    if current_user.role != 'business_admin' or not current_user.business_id:
+        return jsonify({'error': 'Access denied. Business admin only.'}), 403
+
+    format = request.args.get('format', 'csv')
+    if format not in FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(FORMATS)}"}), 400
+    try:
+        filters = parse_filters(request.args)
+    except InvalidExport as e:
+        return jsonify({'error': str(e)}), 400
+
+    # The generator reads through its own connection, so it outlives this request's session
+    pieces = export_reviews(db.engine, current_user.business_id, format, filters)
+    content_type = FORMATS[format][0]
+    filename = export_filename(current_user.business_id, format)
+    return Response(pieces, content_type=content_type, headers={
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'X-Accel-Buffering': 'no'  # let proxies pass chunks on as they are produced
+    })
+
+def approximate_review_count(stats, status_filter, rating_filter):
+    """Estimate the size of a filtered listing from cached statistics instead of COUNT(*)."""
+    total = stats.review_count
+    if not total:
+        return 0
+    fraction = 1.0
+    if status_filter != 'all':
+        fraction *= getattr(stats, f'status_{status_filter}', 0) / total
+    if rating_filter != 'all':
+        fraction *= getattr(stats, f'rating_{rating_filter}', 0) / total
+    return round(total * fraction)
+
 @admin.route('/business-reviews')
 @login_required
 def business_reviews():
@@ -115,15 +350,33 @@ def business_reviews():
         flash('No business associated with this account.')
         return redirect(url_for('index'))
     
-    page = request.args.get('page', 1, type=int)
     per_page = 10
-    
-    reviews = Review.query.filter_by(business_id=current_user.business_id)\
-        .order_by(Review.created_at.desc())\
-        .paginate(page=page, per_page=per_page)
-    
+    status_filter = request.args.get('status', 'all')
+    rating_filter = request.args.get('rating', 'all')
+    if status_filter not in ('new', 'read', 'responded'):
+        status_filter = 'all'
+    if rating_filter not in ('1', '2', '3', '4', '5'):
+        rating_filter = 'all'
+
+    query = Review.query.filter_by(business_id=current_user.business_id)
+    if status_filter != 'all':
+        query = query.filter(Review.status == status_filter)
+    if rating_filter != 'all':
+        query = query.filter(Review.rating == int(rating_filter))
+
+    try:
+        reviews = keyset_paginate(query, per_page,
+                                  after=request.args.get('after'),
+                                  before=request.args.get('before'))
+    except InvalidCursor:
+        return redirect(url_for('admin.business_reviews', status=status_filter, rating=rating_filter))
+
     return render_template('admin/reviews.html',
-                         reviews=reviews)
+                         reviews=reviews,
+                         approximate_total=approximate_review_count(
+                             get_business_stats(current_user.business_id), status_filter, rating_filter),
+                         status_filter=status_filter,
+                         rating_filter=rating_filter)
 
 @admin.route('/respond-to-review/<int:review_id>', methods=['POST'])
 @login_required
@@ -1,13 +1,23 @@
-from flask import Flask, render_template, request, redirect, url_for, jsonify, session
+from flask import Flask, render_template, request, redirect, url_for, jsonify, session, g, abort
 import os
 from datetime import datetime
 from dotenv import load_dotenv
 from functools import wraps
-import time
 from flask_login import LoginManager, current_user
 from models import db, User, Business, Review
+import database
+import metrics
 from auth import auth as auth_blueprint
 from admin import admin as admin_blueprint
+from sentiment import PENDING_SENTIMENT, local_sentiment_answer, provisional_sentiment, review_priority
+from sentiment_worker import SentimentWorkerPool, enqueue_sentiment_job
+from group_commit import GroupCommitter
+import review_stats  # registers the listeners that keep BusinessStats current
+from tenants import tenant_cache
+from user_cache import load_user
+from rate_limit import limiter
+from review_tokens import issue_review_token, read_review_token, InvalidReviewToken
+from sqlalchemy import update
 import openai
 
 # Load environment variables from .env file
@@ -19,88 +29,52 @@ app.secret_key = os.getenv('FLASK_SECRET_KEY', os.urandom(24))
 # Initialize OpenAI client
 openai.api_key = os.getenv('OPENAI_API_KEY')
 
-# Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///reviews.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
+# Database configuration (DATABASE_URL, pool and SQLite settings; see database.py)
+database.init_app(app, db)
 
 # Initialize Flask-Login
 login_manager = LoginManager()
 login_manager.login_view = 'auth.login'
 login_manager.init_app(app)
 
-@login_manager.user_loader
-def load_user(user_id):
-    return User.query.get(int(user_id))
+# Users are served from an in-process cache rather than queried per request
+login_manager.user_loader(load_user)
 
 # Register blueprints
 app.register_blueprint(auth_blueprint, url_prefix='/auth')
 app.register_blueprint(admin_blueprint, url_prefix='/admin')
 
-# Simple in-memory rate limiter with cleanup
-class RateLimiter:
-    def __init__(self, max_requests=5, time_window=60):
-        self.max_requests = max_requests
-        self.time_window = time_window
-        self.requests = {}
-        self.last_cleanup = time.time()
-        self.cleanup_interval = 300  # Cleanup every 5 minutes
+# Sentiment is classified in the background from the SentimentJob outbox
+sentiment_workers = SentimentWorkerPool(app)
 
-    def cleanup_old_requests(self):
-        """Remove old requests from memory"""
-        current_time = time.time()
-        if current_time - self.last_cleanup > self.cleanup_interval:
-            cutoff_time = current_time - self.time_window
-            self.requests = {
-                ip: [t for t in times if t > cutoff_time]
-                for ip, times in self.requests.items()
-            }
-            # Remove empty IP entries
-            self.requests = {
-                ip: times for ip, times in self.requests.items()
-                if times
-            }
-            self.last_cleanup = current_time
+# Optional batching of review inserts under bursts (GROUP_COMMIT=1)
+group_committer = GroupCommitter(app)
 
-    def is_allowed(self, ip):
-        current_time = time.time()
-        self.cleanup_old_requests()
-        
-        if ip not in self.requests:
-            self.requests[ip] = []
-        
-        # Clean old requests for this IP
-        self.requests[ip] = [req_time for req_time in self.requests[ip] 
-                           if current_time - req_time < self.time_window]
-        
-        if len(self.requests[ip]) >= self.max_requests:
-            return False
-        
-        self.requests[ip].append(current_time)
-        return True
+# Request, SQL and OpenAI metrics for Prometheus at /metrics (see metrics.py)
+metrics.init_app(app, group_committer)
 
-rate_limiter = RateLimiter()
+# Every public page is served at /b/<slug>/... for each business, and unprefixed
+# for the default business. The tenant comes from the in-process cache.
+@app.url_value_preprocessor
+def pull_tenant(endpoint, values):
+    if values and 'slug' in values:
+        g.tenant = tenant_cache.get(values.pop('slug'))
+        if g.tenant is None:
+            abort(404)
 
-# Rate limiting for OpenAI API
-OPENAI_RATE_LIMIT = {}
-MAX_REQUESTS_PER_MINUTE = 50  # Adjust based on your OpenAI plan
-RATE_LIMIT_WINDOW = 60  # seconds
+@app.url_defaults
+def add_tenant_slug(endpoint, values):
+    tenant = g.get('tenant')
+    if tenant and 'slug' not in values and app.url_map.is_endpoint_expecting(endpoint, 'slug'):
+        values['slug'] = tenant.slug
 
-def check_rate_limit():
-    """Check if we're within OpenAI API rate limits."""
-    current_time = time.time()
-    # Clean up old entries
-    for timestamp in list(OPENAI_RATE_LIMIT.keys()):
-        if current_time - timestamp > RATE_LIMIT_WINDOW:
-            del OPENAI_RATE_LIMIT[timestamp]
-    
-    # Check if we're within limits
-    if len(OPENAI_RATE_LIMIT) >= MAX_REQUESTS_PER_MINUTE:
-        return False
-    
-    # Add current request
-    OPENAI_RATE_LIMIT[current_time] = True
-    return True
+def current_tenant():
+    """The business whose public pages this request is for."""
+    return g.get('tenant') or tenant_cache.default()
+
+@app.context_processor
+def inject_tenant():
+    return {'tenant': current_tenant()}
 
 def validate_review_data(f):
     @wraps(f)
@@ -122,99 +96,12 @@ def validate_review_data(f):
             dangerous_patterns = ['<script>', 'javascript:', 'onload=', 'onerror=']
             if any(pattern in feedback.lower() for pattern in dangerous_patterns):
                 return jsonify({'error': 'Invalid feedback content'}), 400
-            
-            # Rate limiting
-            if not rate_limiter.is_allowed(request.remote_addr):
-                return jsonify({'error': 'Too many requests. Please try again later.'}), 429
         
         return f(*args, **kwargs)
     return decorated_function
 
-def determine_sentiment(rating, feedback):
-    """Determine sentiment using OpenAI, with robust error handling and rate limiting."""
-    if not os.getenv('OPENAI_API_KEY'):
-        print("ERROR: OpenAI API key not found!")
-        raise ValueError("OpenAI API key is required for sentiment analysis")
-
-    if not check_rate_limit():
-        print("WARNING: OpenAI API rate limit reached, waiting...")
-        time.sleep(5)  # Wait 5 seconds before retrying
-        if not check_rate_limit():
-            raise Exception("Rate limit exceeded, please try again later")
-
-    try:
-        max_retries = 3
-        retry_delay = 2  # seconds
-        
-        for attempt in range(max_retries):
-            try:
-                response = openai.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "You are a sentiment analysis expert. Analyze the following review and respond with ONLY one word: 'positive', 'neutral', or 'negative'."
-                        },
-                        {
-                            "role": "user",
-                            "content": feedback
-                        }
-                    ],
-                    temperature=0,
-                    max_tokens=1,
-                    timeout=10  # 10 second timeout
-                )
-                
-                sentiment = response.choices[0].message.content.strip().lower()
-                
-                # Validate sentiment value
-                if sentiment not in ['positive', 'negative', 'neutral']:
-                    print(f"WARNING: Invalid sentiment '{sentiment}' from OpenAI, retrying...")
-                    raise ValueError("Invalid sentiment value")
-                
-                return sentiment
-                
-            except openai.RateLimitError:
-                print(f"WARNING: OpenAI rate limit hit, attempt {attempt + 1}/{max_retries}")
-                if attempt < max_retries - 1:
-                    time.sleep(retry_delay * (attempt + 1))  # Exponential backoff
-                else:
-                    raise
-                    
-            except openai.APITimeoutError:
-                print(f"WARNING: OpenAI API timeout, attempt {attempt + 1}/{max_retries}")
-                if attempt < max_retries - 1:
-                    time.sleep(retry_delay)
-                else:
-                    raise
-                    
-            except ValueError as e:
-                print(f"WARNING: OpenAI returned invalid data, attempt {attempt + 1}/{max_retries}")
-                if attempt < max_retries - 1:
-                    time.sleep(retry_delay)
-                else:
-                    raise
-                
-    except Exception as e:
-        print(f"ERROR in OpenAI sentiment analysis: {str(e)}")
-        # Log the error with full context
-        error_context = {
-            'error_type': type(e).__name__,
-            'error_message': str(e),
-            'rating': rating,
-            'feedback_length': len(feedback),
-            'timestamp': datetime.now().isoformat()
-        }
-        print(f"Error context: {error_context}")
-        
-        # Fallback to rating-based sentiment only if API completely fails
-        if rating >= 4:
-            return 'positive'
-        elif rating <= 2:
-            return 'negative'
-        return 'neutral'
-
 @app.route('/')
+@app.route('/b/<slug>/')
 def index():
     if current_user.is_authenticated:
         if current_user.role == 'platform_admin':
@@ -223,30 +110,50 @@ def index():
     return render_template('index.html')
 
 @app.route('/submit_review', methods=['POST'])
+@app.route('/b/<slug>/submit_review', methods=['POST'])
 @validate_review_data
+@limiter.limit('5/minute')
 def submit_review():
     data = request.get_json()
     rating = int(data.get('rating', 0))
     feedback = data.get('feedback', '').strip()
     
-    # Get sentiment from OpenAI
-    sentiment = determine_sentiment(rating, feedback)
+    # A confident local answer is final; otherwise route on a provisional answer
+    # and let the workers fill in the OpenAI result
+    final_sentiment = local_sentiment_answer(feedback)
+    sentiment = final_sentiment or provisional_sentiment(rating, feedback)
 
+    review_token = None
     try:
-        # Save directly to database
-        business = Business.query.first()
-        if business:
-            db_review = Review(
+        tenant = current_tenant()
+        if tenant:
+            values = dict(
                 rating=rating,
                 text=feedback,
-                sentiment=sentiment,
-                business_id=business.id,
+                sentiment=final_sentiment or PENDING_SENTIMENT,
+                business_id=tenant.id,
                 created_at=datetime.now(),
                 status='new',
-                priority='high' if rating <= 2 else 'normal'
+                priority=review_priority(rating, sentiment),
+                tags=tenant.tagger.tag(feedback, rating)
             )
-            db.session.add(db_review)
-            db.session.commit()
+            if group_committer.enabled:
+                # Committed together with other requests' reviews in one transaction
+                review_id = group_committer.submit(values, classify=final_sentiment is None)
+            else:
+                # Save directly to database, together with its sentiment job
+                db_review = Review(**values)
+                db.session.add(db_review)
+                if final_sentiment is None:
+                    enqueue_sentiment_job(db_review)
+                db.session.commit()
+                review_id = db_review.id
+            if final_sentiment is None:
+                sentiment_workers.ensure_started()
+                sentiment_workers.notify()
+            # Follow-up feedback and contact details are attached to this review by id
+            review_token = issue_review_token(review_id, tenant.id)
+            session['review_token'] = review_token
     except Exception as e:
         print(f"Error saving to database: {e}")
         return jsonify({'error': 'Failed to save review'}), 500
@@ -255,45 +162,64 @@ def submit_review():
     if rating >= 4:  # Only 4 and 5 star reviews can potentially go to share
         if sentiment == 'positive':
             return jsonify({
-                'redirect': url_for('share')
+                'redirect': url_for('share'),
+                'review_token': review_token
             })
         else:
             # Even high-star reviews with negative sentiment go to feedback
             session['initial_feedback'] = feedback
             return jsonify({
-                'redirect': url_for('feedback')
+                'redirect': url_for('feedback'),
+                'review_token': review_token
             })
     else:
         # For 3 stars or lower, always go to feedback regardless of sentiment
         session['initial_feedback'] = feedback
         return jsonify({
-            'redirect': url_for('feedback')
+            'redirect': url_for('feedback'),
+            'review_token': review_token
         })
 
+def update_submitted_review(data, **values):
+    """Update the review named by the request's review token in one statement by primary key.
+
+    The token comes from the JSON body or, for the web flow, the session.
+    Returns False if the token is missing, expired or does not match a review.
+    """
+    try:
+        review_id, business_id = read_review_token(data.get('review_token') or session.get('review_token'))
+    except InvalidReviewToken as e:
+        print(f"Rejected follow-up without a valid review token: {e}")
+        return False
+    result = db.session.execute(
+        update(Review)
+        .where(Review.id == review_id, Review.business_id == business_id)
+        .values(last_updated=datetime.utcnow(), **values)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
 @app.route('/share')
+@app.route('/b/<slug>/share')
 def share():
     return render_template('share.html')
 
 @app.route('/thanks')
+@app.route('/b/<slug>/thanks')
 def thanks():
     return render_template('thanks.html')
 
 @app.route('/feedback', methods=['GET', 'POST'])
+@app.route('/b/<slug>/feedback', methods=['GET', 'POST'])
+@limiter.limit('10/minute')
 def feedback():
     if request.method == 'POST':
         data = request.get_json()
         feedback = data.get('feedback', '').strip()
-        improvement_areas = data.get('areas', [])
         
         try:
-            # Update the last review with improvement feedback
-            business = Business.query.first()
-            if business:
-                db_review = Review.query.filter_by(business_id=business.id).order_by(Review.created_at.desc()).first()
-                if db_review:
-                    db_review.improvement_feedback = feedback
-                    db_review.improvement_areas = improvement_areas
-                    db.session.commit()
+            # Update the review this visitor submitted
+            update_submitted_review(data, improvement_feedback=feedback)
         except Exception as e:
             print(f"Error storing feedback: {e}")
         
@@ -305,6 +231,8 @@ def feedback():
                          initial_feedback=session.get('initial_feedback', ''))
 
 @app.route('/feedback/contact', methods=['GET', 'POST'])
+@app.route('/b/<slug>/feedback/contact', methods=['GET', 'POST'])
+@limiter.limit('10/minute')
 def feedback_contact():
     if request.method == 'POST':
         data = request.get_json()
@@ -316,17 +244,15 @@ def feedback_contact():
         }
         
         try:
-            # Update the last review with contact information
-            business = Business.query.first()
-            if business:
-                db_review = Review.query.filter_by(business_id=business.id).order_by(Review.created_at.desc()).first()
-                if db_review:
-                    db_review.contact_info = contact_info
-                    db.session.commit()
-                
+            # Update the review this visitor submitted
+            if not update_submitted_review(data, contact_info=contact_info):
                 return jsonify({
-                    'redirect': url_for('thank_you')
-                })
+                    'error': 'Your session has expired. Please submit your review again.'
+                }), 400
+            session.pop('review_token', None)
+            return jsonify({
+                'redirect': url_for('thank_you')
+            })
         except Exception as e:
             print(f"Error storing contact info: {e}")
             return jsonify({
@@ -336,10 +262,12 @@ def feedback_contact():
     return render_template('feedback_contact.html')
 
 @app.route('/thank-you')
+@app.route('/b/<slug>/thank-you')
 def thank_you():
     return render_template('thank_you.html')
 
 @app.route('/goodbye')
+@app.route('/b/<slug>/goodbye')
 def goodbye():
     return render_template('goodbye.html')
 
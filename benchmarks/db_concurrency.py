@@ -0,0 +1,141 @@
+"""Concurrent read/write throughput of the database settings in database.py.
+
+Writer processes submit reviews through the ORM, one transaction each, with
+the stats listeners and search triggers the app runs. Reader processes
+meanwhile load the dashboard's review page and stats. Every setting runs
+against a fresh database file. The report shows commits and reads per
+second, the slowest commit, and how many operations failed with
+"database is locked".
+
+Usage: python benchmarks/db_concurrency.py [--writers N] [--readers N] [--seconds S]
+                                           [--postgres postgresql://user@localhost/reviews_bench]
+
+The PostgreSQL run drops and recreates every table of the app in the
+database it is given, so point it at a scratch database. It needs the
+driver from requirements-postgres.txt.
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import multiprocessing
+import tempfile
+import time
+from datetime import datetime
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from models import db, Business, Review, BusinessStats
+import review_stats  # registers the listeners that keep BusinessStats current
+import review_search  # registers the FTS triggers on SQLite
+from database import engine_options, normalize_url, set_sqlite_pragmas, sqlite_pragmas
+
+SEED_REVIEWS = 5000
+
+def sqlite_settings():
+    """(name, pragmas, engine options) for each SQLite configuration compared."""
+    tuned = sqlite_pragmas()
+    return [
+        # What the app ran with before: pysqlite defaults (5s lock wait), rollback journal
+        ('sqlite default', {}, {}),
+        ('sqlite wal', {'journal_mode': 'WAL', 'busy_timeout': tuned['busy_timeout']}, None),
+        ('sqlite wal + pragmas', tuned, None)
+    ]
+
+def make_engine(url, pragmas, options):
+    engine = create_engine(url, **(engine_options(url) if options is None else options))
+    if pragmas:
+        set_sqlite_pragmas(engine, pragmas)
+    return engine
+
+def seed(engine):
+    db.metadata.drop_all(engine)
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        business_id = connection.execute(insert(Business).values(name='Bench', slug='bench')).inserted_primary_key[0]
+        connection.execute(insert(Review), [
+            {'business_id': business_id, 'rating': i % 5 + 1, 'text': f'Seed review {i} about the staff and wait',
+             'sentiment': 'positive', 'status': 'new', 'created_at': datetime(2026, 1, 1, i % 24), 'tags': []}
+            for i in range(SEED_REVIEWS)
+        ])
+        review_stats.rebuild_business_stats(connection, business_id)
+    return business_id
+
+def writer(url, pragmas, options, business_id, number, deadline, results):
+    engine = make_engine(url, pragmas, options)
+    totals = {'writes': 0, 'write_errors': 0, 'slowest_write': 0.0}
+    i = 0
+    while time.time() < deadline:
+        started = time.perf_counter()
+        try:
+            with Session(engine) as session:
+                session.add(Review(business_id=business_id, rating=i % 5 + 1, sentiment='pending',
+                                   text=f'Writer {number} review {i}: friendly staff, long wait',
+                                   status='new', created_at=datetime.now(), tags=['staff', 'timing']))
+                session.commit()
+            totals['writes'] += 1
+            totals['slowest_write'] = max(totals['slowest_write'], time.perf_counter() - started)
+        except OperationalError:
+            totals['write_errors'] += 1
+        i += 1
+    results.put(totals)
+
+def reader(url, pragmas, options, business_id, deadline, results):
+    engine = make_engine(url, pragmas, options)
+    totals = {'reads': 0, 'read_errors': 0}
+    while time.time() < deadline:
+        try:
+            with Session(engine) as session:
+                session.execute(
+                    select(Review).where(Review.business_id == business_id)
+                    .order_by(Review.created_at.desc(), Review.id.desc()).limit(11)
+                ).scalars().all()
+                session.get(BusinessStats, business_id)
+            totals['reads'] += 1
+        except OperationalError:
+            totals['read_errors'] += 1
+    results.put(totals)
+
+def run_setting(name, url, pragmas, options, writers, readers, seconds):
+    """One process per writer and reader, like separate app workers."""
+    engine = make_engine(url, pragmas, options)
+    business_id = seed(engine)
+    engine.dispose()
+
+    results = multiprocessing.Queue()
+    deadline = time.time() + 1 + seconds  # time for the processes to start
+    processes = [multiprocessing.Process(target=writer, args=(url, pragmas, options, business_id, n, deadline, results))
+                 for n in range(writers)]
+    processes += [multiprocessing.Process(target=reader, args=(url, pragmas, options, business_id, deadline, results))
+                  for _ in range(readers)]
+    for process in processes:
+        process.start()
+    totals = {'writes': 0, 'reads': 0, 'write_errors': 0, 'read_errors': 0, 'slowest_write': 0.0}
+    for _ in processes:
+        for key, value in results.get().items():
+            totals[key] = max(totals[key], value) if key == 'slowest_write' else totals[key] + value
+    for process in processes:
+        process.join()
+
+    print(f"{name:<22} {totals['writes'] / seconds:>9,.0f} {totals['reads'] / seconds:>9,.0f} "
+          f"{totals['slowest_write'] * 1000:>11,.0f} {totals['write_errors']:>8} {totals['read_errors']:>8}")
+
+def run(writers, readers, seconds, postgres_url=None):
+    print(f"{writers} writers, {readers} readers, {seconds}s per setting\n")
+    print(f"{'setting':<22} {'writes/s':>9} {'reads/s':>9} {'max write ms':>11} {'w locked':>8} {'r locked':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for number, (name, pragmas, options) in enumerate(sqlite_settings()):
+            url = f"sqlite:///{os.path.join(directory, f'bench{number}.db')}"
+            run_setting(name, url, pragmas, options, writers, readers, seconds)
+    if postgres_url:
+        run_setting('postgresql', normalize_url(postgres_url), None, None, writers, readers, seconds)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--postgres', help='also run against this PostgreSQL URL (its tables are recreated)')
+    args = parser.parse_args()
+    run(args.writers, args.readers, args.seconds, args.postgres)
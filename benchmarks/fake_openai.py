@@ -0,0 +1,160 @@
+"""A local stand-in for the OpenAI chat completions API.
+
+Answers POST /v1/chat/completions the way sentiment.py expects, with one
+sentiment word for a single review or a JSON object for a numbered batch.
+Labels are chosen deterministically from the review text. Latency, the
+share of 500 errors and rate limiting are configurable. Beyond
+--requests-per-minute, and for a random share of --rate-limit-rate of the
+requests, it answers 429 with Retry-After as OpenAI does. Point the app at
+it with OPENAI_BASE_URL=http://127.0.0.1:PORT/v1 and any OPENAI_API_KEY.
+
+Usage: python benchmarks/fake_openai.py [--port 8099] [--latency-ms 300] [--jitter-ms 100]
+                                        [--error-rate 0.01] [--rate-limit-rate 0] [--requests-per-minute 0]
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+SENTIMENTS = ('positive', 'neutral', 'negative')
+NEGATIVE_WORDS = ('bad', 'rude', 'wait', 'slow', 'pain', 'dirty', 'expensive', 'never', 'worst', 'not')
+POSITIVE_WORDS = ('great', 'friendly', 'excellent', 'love', 'best', 'clean', 'gentle', 'recommend', 'thank')
+NUMBERED_RE = re.compile(r'^(\d+)\. (.*)$', re.MULTILINE)
+
+def label(text):
+    """A stable sentiment for text: by keyword, else by its hash."""
+    words = text.lower()
+    score = sum(word in words for word in POSITIVE_WORDS) - sum(word in words for word in NEGATIVE_WORDS)
+    if score:
+        return 'positive' if score > 0 else 'negative'
+    return SENTIMENTS[int(hashlib.md5(text.encode()).hexdigest(), 16) % 3]
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, latency=0.3, jitter=0.1, error_rate=0.0, rate_limit_rate=0.0,
+                 requests_per_minute=0, seed=0):
+        super().__init__(address, FakeOpenAIHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.requests_per_minute = requests_per_minute
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.recent = deque()  # accepted request times in the last minute
+        self.counts = {'requests': 0, 'completed': 0, 'rate_limited': 0, 'errors': 0, 'tokens': 0}
+
+    @property
+    def base_url(self):
+        return f'http://{self.server_address[0]}:{self.server_address[1]}/v1'
+
+    def decide(self):
+        """'ok', 'error' or ('rate_limited', retry after seconds) for the next request."""
+        now = time.monotonic()
+        with self.lock:
+            self.counts['requests'] += 1
+            while self.recent and now - self.recent[0] >= 60:
+                self.recent.popleft()
+            if self.requests_per_minute and len(self.recent) >= self.requests_per_minute:
+                self.counts['rate_limited'] += 1
+                return 'rate_limited', max(1, round(60 - (now - self.recent[0])))
+            if self.random.random() < self.rate_limit_rate:
+                self.counts['rate_limited'] += 1
+                return 'rate_limited', 1
+            if self.random.random() < self.error_rate:
+                self.counts['errors'] += 1
+                return 'error', None
+            self.recent.append(now)
+            delay = max(0.0, self.random.gauss(self.latency, self.jitter)) if self.jitter else self.latency
+            return 'ok', delay
+
+    def record(self, tokens):
+        with self.lock:
+            self.counts['completed'] += 1
+            self.counts['tokens'] += tokens
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counts)
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body, headers=()):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self.send_json(404, {'error': {'message': f'Unknown path {self.path}', 'type': 'invalid_request_error'}})
+            return
+
+        outcome, value = self.server.decide()
+        if outcome == 'rate_limited':
+            self.send_json(429, {'error': {'message': 'Rate limit reached', 'type': 'requests',
+                                           'code': 'rate_limit_exceeded'}},
+                           headers=[('Retry-After', str(value))])
+            return
+        if outcome == 'error':
+            self.send_json(500, {'error': {'message': 'The server had an error', 'type': 'server_error'}})
+            return
+        time.sleep(value)
+
+        prompt = next((m['content'] for m in body.get('messages', []) if m.get('role') == 'user'), '')
+        numbered = NUMBERED_RE.findall(prompt)
+        if numbered and body.get('max_tokens', 1) > 1:
+            content = json.dumps({number: label(text) for number, text in numbered})
+        else:
+            content = label(prompt)
+        prompt_tokens = sum(len(m.get('content', '')) for m in body.get('messages', [])) // 4 + 1
+        completion_tokens = len(content) // 4 + 1
+        self.server.record(prompt_tokens + completion_tokens)
+        self.send_json(200, {
+            'id': f'chatcmpl-fake{self.server.counts["completed"]}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'gpt-3.5-turbo'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                      'total_tokens': prompt_tokens + completion_tokens}
+        })
+
+def add_arguments(parser):
+    parser.add_argument('--latency-ms', type=float, default=300, help='mean OpenAI response time')
+    parser.add_argument('--jitter-ms', type=float, default=100, help='standard deviation of the response time')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests answered with a 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='share of requests answered with a 429')
+    parser.add_argument('--requests-per-minute', type=int, default=0, help='answer 429 above this rate (0: no limit)')
+
+def server_from_args(args, host='127.0.0.1', port=0, seed=0):
+    return FakeOpenAIServer((host, port), latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000,
+                            error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+                            requests_per_minute=args.requests_per_minute, seed=seed)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    with server_from_args(args, args.host, args.port) as server:
+        print(f"Fake OpenAI API on {server.base_url}")
+        server.serve_forever()
@@ -0,0 +1,101 @@
+"""Review submission throughput with and without group commit.
+
+Concurrent threads store reviews the way submit_review does, either
+committing one transaction per review or through GroupCommitter. The report
+shows reviews per second, latency percentiles and the mean batch size.
+Each mode uses a fresh SQLite file with the settings from database.py.
+Set SQLITE_SYNCHRONOUS=FULL to see the cost of an fsync per commit.
+
+Usage: python benchmarks/group_commit_throughput.py [--reviews N] [--concurrency N] [--max-wait-ms N]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import tempfile
+import threading
+import time
+from datetime import datetime
+from flask import Flask
+from models import db, Business, Review
+import database
+import review_stats  # registers the listeners that keep BusinessStats current
+import review_search  # registers the FTS triggers on SQLite
+from group_commit import GroupCommitter
+from sentiment_worker import enqueue_sentiment_job
+
+def make_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    database.init_app(app, db)
+    with app.app_context():
+        db.create_all()
+        business = Business(name='Bench')
+        db.session.add(business)
+        db.session.commit()
+        return app, business.id
+
+def review_values(business_id, i):
+    return dict(rating=i % 5 + 1, text=f'Campaign review {i}: quick visit, friendly staff', sentiment='pending',
+                business_id=business_id, created_at=datetime.now(), status='new', priority='normal',
+                tags=['staff', 'timing'])
+
+def direct_submit(app):
+    def submit(values):
+        with app.app_context():
+            review = Review(**values)
+            db.session.add(review)
+            enqueue_sentiment_job(review)
+            db.session.commit()
+            return review.id
+    return submit
+
+def measure(name, submit, business_id, reviews, concurrency):
+    latencies = []
+    lock = threading.Lock()
+    counter = iter(range(reviews))
+
+    def client():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            started = time.perf_counter()
+            submit(review_values(business_id, i))
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p50, p95 = (latencies[int(fraction * (len(latencies) - 1))] * 1000 for fraction in (0.5, 0.95))
+    print(f"{name:<26} {reviews / elapsed:>9,.0f} reviews/s   p50 {p50:>6.1f} ms   p95 {p95:>6.1f} ms", end='')
+
+def run(reviews, concurrency, max_wait_ms):
+    print(f"{reviews:,} reviews from {concurrency} concurrent requests\n")
+    with tempfile.TemporaryDirectory() as directory:
+        app, business_id = make_app(os.path.join(directory, 'direct.db'))
+        measure('commit per review', direct_submit(app), business_id, reviews, concurrency)
+        print()
+
+        app, business_id = make_app(os.path.join(directory, 'group.db'))
+        committer = GroupCommitter(app, enabled=True, max_wait=max_wait_ms / 1000)
+        measure(f'group commit ({max_wait_ms} ms)', lambda values: committer.submit(values, classify=True),
+                business_id, reviews, concurrency)
+        print(f"   {committer.stats()['average_batch']} reviews/batch")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--reviews', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--max-wait-ms', type=float, default=5)
+    args = parser.parse_args()
+    run(args.reviews, args.concurrency, args.max_wait_ms)
@@ -0,0 +1,244 @@
+"""Load test of the public review flow and the admin dashboards.
+
+Starts the fake OpenAI server from fake_openai.py, points the app at it
+and at a fresh database seeded with reviews, then runs concurrent virtual
+users against the Flask app for a fixed time:
+
+    public users  open the landing page and submit a review, then either
+                  the share page or the feedback and contact forms
+    admin users   log in and cycle through the dashboard, the review list,
+                  the reviews API and analytics
+
+Each public submission comes from a new client address, so the per-client
+rate limits do not throttle the run. The report gives requests per second
+and p50/p95/p99 latency per route, plus the fake server's counts and the
+sentiment backlog left at the end. It is saved as JSON so runs can be
+compared: pass --compare with an earlier result file. Settings read from
+the environment (GROUP_COMMIT, SENTIMENT_ENGINE, SQLITE_*, ...) apply as
+usual.
+
+Usage: python benchmarks/load_test.py [--public-users 8] [--admin-users 2] [--duration 20]
+                                      [--latency-ms 300] [--error-rate 0.01] [--rate-limit-rate 0.05]
+                                      [--output FILE] [--compare BASELINE.json]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import random
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from fake_openai import add_arguments, server_from_args
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+POSITIVE = ['Dr. Keem was gentle and the staff were friendly', 'Excellent cleaning, I recommend them',
+            'Great visit, clean office and no wait']
+NEGATIVE = ['Waited an hour and the receptionist was rude', 'The filling still hurts and nobody called back',
+            'Billing was confusing and too expensive']
+MIXED = ['It was fine I guess', 'Came in for a checkup', 'Parking was tricky but the visit was okay',
+         'Second visit this year']
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+class Recorder:
+    """Latencies and failures per route."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.failures = defaultdict(int)
+
+    def call(self, route, request, *args, **kwargs):
+        started = time.perf_counter()
+        response = request(*args, **kwargs)
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.latencies[route].append(elapsed)
+            if response.status_code >= 400:
+                self.failures[route] += 1
+        return response
+
+    def summary(self, seconds):
+        routes = {}
+        for route, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            routes[route] = {
+                'requests': len(values),
+                'failures': self.failures[route],
+                'rps': round(len(values) / seconds, 1),
+                'p50_ms': round(percentile(values, 0.50) * 1000, 1),
+                'p95_ms': round(percentile(values, 0.95) * 1000, 1),
+                'p99_ms': round(percentile(values, 0.99) * 1000, 1),
+                'max_ms': round(values[-1] * 1000, 1)
+            }
+        return routes
+
+def seed_database(app, reviews, rng):
+    from sqlalchemy import insert
+    from werkzeug.security import generate_password_hash
+    from models import db, Business, Review, User
+    import review_stats
+
+    with app.app_context():
+        db.create_all()
+        business = Business(name='Load Test Clinic')
+        db.session.add(business)
+        db.session.flush()
+        db.session.add(User(email='admin@loadtest.local', password=generate_password_hash('loadtest'),
+                            name='Load Test Admin', role='business_admin', business_id=business.id))
+        started = datetime.now() - timedelta(days=90)
+        rows = []
+        for i in range(reviews):
+            rating = rng.randint(1, 5)
+            text = rng.choice(POSITIVE if rating >= 4 else NEGATIVE if rating <= 2 else MIXED)
+            rows.append({'business_id': business.id, 'rating': rating, 'text': text, 'status': 'new',
+                         'sentiment': 'positive' if rating >= 4 else 'negative' if rating <= 2 else 'neutral',
+                         'priority': 'high' if rating <= 2 else 'normal', 'tags': [],
+                         'created_at': started + timedelta(minutes=i * 90 * 24 * 60 // max(reviews, 1))})
+        if rows:
+            db.session.execute(insert(Review), rows)
+        review_stats.rebuild_business_stats(db.session.connection(), business.id)
+        review_stats.rebuild_daily_rollups(db.session.connection(), business.id)
+        db.session.commit()
+
+def public_user(app, recorder, stop, number, rng):
+    client = app.test_client()
+    visit = 0
+    while not stop.is_set():
+        visit += 1
+        environ = {'REMOTE_ADDR': f'10.{number}.{visit // 250 % 250}.{visit % 250 + 1}'}
+        rating = rng.randint(1, 5)
+        text = rng.choice(POSITIVE if rating >= 4 else NEGATIVE if rating <= 2 else MIXED)
+        recorder.call('GET /', client.get, '/', environ_overrides=environ)
+        response = recorder.call('POST /submit_review', client.post, '/submit_review',
+                                 json={'rating': rating, 'feedback': f'{text} (visit {visit})'},
+                                 environ_overrides=environ)
+        redirect = (response.get_json(silent=True) or {}).get('redirect', '')
+        if redirect.endswith('/share'):
+            recorder.call('GET /share', client.get, '/share', environ_overrides=environ)
+        elif redirect.endswith('/feedback'):
+            recorder.call('GET /feedback', client.get, '/feedback', environ_overrides=environ)
+            recorder.call('POST /feedback', client.post, '/feedback',
+                          json={'feedback': 'Shorter waits please'}, environ_overrides=environ)
+            recorder.call('POST /feedback/contact', client.post, '/feedback/contact',
+                          json={'name': 'Load Test', 'email': 'patient@loadtest.local', 'preferred_contact': 'email'},
+                          environ_overrides=environ)
+
+def admin_user(app, recorder, stop, number):
+    client = app.test_client()
+    environ = {'REMOTE_ADDR': f'10.250.0.{number + 1}'}
+    client.post('/auth/login', data={'email': 'admin@loadtest.local', 'password': 'loadtest'},
+                environ_overrides=environ)
+    pages = ['/admin/business-dashboard', '/admin/business-reviews', '/admin/api/reviews?per_page=20',
+             '/admin/analytics']
+    while not stop.is_set():
+        for page in pages:
+            recorder.call(f'GET {page.split("?")[0]}', client.get, page, environ_overrides=environ)
+
+def compare(result, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_path}:")
+    print(f"{'route':<32} {'rps':>16} {'p95 ms':>20}")
+    for route, current in result['routes'].items():
+        before = baseline['routes'].get(route)
+        if not before:
+            continue
+        print(f"{route:<32} {before['rps']:>7} -> {current['rps']:<7} {before['p95_ms']:>9} -> {current['p95_ms']:<9}")
+
+def run(args):
+    rng = random.Random(args.seed)
+    fake = server_from_args(args, seed=args.seed)
+    threading.Thread(target=fake.serve_forever, daemon=True).start()
+
+    directory = tempfile.mkdtemp(prefix='load_test_')
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(directory, 'reviews.db')}",
+        'OPENAI_API_KEY': 'sk-fake-load-test',
+        'OPENAI_BASE_URL': fake.base_url,
+        'OPENAI_GOVERNOR_DB': os.path.join(directory, 'openai_governor.db'),
+        'SENTIMENT_CACHE_DB': '',
+        'RATE_LIMIT_BACKEND': 'memory'
+    })
+    # Imported here so the settings above are in place when the app reads them
+    from app import app, sentiment_workers
+    from models import db, SentimentJob
+    from sentiment import openai_governor
+
+    seed_database(app, args.seed_reviews, rng)
+    sentiment_workers.ensure_started()
+
+    recorder = Recorder()
+    stop = threading.Event()
+    threads = [threading.Thread(target=public_user, args=(app, recorder, stop, n, random.Random(args.seed + n)))
+               for n in range(args.public_users)]
+    threads += [threading.Thread(target=admin_user, args=(app, recorder, stop, n)) for n in range(args.admin_users)]
+    print(f"{args.public_users} public and {args.admin_users} admin users for {args.duration}s "
+          f"against a fake OpenAI at {fake.base_url}\n")
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        backlog = SentimentJob.query.filter(SentimentJob.status != 'done').count()
+
+    routes = recorder.summary(elapsed)
+    result = {
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'settings': {
+            'public_users': args.public_users, 'admin_users': args.admin_users, 'duration': args.duration,
+            'seed_reviews': args.seed_reviews, 'seed': args.seed,
+            'openai': {'latency_ms': args.latency_ms, 'jitter_ms': args.jitter_ms, 'error_rate': args.error_rate,
+                       'rate_limit_rate': args.rate_limit_rate, 'requests_per_minute': args.requests_per_minute},
+            'env': {name: os.environ[name] for name in sorted(os.environ)
+                    if name.startswith(('GROUP_COMMIT', 'SENTIMENT_', 'SQLITE_', 'DB_', 'OPENAI_MAX'))}
+        },
+        'total_rps': round(sum(route['requests'] for route in routes.values()) / elapsed, 1),
+        'routes': routes,
+        'fake_openai': fake.stats(),
+        'openai_governor': openai_governor.stats(),
+        'sentiment_backlog': backlog
+    }
+
+    print(f"{'route':<32} {'requests':>8} {'fail':>5} {'rps':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for route, stats in routes.items():
+        print(f"{route:<32} {stats['requests']:>8} {stats['failures']:>5} {stats['rps']:>7} "
+              f"{stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8}")
+    print(f"\n{result['total_rps']} requests/s in total; fake OpenAI: {result['fake_openai']}; "
+          f"sentiment backlog: {backlog}")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"load_test-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"Saved {output}")
+
+    if args.compare:
+        compare(result, args.compare)
+    fake.shutdown()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--public-users', type=int, default=8)
+    parser.add_argument('--admin-users', type=int, default=2)
+    parser.add_argument('--duration', type=float, default=20, help='seconds')
+    parser.add_argument('--seed-reviews', type=int, default=5000, help='reviews in the database before the run')
+    parser.add_argument('--seed', type=int, default=1)
+    add_arguments(parser)
+    parser.add_argument('--output', help='result file (default: benchmarks/results/load_test-<time>.json)')
+    parser.add_argument('--compare', help='earlier result file to compare with')
+    run(parser.parse_args())
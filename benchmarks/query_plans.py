@@ -0,0 +1,106 @@
+"""Check that the hot review queries are answered from indexes.
+
+Runs EXPLAIN QUERY PLAN on each query the app issues on its request paths
+and exits non-zero if any of them falls back to a full table scan.
+
+Usage: python benchmarks/query_plans.py [--live]
+
+By default the schema is built in memory from models.py, so the check
+covers the declared indexes. With --live it runs against the configured
+database, which verifies that the migrations have been applied there.
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+from datetime import datetime, date
+from sqlalchemy import create_engine, event, select, delete, or_, and_, tuple_
+from models import db, User, Review, ReviewResponse, SentimentJob, BusinessStatCounter, ReviewDailyRollup
+
+NOW = datetime(2026, 1, 1)
+
+def hot_queries():
+    """(name, statement) pairs mirroring the queries in app.py, admin.py and the importers."""
+    listing = select(Review).where(Review.business_id == 1)
+    newest_first = (Review.created_at.desc(), Review.id.desc())
+    return [
+        ('review listing', listing.order_by(*newest_first).limit(11)),
+        ('review listing after cursor',
+         listing.where(tuple_(Review.created_at, Review.id) < (NOW, 100)).order_by(*newest_first).limit(11)),
+        ('review listing before cursor',
+         listing.where(tuple_(Review.created_at, Review.id) > (NOW, 100))
+         .order_by(Review.created_at.asc(), Review.id.asc()).limit(11)),
+        ('review listing by status', listing.where(Review.status == 'new').order_by(*newest_first).limit(11)),
+        ('review listing by rating', listing.where(Review.rating == 1).order_by(*newest_first).limit(11)),
+        ('review listing by sentiment',
+         listing.where(Review.sentiment == 'negative').order_by(*newest_first).limit(11)),
+        ('review detail', select(Review).where(Review.id == 5, Review.business_id == 1)),
+        ('latest review', listing.order_by(Review.created_at.desc()).limit(1)),
+        ('import dedup', listing.where(Review.created_at == NOW).limit(1)),
+        ('import delete', delete(Review).where(Review.business_id == 1)),
+        ('review response', select(ReviewResponse).where(ReviewResponse.review_id == 5)),
+        ('user by email', select(User).where(User.email == 'admin@example.com')),
+        ('business admin', select(User).where(User.business_id == 1, User.role == 'business_admin').limit(1)),
+        ('sentiment job claim', select(SentimentJob).where(or_(
+            and_(SentimentJob.status == 'queued', SentimentJob.next_attempt_at <= NOW),
+            and_(SentimentJob.status == 'processing', SentimentJob.locked_at < NOW)
+        )).order_by(SentimentJob.next_attempt_at).limit(40)),
+        ('top counters', select(BusinessStatCounter).where(
+            BusinessStatCounter.business_id == 1,
+            BusinessStatCounter.dimension == 'tag',
+            BusinessStatCounter.count > 0
+        ).order_by(BusinessStatCounter.count.desc()).limit(10)),
+        ('rollup range', select(ReviewDailyRollup).where(
+            ReviewDailyRollup.business_id == 1,
+            ReviewDailyRollup.day >= date(2025, 1, 1),
+            ReviewDailyRollup.day <= date(2025, 12, 31)
+        ).order_by(ReviewDailyRollup.day)),
+    ]
+
+def explain(connection, statement):
+    """Return the EXPLAIN QUERY PLAN detail lines for a statement."""
+    plans = []
+
+    def add_explain(conn, cursor, sql, parameters, context, executemany):
+        return 'EXPLAIN QUERY PLAN ' + sql, parameters
+
+    event.listen(connection, 'before_cursor_execute', add_explain, retval=True)
+    try:
+        result = connection.execute(statement)
+        plans = [row[-1] for row in result.cursor.fetchall()]
+    finally:
+        event.remove(connection, 'before_cursor_execute', add_explain)
+    return plans
+
+def is_full_scan(detail):
+    # "SCAN t" reads the whole table and "SCAN t USING INDEX i" reads the whole
+    # index; only SEARCH steps (and scans of constant rows) are bounded
+    return detail.startswith('SCAN ') and 'CONSTANT ROW' not in detail
+
+def run(engine):
+    failures = 0
+    with engine.connect() as connection:
+        for name, statement in hot_queries():
+            plans = explain(connection, statement)
+            scans = [detail for detail in plans if is_full_scan(detail)]
+            status = 'FAIL' if scans else 'ok'
+            failures += bool(scans)
+            print(f"[{status:>4}] {name}: {'; '.join(plans)}")
+    print(f"\n{failures} of {len(hot_queries())} queries fall back to a full scan")
+    return failures
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--live', action='store_true', help='check the configured database instead of a fresh schema')
+    args = parser.parse_args()
+
+    if args.live:
+        from app import app
+        with app.app_context():
+            failures = run(db.engine)
+    else:
+        engine = create_engine('sqlite://')
+        db.metadata.create_all(engine)
+        failures = run(engine)
+    sys.exit(1 if failures else 0)
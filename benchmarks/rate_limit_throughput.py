@@ -0,0 +1,104 @@
+"""Microbenchmark for the rate limiter backends.
+
+Measures decisions per second and memory per tracked client for the
+in-memory, SQLite and RESP backends (the last against a resp_server.py
+started in this process), next to the per-IP timestamp list approach that
+app.py used before.
+
+Usage: python benchmarks/rate_limit_throughput.py [--hits N] [--clients N] [--limit N]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import random
+import tempfile
+import threading
+import time
+import tracemalloc
+from rate_limit import RateLimiter, MemoryBackend, SQLiteBackend, RESPBackend
+from resp_server import RESPServer
+
+PERIOD = 60
+
+class TimestampListLimiter:
+    """The previous limiter: a list of request times per IP, filtered on every call."""
+
+    def __init__(self, max_requests, time_window=PERIOD):
+        self.max_requests = max_requests
+        self.time_window = time_window
+        self.requests = {}
+
+    def hit(self, ip, now):
+        times = [t for t in self.requests.get(ip, []) if now - t < self.time_window]
+        self.requests[ip] = times
+        if len(times) >= self.max_requests:
+            return False
+        times.append(now)
+        return True
+
+def workload(hits, clients, seed=0):
+    """(client, time) pairs: hits spread over three minutes with some heavy hitters."""
+    rng = random.Random(seed)
+    heavy = [f'10.0.0.{i}' for i in range(10)]
+    start = 1_700_000_000.0
+    return [
+        (rng.choice(heavy) if rng.random() < 0.3 else f'10.{rng.randrange(clients)}', start + i * 180 / hits)
+        for i in range(hits)
+    ]
+
+def measure(name, decide, requests, footprint=None):
+    started = time.perf_counter()
+    allowed = sum(bool(decide(client, now)) for client, now in requests)
+    elapsed = time.perf_counter() - started
+    line = f"{name:<22} {len(requests) / elapsed:>12,.0f} hits/s   {allowed / len(requests):>6.1%} allowed"
+    if footprint is not None:
+        line += f"   {footprint:>8,.0f} bytes/client"
+    print(line)
+
+def memory_per_client(make, clients, limit):
+    """Bytes held per client after every client has made limit requests."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    decide = make()
+    for i in range(clients):
+        for j in range(limit):
+            decide(f'10.{i}', 1_700_000_000.0 + j * PERIOD / limit / 2)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used / clients
+
+def run(hits, clients, limit):
+    requests = workload(hits, clients)
+    print(f"{hits:,} hits from about {clients:,} clients, limit {limit}/{PERIOD}s\n")
+
+    def old_limiter():
+        return TimestampListLimiter(limit).hit
+
+    def memory_limiter():
+        limiter = RateLimiter(MemoryBackend())
+        return lambda client, now: limiter.hit(client, limit, PERIOD, now).allowed
+
+    measure('timestamp lists (old)', old_limiter(), requests, memory_per_client(old_limiter, 2000, limit))
+    measure('memory', memory_limiter(), requests, memory_per_client(memory_limiter, 2000, limit))
+
+    with tempfile.TemporaryDirectory() as directory:
+        sqlite_limiter = RateLimiter(SQLiteBackend(os.path.join(directory, 'rate_limit.db')))
+        measure('sqlite', lambda client, now: sqlite_limiter.hit(client, limit, PERIOD, now).allowed, requests)
+
+    server = RESPServer(('127.0.0.1', 0))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    resp_limiter = RateLimiter(RESPBackend('127.0.0.1', server.server_address[1]))
+    resp_requests = requests[:max(1, len(requests) // 10)]  # one network round trip per hit
+    measure('resp (resp_server.py)', lambda client, now: resp_limiter.hit(client, limit, PERIOD, now).allowed,
+            resp_requests)
+    server.shutdown()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hits', type=int, default=200000)
+    parser.add_argument('--clients', type=int, default=50000)
+    parser.add_argument('--limit', type=int, default=5, help='requests allowed per client per minute')
+    args = parser.parse_args()
+    run(args.hits, args.clients, args.limit)
@@ -0,0 +1,66 @@
+"""Compare the local sentiment model against the sentiments stored in the database.
+
+Usage: python benchmarks/sentiment_agreement.py [--limit N] [--threshold 0.7]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+from collections import Counter
+from app import app
+from models import Review
+from sentiment import SENTIMENT_VALUES, LOCAL_SENTIMENT_MIN_CONFIDENCE
+import local_sentiment
+
+def load_labelled_reviews(limit=None):
+    with app.app_context():
+        query = Review.query.with_entities(Review.text, Review.sentiment)\
+            .filter(Review.sentiment.in_(SENTIMENT_VALUES), Review.text.isnot(None))\
+            .order_by(Review.id.desc())
+        if limit:
+            query = query.limit(limit)
+        return [(text, sentiment) for text, sentiment in query.all()]
+
+def run(limit=None, threshold=LOCAL_SENTIMENT_MIN_CONFIDENCE):
+    reviews = load_labelled_reviews(limit)
+    if not reviews:
+        print("No reviews with a stored sentiment found.")
+        return
+
+    texts = [text for text, _ in reviews]
+    start = time.perf_counter()
+    predictions = local_sentiment.classify_batch(texts)
+    elapsed = time.perf_counter() - start
+
+    agree = 0
+    confident = 0
+    confident_agree = 0
+    confusion = Counter()
+    for (_, expected), (predicted, confidence) in zip(reviews, predictions):
+        confusion[(expected, predicted)] += 1
+        agree += expected == predicted
+        if confidence >= threshold:
+            confident += 1
+            confident_agree += expected == predicted
+
+    total = len(reviews)
+    print(f"Reviews compared:          {total}")
+    print(f"Latency per review:        {elapsed / total * 1e6:.1f} us ({total / elapsed:,.0f} reviews/s)")
+    print(f"Agreement (all):           {agree / total:.1%}")
+    print(f"Answered locally (>= {threshold}): {confident / total:.1%}")
+    if confident:
+        print(f"Agreement (answered):      {confident_agree / confident:.1%}")
+    print("\nConfusion (stored -> local):")
+    print("            " + "".join(f"{label:>10}" for label in SENTIMENT_VALUES))
+    for expected in SENTIMENT_VALUES:
+        print(f"{expected:>10}  " + "".join(f"{confusion[(expected, predicted)]:>10}" for predicted in SENTIMENT_VALUES))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--limit', type=int, default=None, help='only use the N most recent reviews')
+    parser.add_argument('--threshold', type=float, default=LOCAL_SENTIMENT_MIN_CONFIDENCE,
+                        help='confidence at which the local answer is used')
+    args = parser.parse_args()
+    run(args.limit, args.threshold)
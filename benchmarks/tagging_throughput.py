@@ -0,0 +1,74 @@
+"""Measure review tagging throughput on a synthetic corpus.
+
+Compares the compiled tagger with the previous approach of one
+substring check per keyword, over the same generated reviews, for the
+default taxonomy and for a large one.
+
+Usage: python benchmarks/tagging_throughput.py [--reviews N] [--keywords N] [--seed N]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import random
+import time
+from tagging import DEFAULT_TAXONOMY, Tagger, rating_tag
+
+FILLER = ('the', 'dentist', 'was', 'very', 'and', 'my', 'visit', 'today', 'really', 'office',
+          'teeth', 'cleaning', 'would', 'recommend', 'not', 'again', 'everyone', 'felt', 'great')
+
+def synthetic_taxonomy(keywords, rng):
+    """A taxonomy of made-up words and two-word phrases spread over 50 tags."""
+    taxonomy = {tag: list(words) for tag, words in DEFAULT_TAXONOMY.items()}
+    for index in range(keywords):
+        word = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(4, 9)))
+        if index % 5 == 0:
+            word += ' ' + rng.choice(FILLER)
+        taxonomy.setdefault(f'topic{index % 50}', []).append(word)
+    return taxonomy
+
+def synthetic_corpus(reviews, taxonomy, rng):
+    keywords = [keyword for words in taxonomy.values() for keyword in words]
+    corpus = []
+    for _ in range(reviews):
+        words = [rng.choice(FILLER) for _ in range(rng.randint(10, 60))]
+        for _ in range(rng.randint(0, 3)):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(keywords))
+        corpus.append((' '.join(words).capitalize() + '.', rng.randint(1, 5)))
+    return corpus
+
+def substring_tagger(taxonomy):
+    """The pre-compiled-tagger approach: a lowercase copy and one `in` check per keyword."""
+    checks = [(tag, [tag, *keywords]) for tag, keywords in taxonomy.items()]
+
+    def tag(text, rating):
+        lower_text = text.lower()
+        return [rating_tag(rating)] + [name for name, keywords in checks
+                                       if any(keyword in lower_text for keyword in keywords)]
+    return tag
+
+def measure(tag, corpus):
+    start = time.perf_counter()
+    for text, rating in corpus:
+        tag(text, rating)
+    return len(corpus) / (time.perf_counter() - start)
+
+def run(reviews, keywords, seed):
+    rng = random.Random(seed)
+    for name, taxonomy in (('default', DEFAULT_TAXONOMY), (f'{keywords} keywords', synthetic_taxonomy(keywords, rng))):
+        corpus = synthetic_corpus(reviews, taxonomy, rng)
+        size = sum(len(words) + 1 for words in taxonomy.values())
+        compiled = measure(Tagger(taxonomy).tag, corpus)
+        substring = measure(substring_tagger(taxonomy), corpus)
+        print(f"Taxonomy {name} ({size} keywords, {reviews} reviews)")
+        print(f"  compiled tagger:  {compiled:>12,.0f} reviews/s")
+        print(f"  substring checks: {substring:>12,.0f} reviews/s ({compiled / substring:.1f}x)")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--reviews', type=int, default=100000)
+    parser.add_argument('--keywords', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    run(args.reviews, args.keywords, args.seed)
@@ -0,0 +1,100 @@
+"""Database URL, connection pool and SQLite settings from the environment.
+
+DATABASE_URL selects the database. The default is sqlite:///reviews.db (in
+the instance folder), and a postgresql:// URL works too with the driver from
+requirements-postgres.txt. Pool options apply to both. On SQLite every new connection is switched to WAL and given a busy
+timeout. In WAL mode readers no longer block the writer and the writer no
+longer blocks readers. A writer that finds the database locked waits up to
+the busy timeout instead of failing with "database is locked" straight away.
+The remaining pragmas trade a little durability on power loss for fewer
+fsyncs (synchronous=NORMAL), and give each connection a larger page cache
+and memory-mapped reads.
+
+Environment:
+    DATABASE_URL             database URL (default sqlite:///reviews.db)
+    DB_POOL_SIZE             connections kept open per process (default 5)
+    DB_MAX_OVERFLOW          extra connections allowed under load (default 10)
+    DB_POOL_TIMEOUT          seconds to wait for a free connection (default 30)
+    DB_POOL_RECYCLE          reopen connections older than this, in seconds (default 1800)
+    DB_POOL_PRE_PING         test connections before use, 1 or 0 (default 1 except SQLite)
+    SQLITE_JOURNAL_MODE      default WAL
+    SQLITE_BUSY_TIMEOUT      milliseconds a writer waits for the lock (default 5000)
+    SQLITE_SYNCHRONOUS       default NORMAL
+    SQLITE_CACHE_SIZE        page cache per connection; negative means KiB (default -20000)
+    SQLITE_MMAP_SIZE         bytes of the file read through mmap (default 134217728)
+"""
+import os
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+DEFAULT_DATABASE_URL = 'sqlite:///reviews.db'
+
+def env_flag(name, default):
+    value = os.getenv(name)
+    return default if value is None else value.lower() in ('1', 'true', 'yes', 'on')
+
+def normalize_url(url):
+    # Heroku-style postgres:// is no longer accepted, and a bare postgresql://
+    # would pick psycopg2; both go to psycopg from requirements-postgres.txt
+    for scheme in ('postgres://', 'postgresql://'):
+        if url.startswith(scheme):
+            url = 'postgresql+psycopg://' + url[len(scheme):]
+    return url
+
+def database_url():
+    return normalize_url(os.getenv('DATABASE_URL') or DEFAULT_DATABASE_URL)
+
+def sqlite_pragmas():
+    """The pragmas set on each new SQLite connection, in order."""
+    return {
+        'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+        'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000)),
+        'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'cache_size': int(os.getenv('SQLITE_CACHE_SIZE', -20000)),
+        'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', 128 * 1024 * 1024))
+    }
+
+def is_memory_sqlite(url):
+    url = make_url(url)
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+def engine_options(url):
+    """SQLAlchemy create_engine options for url (SQLALCHEMY_ENGINE_OPTIONS)."""
+    sqlite = make_url(url).get_backend_name() == 'sqlite'
+    if is_memory_sqlite(url):
+        return {}  # a single shared connection; there is nothing to pool
+    options = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+        # A local SQLite file cannot drop the connection under us
+        'pool_pre_ping': env_flag('DB_POOL_PRE_PING', not sqlite)
+    }
+    if sqlite:
+        # The driver's own lock wait; busy_timeout below takes over once connected
+        options['connect_args'] = {'timeout': sqlite_pragmas()['busy_timeout'] / 1000}
+    return options
+
+def set_sqlite_pragmas(engine, pragmas=None):
+    """Apply pragmas (sqlite_pragmas() by default) to every new connection of a SQLite engine."""
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = sqlite_pragmas() if pragmas is None else pragmas
+
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+def init_app(app, db):
+    """Configure app's database from the environment and set up db on it."""
+    url = app.config.setdefault('SQLALCHEMY_DATABASE_URI', database_url())
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(url))
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    with app.app_context():
+        for engine in db.engines.values():
+            set_sqlite_pragmas(engine)
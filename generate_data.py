@@ -0,0 +1,353 @@
+"""Seeded synthetic data for load, dashboard and import testing.
+
+Creates businesses, one admin per business, and any number of reviews.
+Business sizes, ratings, sentiment, source, tags, contact details,
+follow-up feedback, status and timestamps follow realistic distributions.
+The same --seed always produces the same data. Businesses and admins go
+through the ORM. Reviews are written in large chunks with executemany
+straight on the SQLite driver (a Core insert on other databases),
+bypassing the per-row stats listeners and search triggers, with the
+review indexes dropped. The indexes, statistics, daily rollups and the
+search index are rebuilt once at the end.
+
+Instead of writing to the database, or as well, the reviews can be written
+per business in the reviews.json or NDJSON format that import_reviews.py
+reads.
+
+Usage: python generate_data.py [--businesses 5] [--reviews 100000] [--days 365] [--seed 42]
+                               [--reset] [--export-dir DIR --export-format json|ndjson] [--no-db]
+"""
+import argparse
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+CHUNK_SIZE = 20000
+TEXT_POOL_SIZE = 3000  # review texts drawn per sentiment; tagged once, then sampled
+
+RATING_WEIGHTS = {5: 52, 4: 20, 3: 8, 2: 6, 1: 14}  # the J-shaped curve of public review sites
+SENTIMENT_BY_RATING = {
+    5: {'positive': 92, 'neutral': 6, 'negative': 2},
+    4: {'positive': 75, 'neutral': 20, 'negative': 5},
+    3: {'positive': 20, 'neutral': 55, 'negative': 25},
+    2: {'positive': 3, 'neutral': 22, 'negative': 75},
+    1: {'positive': 1, 'neutral': 7, 'negative': 92}
+}
+SOURCE_WEIGHTS = {'website': 55, 'google': 25, 'yelp': 12, 'facebook': 8}
+HOUR_WEIGHTS = [1, 1, 1, 1, 1, 1, 2, 4, 8, 10, 11, 11, 10, 10, 11, 11, 10, 9, 8, 7, 6, 4, 3, 2]
+
+BUSINESS_WORDS = (['Bright', 'Gentle', 'Family', 'Downtown', 'Riverside', 'Sunrise', 'Harbor', 'Maple', 'Summit',
+                   'Lakeside', 'Parkview', 'Evergreen'],
+                  ['Smile', 'Dental', 'Tooth', 'Orthodontics', 'Oral Care', 'Dentistry'],
+                  ['Studio', 'Clinic', 'Group', 'Center', 'Associates', 'Care'])
+FIRST_NAMES = ['James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David', 'Elizabeth',
+               'Maria', 'Wei', 'Aisha', 'Carlos', 'Priya', 'Omar', 'Yuki', 'Fatima', 'Lucas', 'Sofia']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez',
+              'Martinez', 'Nguyen', 'Kim', 'Patel', 'Khan', 'Chen', 'Lopez', 'Wilson', 'Anderson']
+
+PHRASES = {
+    'positive': ['The staff were friendly and helpful', 'Dr. {doctor} was gentle and professional',
+                 'Cleaning was thorough and painless', 'I was seen right on time',
+                 'Prices were affordable and billing was clear', 'The office is modern and spotless',
+                 'They explained every step of the treatment', 'Booking an appointment online was easy',
+                 'My kids actually enjoy coming here', 'Best dental visit I have had in years'],
+    'neutral': ['The visit was fine', 'Routine checkup, nothing special', 'I waited a little but it was okay',
+                'Parking can be tricky', 'Staff were polite', 'Insurance paperwork took a while',
+                'The appointment was rescheduled once', 'Average experience overall'],
+    'negative': ['I waited over an hour past my appointment', 'The receptionist was rude on the phone',
+                 'The bill was much higher than quoted', 'My filling still hurts a week later',
+                 'Nobody called me back about my insurance', 'They rushed through the cleaning',
+                 'Overpriced for what you get', 'The appointment was delayed twice without notice']
+}
+OPENERS = {'positive': ['', 'Great experience! ', 'Highly recommend. ', 'Five stars. '],
+           'neutral': ['', 'It was okay. ', 'Mixed feelings. '],
+           'negative': ['', 'Disappointed. ', 'Not happy. ', 'Would not return. ']}
+IMPROVEMENTS = ['Shorter waiting times', 'Clearer pricing before treatment', 'Call patients back sooner',
+                'More evening appointments', 'Friendlier front desk', 'Better pain management']
+
+def lookup(weights):
+    """A tuple holding each value of {value: weight} weight times; index it with random() * len.
+
+    One random() and an index per draw is several times cheaper than random.choices,
+    which matters at a million rows.
+    """
+    return tuple(value for value, weight in weights.items() for _ in range(weight))
+
+def pick(rng, table):
+    return table[int(rng.random() * len(table))]
+
+STATUS_RECENT = lookup({'new': 3, 'read': 1})  # reviews from the last week
+STATUS_HAPPY = lookup({'new': 1, 'read': 4, 'responded': 2})
+STATUS_UNHAPPY = lookup({'new': 1, 'read': 4, 'responded': 5})
+
+def text_pool(rng, sentiment, size):
+    """Up to size distinct texts (fewer if the phrases do not combine into that many)."""
+    texts = set()
+    for _ in range(size):
+        parts = rng.sample(PHRASES[sentiment], rng.randint(1, 3))
+        texts.add(rng.choice(OPENERS[sentiment]) + '. '.join(parts).format(doctor=rng.choice(LAST_NAMES)) + '.')
+    return sorted(texts)
+
+def business_names(rng, count):
+    names = set()
+    while len(names) < count:
+        first, middle, last = (rng.choice(words) for words in BUSINESS_WORDS)
+        name = f'{first} {middle} {last}'
+        if name in names:
+            name = f'{name} {len(names) + 1}'
+        names.add(name)
+    return sorted(names)
+
+def business_sizes(rng, total, count):
+    """Split total reviews over count businesses with a long tail (a few large, many small)."""
+    weights = [1 / (rank + 1) ** 0.8 for rank in range(count)]
+    rng.shuffle(weights)
+    sizes = [int(total * weight / sum(weights)) for weight in weights]
+    sizes[0] += total - sum(sizes)
+    return sizes
+
+class ReviewGenerator:
+    """Reviews for one dataset; the texts are tagged once with the default taxonomy."""
+
+    def __init__(self, seed, days, end=None):
+        from tagging import get_tagger
+
+        self.rng = random.Random(seed)
+        self.days = days
+        self.end = end or datetime(2026, 1, 1)
+        self.ratings = lookup(RATING_WEIGHTS)
+        self.sentiments = {rating: lookup(weights) for rating, weights in SENTIMENT_BY_RATING.items()}
+        self.sources = lookup(SOURCE_WEIGHTS)
+        self.hours = lookup(dict(enumerate(HOUR_WEIGHTS)))
+        self.days_ago = [self.end - timedelta(days=age) for age in range(days + 1)]
+        self.tag_lists = {}  # one shared list per (rating bucket, text), so its JSON can be cached
+        tagger = get_tagger()
+        self.texts = {sentiment: [(text, tagger.match(text)) for text in text_pool(self.rng, sentiment, TEXT_POOL_SIZE)]
+                      for sentiment in PHRASES}
+
+    def timestamp(self):
+        rng = self.rng
+        # Volume grows over time: recent days are more likely than old ones
+        age_days = int(self.days * (1 - rng.random() ** 0.5))
+        offset = timedelta(hours=pick(rng, self.hours), microseconds=int(rng.random() * 3600000000))
+        return self.days_ago[age_days] + offset, age_days
+
+    def contact(self):
+        rng = self.rng
+        first, last = pick(rng, FIRST_NAMES), pick(rng, LAST_NAMES)
+        number = int(rng.random() * 10000000)
+        return {
+            'name': f'{first} {last}',
+            'email': f'{first}.{last}{number % 1000}@example.com'.lower(),
+            'phone': f'555-{number // 10000:03d}-{number % 10000:04d}',
+            'preferred_contact': 'phone' if rng.random() < 1 / 3 else 'email'
+        }
+
+    def review(self, business_id):
+        rng = self.rng
+        rating = pick(rng, self.ratings)
+        sentiment = pick(rng, self.sentiments[rating])
+        text, tags = pick(rng, self.texts[sentiment])
+        bucket = 'positive' if rating >= 4 else 'negative' if rating <= 2 else 'neutral'
+        tag_list = self.tag_lists.get((bucket, text))
+        if tag_list is None:
+            tag_list = self.tag_lists[bucket, text] = [bucket, *tags]
+        created_at, age_days = self.timestamp()
+        unhappy = rating <= 3 or sentiment == 'negative'
+        # Unhappy patients go through the follow-up forms, where they often leave details
+        contact_info = self.contact() if rng.random() < (0.35 if unhappy else 0.04) else None
+        status = pick(rng, STATUS_RECENT if age_days < 7 else STATUS_UNHAPPY if unhappy else STATUS_HAPPY)
+        return {
+            'business_id': business_id,
+            'rating': rating,
+            'text': text,
+            'customer_name': contact_info['name'] if contact_info else 'Anonymous',
+            'contact_info': contact_info,
+            'created_at': created_at,
+            'last_updated': created_at,
+            'status': status,
+            'sentiment': sentiment,
+            'source': pick(rng, self.sources),
+            'improvement_feedback': pick(rng, IMPROVEMENTS) if unhappy and rng.random() < 0.4 else None,
+            'tags': tag_list,
+            'priority': 'urgent' if rating == 1 and rng.random() < 0.05 else 'high' if rating <= 2 else 'normal'
+        }
+
+def sqlite_insert(connection, table, rows):
+    """executemany straight on the SQLite driver, with values encoded as the dialect stores them.
+
+    Skips SQLAlchemy's per-value bind processing, the bulk of the cost at this volume.
+    Tags lists are shared between rows, so each distinct list is encoded once.
+    """
+    columns = ['business_id', 'rating', 'text', 'customer_name', 'contact_info', 'created_at', 'last_updated',
+               'status', 'sentiment', 'source', 'improvement_feedback', 'tags', 'priority']
+    encoded_tags = {}
+    params = []
+    for row in rows:
+        tags = row['tags']
+        if id(tags) not in encoded_tags:
+            encoded_tags[id(tags)] = json.dumps(tags)
+        created_at = row['created_at'].isoformat(' ', 'microseconds')
+        params.append((row['business_id'], row['rating'], row['text'], row['customer_name'],
+                       json.dumps(row['contact_info']) if row['contact_info'] is not None else None,
+                       created_at, created_at, row['status'], row['sentiment'], row['source'],
+                       row['improvement_feedback'], encoded_tags[id(tags)], row['priority']))
+    connection.exec_driver_sql(f"INSERT INTO {table.name} ({', '.join(columns)}) "
+                               f"VALUES ({', '.join('?' * len(columns))})", params)
+
+def import_record(row):
+    """A generated row in the reviews.json shape read by import_reviews.py."""
+    return {
+        'timestamp': row['created_at'].isoformat(),
+        'rating': row['rating'],
+        'feedback': row['text'],
+        'sentiment': row['sentiment'],
+        'source': row['source'],
+        'improvement_feedback': row['improvement_feedback'] or '',
+        'contact_info': row['contact_info']
+    }
+
+class ExportWriter:
+    """Streams one business's records to a JSON array or NDJSON file."""
+
+    def __init__(self, path, format):
+        self.format = format
+        self.file = open(path, 'w', encoding='utf-8')
+        self.count = 0
+        if format == 'json':
+            self.file.write('[\n')
+
+    def write(self, rows):
+        for row in rows:
+            line = json.dumps(import_record(row), ensure_ascii=False)
+            if self.format == 'json':
+                line = (',\n' if self.count else '') + line
+            else:
+                line += '\n'
+            self.file.write(line)
+            self.count += 1
+
+    def close(self):
+        if self.format == 'json':
+            self.file.write('\n]\n')
+        self.file.close()
+
+def create_businesses(names, password):
+    """Businesses and their admins through the ORM, so slugs are assigned as usual."""
+    from werkzeug.security import generate_password_hash
+    from models import db, Business, User
+
+    password_hash = generate_password_hash(password)  # hashed once; every admin shares it
+    businesses = [Business(name=name, is_active=True) for name in names]
+    db.session.add_all(businesses)
+    db.session.flush()
+    for business in businesses:
+        db.session.add(User(email=f'admin@{business.slug}.example.com', password=password_hash,
+                            name=f'{business.name} Admin', role='business_admin', business_id=business.id))
+    db.session.commit()
+    return [(business.id, business.slug) for business in businesses]
+
+def generate(businesses=5, reviews=100000, days=365, seed=42, reset=False, export_dir=None, export_format='ndjson',
+             write_db=True, password='password123'):
+    rng = random.Random(seed)
+    names = business_names(rng, businesses)
+    sizes = business_sizes(rng, reviews, businesses)
+    generator = ReviewGenerator(seed, days)
+    started = time.perf_counter()
+
+    if write_db:
+        from sqlalchemy import insert
+        from models import db, Review
+        from review_stats import rebuild_business_stats, rebuild_daily_rollups
+        from review_search import search_available, drop_search_index, create_search_index, rebuild_search_index
+
+        if reset:
+            db.drop_all()
+            db.create_all()
+        targets = create_businesses(names, password)
+        connection = db.session.connection()
+        sqlite = connection.dialect.name == 'sqlite'
+        search = search_available(connection)
+        # Building each index once at the end is much cheaper than updating it per row
+        for index in Review.__table__.indexes:
+            index.drop(connection, checkfirst=True)
+        if search:
+            drop_search_index(connection)
+        db.session.commit()
+    else:
+        targets = [(None, f'business-{number + 1}') for number in range(businesses)]
+
+    if export_dir:
+        os.makedirs(export_dir, exist_ok=True)
+
+    written = 0
+    try:
+        for (business_id, slug), size in zip(targets, sizes):
+            writer = (ExportWriter(os.path.join(export_dir, f'{slug}.{export_format}'), export_format)
+                      if export_dir else None)
+            remaining = size
+            while remaining:
+                rows = [generator.review(business_id) for _ in range(min(CHUNK_SIZE, remaining))]
+                remaining -= len(rows)
+                if write_db:
+                    if sqlite:
+                        sqlite_insert(db.session.connection(), Review.__table__, rows)
+                    else:
+                        # The table, not the mapped class: a plain executemany without ORM bookkeeping
+                        db.session.execute(insert(Review.__table__), rows)
+                    db.session.commit()
+                if writer:
+                    writer.write(rows)
+                written += len(rows)
+            if writer:
+                writer.close()
+            print(f"{slug}: {size:,} reviews")
+    finally:
+        inserted_at = time.perf_counter()
+        if write_db:
+            # Also after a failure: the database must not be left without its indexes
+            db.session.rollback()
+            connection = db.session.connection()
+            for index in Review.__table__.indexes:
+                index.create(connection, checkfirst=True)
+            for business_id, _ in targets:
+                rebuild_business_stats(connection, business_id)
+                rebuild_daily_rollups(connection, business_id)
+            if search:
+                create_search_index(connection)
+                rebuild_search_index(connection)
+            db.session.commit()
+
+    finished = time.perf_counter()
+    print(f"Generated {written:,} reviews for {businesses} businesses in {inserted_at - started:.1f}s "
+          f"({written / max(inserted_at - started, 1e-9):,.0f} rows/s)")
+    if write_db:
+        print(f"Rebuilt indexes, stats{' and the search index' if search else ''} in {finished - inserted_at:.1f}s")
+        print(f"Admins log in as admin@<slug>.example.com with password '{password}'")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a seeded synthetic review dataset.')
+    parser.add_argument('--businesses', type=int, default=5)
+    parser.add_argument('--reviews', type=int, default=100000, help='reviews in total, spread over the businesses')
+    parser.add_argument('--days', type=int, default=365, help='days of history before 2026-01-01')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reset', action='store_true', help='drop and recreate every table first')
+    parser.add_argument('--export-dir', help='also write each business\'s reviews to DIR/<slug>.<format>')
+    parser.add_argument('--export-format', choices=['json', 'ndjson'], default='ndjson')
+    parser.add_argument('--no-db', action='store_true', help='only write the export files')
+    parser.add_argument('--password', default='password123', help='password of the generated admins')
+    args = parser.parse_args()
+
+    options = dict(businesses=args.businesses, reviews=args.reviews, days=args.days, seed=args.seed, reset=args.reset,
+                   export_dir=args.export_dir, export_format=args.export_format, write_db=not args.no_db,
+                   password=args.password)
+    if args.no_db:
+        if not args.export_dir:
+            parser.error('--no-db needs --export-dir')
+        generate(**options)
+    else:
+        from app import app
+        with app.app_context():
+            generate(**options)
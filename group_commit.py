@@ -0,0 +1,164 @@
+"""Group commit for review submissions.
+
+Without it, every submission commits its own transaction: one fsync each,
+all queued behind SQLite's single writer lock. In group-commit mode,
+requests hand their review to one writer thread per process. The thread
+gathers whatever arrives within GROUP_COMMIT_MAX_WAIT_MS of the first
+review, up to GROUP_COMMIT_MAX_BATCH reviews, and inserts them and their
+sentiment jobs in a single transaction. A request returns only after that
+transaction has committed, with the id of its own review. If a batch fails,
+its reviews are retried one per transaction, so a bad review fails alone.
+A request that times out withdraws its review if the writer has not taken
+it yet. Otherwise it waits for that write, so a timeout never hides a saved
+review. If the writer thread dies, the next submission starts a new one.
+
+Enable with GROUP_COMMIT=1.
+"""
+import os
+import queue
+import threading
+import time
+from models import db, Review
+from sentiment_worker import enqueue_sentiment_job
+
+class PendingReview:
+    """A review waiting for its batch to commit."""
+
+    def __init__(self, values, classify):
+        self.values = values
+        self.classify = classify
+        self.review_id = None
+        self.error = None
+        self.committed = threading.Event()
+        self._state = 'queued'  # then 'writing' (taken by the writer) or 'cancelled' (timed out)
+        self._lock = threading.Lock()
+
+    def claim(self):
+        """Called by the writer; False if the request has already given up."""
+        with self._lock:
+            if self._state != 'queued':
+                return False
+            self._state = 'writing'
+            return True
+
+    def cancel(self):
+        """Called by a request that timed out; False if the writer already has the review."""
+        with self._lock:
+            if self._state != 'queued':
+                return False
+            self._state = 'cancelled'
+            return True
+
+    def fail(self, error):
+        self.error = error
+        self.committed.set()
+
+class GroupCommitter:
+
+    def __init__(self, app, enabled=None, max_batch=None, max_wait=None):
+        self.app = app
+        self.enabled = os.getenv('GROUP_COMMIT', '0') == '1' if enabled is None else enabled
+        self.max_batch = int(os.getenv('GROUP_COMMIT_MAX_BATCH', 64)) if max_batch is None else max_batch
+        self.max_wait = int(os.getenv('GROUP_COMMIT_MAX_WAIT_MS', 5)) / 1000 if max_wait is None else max_wait
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.committed = 0
+        self.largest_batch = 0
+
+    def _running(self):
+        return self._thread is not None and self._pid == os.getpid() and self._thread.is_alive()
+
+    def ensure_started(self):
+        """Start the writer thread once per process (also after a fork), or again if it died."""
+        if self._running():
+            return
+        with self._lock:
+            if self._running():
+                return
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._queue = queue.Queue()
+            self._thread = threading.Thread(target=self._run, name='group-commit', daemon=True)
+            self._thread.start()
+
+    def submit(self, values, classify=False, timeout=30):
+        """Insert Review(**values) with the next batch; returns the review id once committed.
+
+        With classify, a sentiment job is queued in the same transaction.
+        Raises the error that prevented the insert, or TimeoutError if the
+        review was withdrawn unwritten.
+        """
+        self.ensure_started()
+        pending = PendingReview(values, classify)
+        self._queue.put(pending)
+        if not pending.committed.wait(timeout):
+            if pending.cancel():
+                raise TimeoutError(f"Review not committed within {timeout}s")
+            # The writer is already inserting it; report how that ends
+            pending.committed.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.review_id
+
+    def _run(self):
+        while True:
+            batch = []
+            try:
+                batch.append(self._queue.get())
+                deadline = time.monotonic() + self.max_wait
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                batch = [pending for pending in batch if pending.claim()]
+                if batch:
+                    with self.app.app_context():
+                        self._write(batch)
+            except Exception as e:
+                # Keep the writer alive; only this batch's requests see the error
+                print(f"Error in group commit writer: {e}")
+                for pending in batch:
+                    if not pending.committed.is_set():
+                        pending.fail(e)
+
+    def _write(self, batch):
+        try:
+            reviews = [Review(**pending.values) for pending in batch]
+            db.session.add_all(reviews)
+            for pending, review in zip(batch, reviews):
+                if pending.classify:
+                    enqueue_sentiment_job(review)
+            db.session.flush()
+            review_ids = [review.id for review in reviews]
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            if len(batch) == 1:
+                print(f"Error committing review: {e}")
+                batch[0].fail(e)
+                return
+            for pending in batch:
+                self._write([pending])
+            return
+
+        self.batches += 1
+        self.committed += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        for pending, review_id in zip(batch, review_ids):
+            pending.review_id = review_id
+            pending.committed.set()
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'batches': self.batches,
+            'committed': self.committed,
+            'average_batch': round(self.committed / self.batches, 1) if self.batches else 0,
+            'largest_batch': self.largest_batch,
+            'queued': self._queue.qsize() if self._queue else 0
+        }
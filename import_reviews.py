@@ -1,43 +1,31 @@
 from app import app, db
-from models import Business, Review, ReviewResponse, User
+from models import Business, Review, ReviewResponse, User, ImportCheckpoint
+import argparse
 import json
+import os
+import time
 from datetime import datetime
 import logging
+from sqlalchemy import select, insert
 from sqlalchemy.exc import SQLAlchemyError
+from sentiment import classify_sentiments, rating_sentiment
+from review_stats import rebuild_business_stats, rebuild_daily_rollups
+from tagging import get_tagger, tagger_for_business
+from review_readers import open_reader, detect_format, READERS
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DEFAULT_CHUNK_SIZE = 1000  # rows per executemany and commit
+
+class ChunkFailed(Exception):
+    """A chunk could not be written; the import stops after the last committed chunk."""
+
 def get_sentiment(review_data):
     """Get sentiment from stored review data."""
     return review_data.get('sentiment', 'neutral')
 
-def extract_tags(text, rating):
-    """Extract relevant tags from review text and rating."""
-    tags = []
-    
-    # Add rating-based tags
-    if rating >= 4:
-        tags.append('positive')
-    elif rating <= 2:
-        tags.append('negative')
-    else:
-        tags.append('neutral')
-    
-    # Add common issue tags (can be expanded)
-    lower_text = text.lower()
-    if 'service' in lower_text:
-        tags.append('service')
-    if 'quality' in lower_text:
-        tags.append('quality')
-    if 'price' in lower_text or 'expensive' in lower_text or 'cost' in lower_text:
-        tags.append('pricing')
-    if 'wait' in lower_text or 'time' in lower_text:
-        tags.append('timing')
-    
-    return tags
-
 def get_or_create_business_admin(business_id):
     """Get or create a business admin for review responses."""
     admin = User.query.filter_by(
@@ -46,120 +34,259 @@ def get_or_create_business_admin(business_id):
     ).first()
     return admin.id if admin else None
 
-def import_reviews(delete_existing=False):
-    """Import reviews from reviews.json into the database."""
-    try:
-        with app.app_context():
-            # Get the Keem Smile Dentistry business
-            business = Business.query.filter_by(name="Keem Smile Dentistry").first()
-            
-            if not business:
-                logger.error("Business 'Keem Smile Dentistry' not found!")
-                return
+def classify_missing_sentiments(rows):
+    """Fill in sentiment for rows that came without one, using batched OpenAI calls."""
+    rows = [row for row in rows if row['sentiment'] is None]
+    if not rows:
+        return
+    sentiments = classify_sentiments([row['text'] or '' for row in rows])
+    for row, sentiment in zip(rows, sentiments):
+        row['sentiment'] = sentiment or rating_sentiment(row['rating'])
+    logger.info(f"Classified sentiment for {len(rows)} reviews")
 
-            # Get business admin ID for responses
-            admin_id = get_or_create_business_admin(business.id)
+def parse_contact_info(value):
+    """Contact info may arrive as a dict or as a JSON string."""
+    if not value:
+        return {}
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            return {}
+    return value
 
-            # Optionally delete existing reviews
-            if delete_existing:
-                Review.query.filter_by(business_id=business.id).delete()
-                db.session.commit()
-                logger.info("Deleted existing reviews")
+def build_review_row(review_data, business_id, classify_missing=False, tagger=None):
+    """Convert an imported record into a row for a bulk insert into review."""
+    created_at = datetime.fromisoformat(review_data['timestamp'])
+    contact_info = parse_contact_info(review_data.get('contact_info'))
+    sentiment = review_data.get('sentiment')
+    if not sentiment and not classify_missing:
+        sentiment = get_sentiment(review_data)
+    return {
+        'business_id': business_id,
+        'rating': review_data['rating'],
+        'text': review_data['feedback'],
+        'customer_name': contact_info.get('name', 'Anonymous'),
+        'contact_info': contact_info,
+        'created_at': created_at,
+        'last_updated': created_at,
+        'status': 'new',
+        'sentiment': sentiment or None,
+        'source': review_data.get('source', 'website'),
+        'improvement_feedback': review_data.get('improvement_feedback', ''),
+        'tags': (tagger or get_tagger()).tag(review_data['feedback'], review_data['rating']),
+        'priority': 'high' if review_data['rating'] <= 2 else 'normal'
+    }
 
-            # Load reviews from JSON
-            try:
-                with open('reviews.json', 'r') as f:
-                    reviews_data = json.load(f)
-            except FileNotFoundError:
-                logger.error("reviews.json file not found!")
-                return
-            except json.JSONDecodeError:
-                logger.error("Invalid JSON format in reviews.json!")
-                return
+def load_existing_keys(business_id):
+    """Timestamps of the business's stored reviews, used to skip duplicates in one pass."""
+    result = db.session.execute(select(Review.created_at).where(Review.business_id == business_id))
+    return {created_at for (created_at,) in result}
+
+def insert_chunk(rows, classify_missing=False, on_chunk=None):
+    """Insert one chunk of rows in a single executemany and commit it.
 
-            # Counters for statistics
-            stats = {
-                'imported': 0,
-                'skipped': 0,
-                'with_contact': 0,
-                'with_improvement': 0,
-                'with_responses': 0,
-                'errors': 0,
-                'total': len(reviews_data)
-            }
-
-            for review_data in reviews_data:
-                try:
-                    # Check if review already exists
-                    existing_review = Review.query.filter_by(
-                        business_id=business.id,
-                        created_at=datetime.fromisoformat(review_data['timestamp'])
-                    ).first()
-
-                    if existing_review:
-                        stats['skipped'] += 1
-                        continue
-
-                    # Process contact information
-                    contact_info = {}
-                    if review_data.get('contact_info'):
-                        try:
-                            if isinstance(review_data['contact_info'], str):
-                                # Try to parse if it's a string
-                                contact_info = json.loads(review_data['contact_info'])
-                            else:
-                                contact_info = review_data['contact_info']
-                            stats['with_contact'] += 1
-                        except json.JSONDecodeError:
-                            contact_info = {}
-
-                    # Create new review
-                    review = Review(
-                        business_id=business.id,
-                        rating=review_data['rating'],
-                        text=review_data['feedback'],
-                        customer_name=contact_info.get('name', 'Anonymous'),
-                        contact_info=contact_info,
-                        created_at=datetime.fromisoformat(review_data['timestamp']),
-                        last_updated=datetime.fromisoformat(review_data['timestamp']),
-                        sentiment=get_sentiment(review_data),
-                        source=review_data.get('source', 'website'),
-                        improvement_feedback=review_data.get('improvement_feedback', ''),
-                        tags=extract_tags(review_data['feedback'], review_data['rating']),
-                        priority='high' if review_data['rating'] <= 2 else 'normal'
-                    )
-
-                    if review_data.get('improvement_feedback'):
-                        stats['with_improvement'] += 1
-
-                    db.session.add(review)
-                    stats['imported'] += 1
-
-                except Exception as e:
-                    logger.error(f"Error processing review: {e}")
-                    stats['errors'] += 1
-                    continue
-
-            # Commit all changes
+    on_chunk runs inside the same transaction, so a checkpoint it records
+    is committed atomically with the rows.
+    """
+    if classify_missing:
+        classify_missing_sentiments(rows)
+    db.session.execute(insert(Review), rows)
+    if on_chunk:
+        on_chunk(rows)
+    db.session.commit()
+
+def import_records(records, business, chunk_size=DEFAULT_CHUNK_SIZE, classify_missing=False, on_chunk=None):
+    """Bulk-import an iterable of review records for a business.
+
+    Existing timestamps are preloaded into a set instead of being looked up
+    per record, rows are inserted with Core executemany in chunks of
+    chunk_size and each chunk is committed. The business's statistics are
+    rebuilt on every exit, including errors, because Core inserts bypass the
+    ORM listeners.
+    on_chunk(rows) is called in each chunk's transaction (see insert_chunk).
+    Returns the statistics dictionary, including rows_per_second.
+
+    A chunk that fails to insert stops the import with ChunkFailed, so a
+    checkpoint written by on_chunk never moves past rows that were not stored.
+    """
+    stats = {
+        'imported': 0,
+        'skipped': 0,
+        'with_contact': 0,
+        'with_improvement': 0,
+        'with_responses': 0,
+        'errors': 0,
+        'total': 0
+    }
+    started = time.perf_counter()
+    existing = load_existing_keys(business.id)
+    tagger = tagger_for_business(business)
+    chunk = []
+
+    def flush():
+        try:
+            stats['imported'] += len(chunk)
+            insert_chunk(chunk, classify_missing, on_chunk)
+        except SQLAlchemyError as e:
+            logger.error(f"Database error inserting {len(chunk)} reviews: {e}")
+            db.session.rollback()
+            stats['imported'] -= len(chunk)
+            stats['errors'] += len(chunk)
+            raise ChunkFailed(str(e)) from e
+        chunk.clear()
+
+    try:
+        for review_data in records:
+            stats['total'] += 1
             try:
-                db.session.commit()
-            except SQLAlchemyError as e:
-                logger.error(f"Database error: {e}")
-                db.session.rollback()
+                row = build_review_row(review_data, business.id, classify_missing, tagger)
+            except Exception as e:
+                logger.error(f"Error processing review: {e}")
+                stats['errors'] += 1
+                continue
+
+            if row['created_at'] in existing:
+                stats['skipped'] += 1
+                continue
+            existing.add(row['created_at'])
+
+            if row['contact_info']:
+                stats['with_contact'] += 1
+            if row['improvement_feedback']:
+                stats['with_improvement'] += 1
+
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                flush()
+        if chunk:
+            flush()
+    finally:
+        # Whether the records ran out, the reader failed or a chunk was
+        # refused, the chunks committed so far need their aggregates
+        db.session.rollback()
+        rebuild_business_stats(db.session.connection(), business.id)
+        rebuild_daily_rollups(db.session.connection(), business.id)
+        db.session.commit()
+
+    elapsed = time.perf_counter() - started
+    stats['seconds'] = round(elapsed, 3)
+    stats['rows_per_second'] = round(stats['total'] / elapsed) if elapsed > 0 else 0
+    return stats
+
+def log_import_stats(stats):
+    logger.info("\nImport completed!")
+    logger.info(f"Successfully imported: {stats['imported']} reviews")
+    logger.info(f"Skipped (already exist): {stats['skipped']} reviews")
+    logger.info(f"Reviews with contact info: {stats['with_contact']}")
+    logger.info(f"Reviews with improvement feedback: {stats['with_improvement']}")
+    logger.info(f"Reviews with responses: {stats['with_responses']}")
+    logger.info(f"Errors encountered: {stats['errors']}")
+    logger.info(f"Total reviews processed: {stats['total']}")
+    logger.info(f"Throughput: {stats['rows_per_second']} rows/s ({stats['seconds']} s)")
+
+def resolve_business(reference):
+    """Find a business by id or by name."""
+    if str(reference).isdigit():
+        return db.session.get(Business, int(reference))
+    return Business.query.filter_by(name=reference).first()
+
+def run_import(business_ref, path, format=None, chunk_size=DEFAULT_CHUNK_SIZE, resume=False,
+               delete_existing=False, classify_missing=False):
+    """Stream-import a JSON, NDJSON or CSV file, checkpointing progress in the database.
+
+    With resume, an unfinished import of the same file for the same business
+    continues from its last committed chunk instead of starting over.
+    """
+    with app.app_context():
+        db.create_all()
+        business = resolve_business(business_ref)
+        if not business:
+            logger.error(f"Business '{business_ref}' not found!")
+            return
+        if not os.path.exists(path):
+            logger.error(f"{path} file not found!")
+            return
+
+        source_path = os.path.abspath(path)
+        format = format or detect_format(path)
+        checkpoint = ImportCheckpoint.query.filter_by(source_path=source_path, business_id=business.id).first()
+
+        start = 0
+        records_before = 0
+        if resume and checkpoint and checkpoint.format == format:
+            if checkpoint.status == 'completed':
+                logger.info(f"{path} was already imported completely; nothing to resume")
                 return
+            start = checkpoint.position
+            records_before = checkpoint.records
+            logger.info(f"Resuming {path} after {records_before} records")
+
+        if delete_existing and not start:
+            Review.query.filter_by(business_id=business.id).delete()
+            rebuild_business_stats(db.session.connection(), business.id)
+            rebuild_daily_rollups(db.session.connection(), business.id)
+            logger.info("Deleted existing reviews")
 
-            # Log statistics
-            logger.info("\nImport completed!")
-            logger.info(f"Successfully imported: {stats['imported']} reviews")
-            logger.info(f"Skipped (already exist): {stats['skipped']} reviews")
-            logger.info(f"Reviews with contact info: {stats['with_contact']}")
-            logger.info(f"Reviews with improvement feedback: {stats['with_improvement']}")
-            logger.info(f"Reviews with responses: {stats['with_responses']}")
-            logger.info(f"Errors encountered: {stats['errors']}")
-            logger.info(f"Total reviews processed: {stats['total']}")
+        if checkpoint is None:
+            checkpoint = ImportCheckpoint(source_path=source_path, business_id=business.id, format=format)
+            db.session.add(checkpoint)
+        if not start:
+            checkpoint.imported = 0
+        checkpoint.format = format
+        checkpoint.position = start
+        checkpoint.records = records_before
+        checkpoint.status = 'running'
+        db.session.commit()
 
+        reader = open_reader(path, format, start)
+
+        def save_checkpoint(rows=()):
+            checkpoint.position = reader.position
+            checkpoint.records = records_before + reader.records
+            checkpoint.imported = (checkpoint.imported or 0) + len(rows)
+
+        try:
+            stats = import_records(reader, business, chunk_size, classify_missing, on_chunk=save_checkpoint)
+        except ValueError as e:
+            logger.error(f"Invalid {format} data in {path}: {e}")
+            return
+        except ChunkFailed:
+            logger.error(f"Import of {path} stopped after {checkpoint.records} records; "
+                         f"fix the error and rerun with --resume to continue from there")
+            return
+
+        save_checkpoint()
+        checkpoint.status = 'completed'
+        db.session.commit()
+
+        stats['errors'] += reader.errors
+        log_import_stats(stats)
+        return stats
+
+def import_reviews(delete_existing=False, classify_missing=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Import reviews from reviews.json into the Keem Smile Dentistry business.
+
+    With classify_missing, records without a stored sentiment are classified
+    in batches instead of defaulting to neutral.
+    """
+    try:
+        return run_import("Keem Smile Dentistry", 'reviews.json', 'json', chunk_size,
+                          delete_existing=delete_existing, classify_missing=classify_missing)
     except Exception as e:
         logger.error(f"Import failed: {e}")
 
 if __name__ == '__main__':
-    import_reviews(delete_existing=True)
+    parser = argparse.ArgumentParser(description='Import reviews from a JSON, NDJSON or CSV file.')
+    parser.add_argument('file', nargs='?', default='reviews.json', help='file to import (default: reviews.json)')
+    parser.add_argument('--business', default='Keem Smile Dentistry', help='business name or id')
+    parser.add_argument('--format', choices=sorted(READERS), help='file format (default: from the extension)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='rows per insert and commit')
+    parser.add_argument('--resume', action='store_true', help='continue an interrupted import of the same file')
+    parser.add_argument('--delete-existing', action='store_true', help="delete the business's reviews first")
+    parser.add_argument('--classify-missing', action='store_true',
+                        help='classify records without a sentiment instead of defaulting to neutral')
+    args = parser.parse_args()
+
+    run_import(args.business, args.file, args.format, args.chunk_size, args.resume,
+               args.delete_existing, args.classify_missing)
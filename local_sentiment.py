@@ -0,0 +1,87 @@
+import re
+
+# Word polarities, tuned for patient reviews of a dental practice
+POSITIVE_WORDS = {
+    'amazing': 3, 'awesome': 3, 'excellent': 3, 'exceptional': 3, 'fantastic': 3, 'outstanding': 3,
+    'perfect': 3, 'wonderful': 3, 'best': 3, 'love': 3, 'loved': 3, 'incredible': 3,
+    'great': 2, 'recommend': 2, 'recommended': 2, 'happy': 2, 'pleased': 2, 'satisfied': 2,
+    'painless': 2, 'caring': 2, 'gentle': 2, 'professional': 2, 'friendly': 2, 'kind': 2,
+    'thorough': 2, 'helpful': 2, 'comfortable': 2, 'impressed': 2, 'thank': 2, 'thanks': 2,
+    'good': 1, 'nice': 1, 'clean': 1, 'modern': 1, 'quick': 1, 'efficient': 1, 'easy': 1,
+    'polite': 1, 'patient': 1, 'welcoming': 1, 'reasonable': 1, 'affordable': 1, 'fine': 1,
+    'clear': 1, 'clearly': 1, 'prompt': 1, 'attentive': 1, 'relaxed': 1, 'return': 1
+}
+NEGATIVE_WORDS = {
+    'terrible': 3, 'horrible': 3, 'awful': 3, 'worst': 3, 'rude': 3, 'disgusting': 3,
+    'unprofessional': 3, 'nightmare': 3, 'hate': 3, 'incompetent': 3, 'scam': 3,
+    'bad': 2, 'poor': 2, 'painful': 2, 'pain': 2, 'hurt': 2, 'hurts': 2, 'disappointed': 2,
+    'disappointing': 2, 'dirty': 2, 'overpriced': 2, 'expensive': 2, 'avoid': 2, 'careless': 2,
+    'unhappy': 2, 'angry': 2, 'mistake': 2, 'complaint': 2, 'refund': 2, 'ignored': 2,
+    'wait': 1, 'waited': 1, 'waiting': 1, 'late': 1, 'slow': 1, 'delay': 1, 'delayed': 1,
+    'long': 1, 'confusing': 1, 'cold': 1, 'rushed': 1, 'uncomfortable': 1, 'problem': 1,
+    'issue': 1, 'issues': 1, 'cancelled': 1, 'canceled': 1, 'unclear': 1
+}
+NEGATORS = {'not', 'no', 'never', 'hardly', 'barely', 'without', 'nothing', 'none', 'nobody'}
+INTENSIFIERS = {
+    'very': 1.5, 'extremely': 2.0, 'really': 1.5, 'so': 1.3, 'super': 1.5, 'incredibly': 2.0,
+    'absolutely': 1.8, 'highly': 1.5, 'totally': 1.5, 'truly': 1.5, 'most': 1.3
+}
+CONTRAST_WORDS = {'but', 'however', 'although', 'though', 'yet'}
+NEGATION_SCOPE = 3  # tokens a negator affects
+NEUTRAL_BAND = 0.34  # |polarity| below this is mixed/neutral
+
+TOKEN_PATTERN = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+def score_text(text):
+    """Return (positive_weight, negative_weight) for a piece of text."""
+    positive = 0.0
+    negative = 0.0
+    negate_left = 0
+    boost = 1.0
+
+    for token in TOKEN_PATTERN.findall((text or '').lower()):
+        if token in CONTRAST_WORDS:
+            # What follows "but" usually carries the reviewer's real opinion
+            positive *= 0.5
+            negative *= 0.5
+            negate_left = 0
+            boost = 1.0
+            continue
+        if token in NEGATORS or token.endswith("n't"):
+            negate_left = NEGATION_SCOPE
+            continue
+        if token in INTENSIFIERS:
+            boost = INTENSIFIERS[token]
+            continue
+
+        weight = POSITIVE_WORDS.get(token, 0) - NEGATIVE_WORDS.get(token, 0)
+        if weight:
+            weight *= boost
+            if negate_left:
+                weight = -weight * 0.75  # "not great" is weaker than "bad"
+            if weight > 0:
+                positive += weight
+            else:
+                negative -= weight
+            boost = 1.0
+        if negate_left:
+            negate_left -= 1
+
+    return positive, negative
+
+def classify(text):
+    """Classify text locally. Returns (sentiment, confidence) with confidence in [0, 1]."""
+    positive, negative = score_text(text)
+    total = positive + negative
+    if total == 0:
+        return 'neutral', 0.3
+
+    polarity = (positive - negative) / total
+    strength = total / (total + 1.5)  # more evidence, more confidence
+    if abs(polarity) < NEUTRAL_BAND:
+        return 'neutral', round((1 - abs(polarity)) * strength * 0.7, 3)
+    return ('positive' if polarity > 0 else 'negative'), round(abs(polarity) * strength, 3)
+
+def classify_batch(texts):
+    """Classify a list of texts. Returns a list of (sentiment, confidence)."""
+    return [classify(text) for text in texts]
@@ -0,0 +1,316 @@
+"""Request, SQL and OpenAI metrics in the Prometheus text format.
+
+Every request is timed per endpoint, and every SQL statement through any
+SQLAlchemy engine is counted and timed, in total and per request. The
+OpenAI client in sentiment.py records call latency, retries and
+fallbacks. When the endpoint is scraped, the rate limiter, the caches,
+the OpenAI governor, group commit and the sentiment outbox report their
+current counters. Recording a value costs a lock and a few arithmetic
+operations, so the metrics stay on in production.
+
+GET /metrics needs METRICS_TOKEN as a bearer token (for Prometheus:
+``authorization: {credentials: <token>}``) or a platform admin session.
+Counters live in each process: with several worker processes, scrape each
+one or read them as samples of the whole.
+
+Environment:
+    METRICS_TOKEN    bearer token for GET /metrics (unset: platform admins only)
+"""
+import hmac
+import os
+import threading
+import time
+from bisect import bisect_left
+from flask import Response, g, has_request_context, jsonify, request, request_started
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SQL_STATEMENTS = ('SELECT', 'INSERT', 'UPDATE', 'DELETE')
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for value in labels.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+class Counter:
+
+    type = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield self.name, dict(zip(self.labels, key)), value
+
+class Histogram:
+
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}  # label values -> [count per bucket (the last is +Inf), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        for key, (counts, total) in sorted(values.items()):
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield f'{self.name}_bucket', dict(labels, le=format_value(float(bound))), cumulative
+            yield f'{self.name}_sum', labels, round(total, 6)
+            yield f'{self.name}_count', labels, cumulative
+
+class Registry:
+    """Metrics recorded here, plus collectors that report values owned elsewhere at scrape time.
+
+    A collector returns (name, type, help, [(labels, value), ...]) tuples.
+    """
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, name, help, labels=()):
+        metric = Counter(name, help, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        self.collectors.append(collector)
+        return collector
+
+    def render(self):
+        lines = []
+
+        def family(name, type, help, samples):
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {type}')
+            for sample_name, labels, value in samples:
+                lines.append(f'{sample_name}{format_labels(labels)} {format_value(value)}')
+
+        for metric in self.metrics:
+            family(metric.name, metric.type, metric.help, metric.samples())
+        for collector in self.collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                print(f"Error collecting metrics from {collector.__name__}: {e}")
+                continue
+            for name, type, help, samples in families:
+                family(name, type, help, ((name, labels, value) for labels, value in samples))
+        return '\n'.join(lines) + '\n'
+
+registry = Registry()
+
+http_request_seconds = registry.histogram(
+    'http_request_duration_seconds', 'Time to handle a request, until the response is returned',
+    ('endpoint', 'method'))
+http_requests = registry.counter('http_requests_total', 'Requests handled', ('endpoint', 'method', 'status'))
+request_sql_statements = registry.histogram(
+    'http_request_sql_statements', 'SQL statements run while handling a request', ('endpoint',), COUNT_BUCKETS)
+request_sql_seconds = registry.histogram(
+    'http_request_sql_duration_seconds', 'Time spent in SQL while handling a request', ('endpoint',))
+sql_statement_seconds = registry.histogram(
+    'sql_statement_duration_seconds', 'Time to execute a SQL statement, in requests and background work',
+    ('statement',))
+openai_request_seconds = registry.histogram(
+    'openai_request_duration_seconds', 'OpenAI chat completion calls by kind and outcome', ('kind', 'outcome'))
+openai_retries = registry.counter('openai_retries_total', 'OpenAI calls repeated after a failure', ('reason',))
+sentiment_fallbacks = registry.counter(
+    'sentiment_fallbacks_total', 'Sentiments not answered by the first choice of method', ('fallback',))
+sentiment_jobs = registry.counter('sentiment_jobs_total', 'Sentiment outbox jobs processed', ('outcome',))
+
+PROCESS_STARTED = time.time()
+
+def statement_kind(statement):
+    word = statement.lstrip()[:6].upper()
+    return word if word in SQL_STATEMENTS else 'OTHER'
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def record_statement(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('metrics_started')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    sql_statement_seconds.observe(elapsed, statement=statement_kind(statement))
+    if has_request_context() and 'metrics_sql' in g:
+        g.metrics_sql[0] += 1
+        g.metrics_sql[1] += elapsed
+
+@event.listens_for(Engine, 'handle_error')
+def discard_statement_timer(context):
+    # A failed statement never reaches after_cursor_execute
+    if context.connection is not None and context.connection.info.get('metrics_started'):
+        context.connection.info['metrics_started'].pop()
+
+def authorized():
+    token = os.getenv('METRICS_TOKEN')
+    header = request.headers.get('Authorization', '')
+    if token and header.startswith('Bearer ') and hmac.compare_digest(header[7:].encode(), token.encode()):
+        return True
+    return current_user.is_authenticated and current_user.role == 'platform_admin'
+
+def metrics_view():
+    if not authorized():
+        return jsonify({'error': 'Access denied.'}), 403
+    return Response(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def start_request_timer(sender, **extra):
+    g.metrics_started = time.perf_counter()
+    g.metrics_sql = [0, 0.0]  # statements, seconds
+
+def init_app(app, group_committer=None):
+    """Time app's requests and serve the registry at /metrics."""
+    # The signal comes before URL value preprocessors, so their 404s are timed too
+    request_started.connect(start_request_timer, app)
+
+    def record(status):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        endpoint = request.endpoint or 'unmatched'
+        http_request_seconds.observe(time.perf_counter() - started, endpoint=endpoint, method=request.method)
+        http_requests.inc(endpoint=endpoint, method=request.method, status=status)
+        statements, seconds = g.pop('metrics_sql')
+        request_sql_statements.observe(statements, endpoint=endpoint)
+        request_sql_seconds.observe(seconds, endpoint=endpoint)
+
+    @app.after_request
+    def record_request(response):
+        record(str(response.status_code))
+        return response
+
+    @app.teardown_request
+    def record_failed_request(error):
+        # after_request is skipped when a view raises and no error handler answers
+        if error is not None:
+            record('500')
+
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+
+    if group_committer is not None:
+        @registry.add_collector
+        def group_commit_metrics():
+            stats = group_committer.stats()
+            return [
+                ('group_commit_batches_total', 'counter', 'Transactions written by the group committer',
+                 [({}, stats['batches'])]),
+                ('group_commit_reviews_total', 'counter', 'Reviews written by the group committer',
+                 [({}, stats['committed'])]),
+                ('group_commit_queued', 'gauge', 'Reviews waiting for the next group commit',
+                 [({}, stats['queued'])])
+            ]
+
+@registry.add_collector
+def process_metrics():
+    return [('process_start_time_seconds', 'gauge', 'Start time of the process since the epoch',
+             [({}, round(PROCESS_STARTED, 3))])]
+
+@registry.add_collector
+def rate_limit_metrics():
+    from rate_limit import limiter
+    return [
+        ('rate_limit_rejections_total', 'counter', 'Requests refused by a rate limit', [({}, limiter.rejections)]),
+        ('rate_limit_backend_errors_total', 'counter', 'Requests let through because the counter store failed',
+         [({}, limiter.errors)])
+    ]
+
+@registry.add_collector
+def cache_metrics():
+    from sentiment import sentiment_cache
+    from user_cache import user_cache
+    from tenants import tenant_cache
+    stats = sentiment_cache.stats()
+    return [
+        ('sentiment_cache_lookups_total', 'counter', 'Sentiment cache lookups by result', [
+            ({'result': 'memory_hit'}, stats['memory_hits']),
+            ({'result': 'persistent_hit'}, stats['persistent_hits']),
+            ({'result': 'miss'}, stats['misses'])
+        ]),
+        ('user_cache_lookups_total', 'counter', 'Logged-in user lookups by result', [
+            ({'result': 'hit'}, user_cache.hits),
+            ({'result': 'miss'}, user_cache.misses)
+        ]),
+        ('tenant_cache_loads_total', 'counter', 'Reloads of the business list for the tenant resolver',
+         [({}, tenant_cache.loads)])
+    ]
+
+@registry.add_collector
+def openai_governor_metrics():
+    from sentiment import openai_governor
+    stats = openai_governor.stats()
+    process = stats['process']
+    return [
+        ('openai_governor_queue_depth', 'gauge', 'Callers on the host waiting for OpenAI capacity',
+         [({}, stats['queue_depth'])]),
+        ('openai_governor_in_flight', 'gauge', 'OpenAI requests in progress on the host', [({}, stats['in_flight'])]),
+        ('openai_governor_requests_last_minute', 'gauge', 'OpenAI requests admitted on the host in the last minute',
+         [({}, stats['requests_last_minute'])]),
+        ('openai_governor_tokens_last_minute', 'gauge', 'OpenAI tokens charged on the host in the last minute',
+         [({}, stats['tokens_last_minute'])]),
+        ('openai_governor_paused_seconds', 'gauge', 'Seconds left of a host-wide pause after a 429',
+         [({}, stats['paused_for'])]),
+        ('openai_governor_admitted_total', 'counter', 'OpenAI requests this process was allowed to make',
+         [({}, process['admitted'])]),
+        ('openai_governor_timeouts_total', 'counter', 'Callers in this process that gave up waiting for capacity',
+         [({}, process['timeouts'])])
+    ]
+
+@registry.add_collector
+def sentiment_outbox_metrics():
+    from sqlalchemy import func
+    from models import db, SentimentJob
+    # Count through the status index instead of grouping the whole table
+    counts = [({'status': status},
+               db.session.query(func.count(SentimentJob.id)).filter(SentimentJob.status == status).scalar())
+              for status in ('queued', 'processing')]
+    return [('sentiment_jobs', 'gauge', 'Sentiment outbox jobs waiting or in progress, by status', counts)]
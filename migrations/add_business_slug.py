@@ -0,0 +1,55 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, db
+from sqlalchemy import text
+from tenants import unique_slug
+
+def upgrade():
+    """Add business.slug, fill it from the business names and make it unique."""
+    with app.app_context():
+        try:
+            db.session.execute(text('ALTER TABLE business ADD COLUMN slug VARCHAR(100)'))
+            print("Added slug column")
+        except Exception as e:
+            print(f"Error adding slug column: {e}")
+
+        try:
+            connection = db.session.connection()
+            rows = connection.execute(text('SELECT id, name FROM business WHERE slug IS NULL ORDER BY id')).all()
+            for business_id, name in rows:
+                slug = unique_slug(connection, name, exclude_id=business_id)
+                connection.execute(text('UPDATE business SET slug = :slug WHERE id = :id'),
+                                   {'slug': slug, 'id': business_id})
+                print(f"Business {business_id}: /b/{slug}/")
+        except Exception as e:
+            print(f"Error filling slugs: {e}")
+
+        try:
+            db.session.execute(text('CREATE UNIQUE INDEX IF NOT EXISTS ix_business_slug ON business (slug)'))
+            print("Created index ix_business_slug")
+        except Exception as e:
+            print(f"Error creating index ix_business_slug: {e}")
+
+        db.session.commit()
+        print("Migration completed successfully!")
+
+def downgrade():
+    """Remove business.slug."""
+    with app.app_context():
+        try:
+            db.session.execute(text('DROP INDEX IF EXISTS ix_business_slug'))
+            db.session.execute(text('ALTER TABLE business DROP COLUMN slug'))
+            print("Dropped slug column")
+        except Exception as e:
+            print(f"Error dropping slug column: {e}")
+
+        db.session.commit()
+        print("Downgrade completed successfully!")
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'downgrade':
+        downgrade()
+    else:
+        upgrade()
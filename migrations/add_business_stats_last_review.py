@@ -0,0 +1,45 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, db
+from sqlalchemy import text
+
+def upgrade():
+    """Add last_review_at to business_stats and fill it from the review table."""
+    with app.app_context():
+        try:
+            db.session.execute(text('ALTER TABLE business_stats ADD COLUMN last_review_at DATETIME'))
+            print("Added last_review_at column")
+        except Exception as e:
+            print(f"Error adding last_review_at column: {e}")
+
+        try:
+            db.session.execute(text(
+                'UPDATE business_stats SET last_review_at = '
+                '(SELECT MAX(created_at) FROM review WHERE review.business_id = business_stats.business_id)'
+            ))
+            print("Updated last_review_at values")
+        except Exception as e:
+            print(f"Error updating last_review_at values: {e}")
+
+        db.session.commit()
+        print("Migration completed successfully!")
+
+def downgrade():
+    """Remove last_review_at from business_stats."""
+    with app.app_context():
+        try:
+            db.session.execute(text('ALTER TABLE business_stats DROP COLUMN last_review_at'))
+            print("Dropped last_review_at column")
+        except Exception as e:
+            print(f"Error dropping last_review_at column: {e}")
+
+        db.session.commit()
+        print("Downgrade completed successfully!")
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'downgrade':
+        downgrade()
+    else:
+        upgrade()
@@ -0,0 +1,36 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, db
+from sqlalchemy import text
+
+def upgrade():
+    """Add the per-business tag taxonomy column."""
+    with app.app_context():
+        try:
+            db.session.execute(text('ALTER TABLE business ADD COLUMN tag_taxonomy JSON'))
+            print("Added tag_taxonomy column")
+        except Exception as e:
+            print(f"Error adding tag_taxonomy column: {e}")
+
+        db.session.commit()
+        print("Migration completed successfully!")
+
+def downgrade():
+    """Remove the per-business tag taxonomy column."""
+    with app.app_context():
+        try:
+            db.session.execute(text('ALTER TABLE business DROP COLUMN tag_taxonomy'))
+            print("Dropped tag_taxonomy column")
+        except Exception as e:
+            print(f"Error dropping tag_taxonomy column: {e}")
+
+        db.session.commit()
+        print("Downgrade completed successfully!")
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'downgrade':
+        downgrade()
+    else:
+        upgrade()
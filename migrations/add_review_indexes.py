@@ -0,0 +1,50 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, db
+from sqlalchemy import text
+
+# Composite indexes for the per-business listings, filters, import dedup and
+# "latest review" lookups. Keep in sync with __table_args__ in models.py.
+INDEXES = [
+    ('ix_review_business_created', 'review', 'business_id, created_at, id'),
+    ('ix_review_business_status_created', 'review', 'business_id, status, created_at, id'),
+    ('ix_review_business_rating_created', 'review', 'business_id, rating, created_at, id'),
+    ('ix_review_business_sentiment_created', 'review', 'business_id, sentiment, created_at, id'),
+    ('ix_user_business_role', 'user', 'business_id, role'),
+    ('ix_review_response_review_id', 'review_response', 'review_id'),
+]
+
+def upgrade():
+    """Create the review query indexes."""
+    with app.app_context():
+        for name, table, columns in INDEXES:
+            try:
+                db.session.execute(text(f'CREATE INDEX IF NOT EXISTS {name} ON "{table}" ({columns})'))
+                print(f"Created index {name}")
+            except Exception as e:
+                print(f"Error creating index {name}: {e}")
+
+        db.session.execute(text('ANALYZE'))
+        db.session.commit()
+        print("Migration completed successfully!")
+
+def downgrade():
+    """Drop the review query indexes."""
+    with app.app_context():
+        for name, _, _ in INDEXES:
+            try:
+                db.session.execute(text(f'DROP INDEX IF EXISTS {name}'))
+                print(f"Dropped index {name}")
+            except Exception as e:
+                print(f"Error dropping index {name}: {e}")
+
+        db.session.commit()
+        print("Downgrade completed successfully!")
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'downgrade':
+        downgrade()
+    else:
+        upgrade()
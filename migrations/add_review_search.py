@@ -0,0 +1,47 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, db
+from review_search import search_available, create_search_index, drop_search_index, rebuild_search_index
+
+def upgrade():
+    """Create the review full-text index and its triggers, and index existing reviews."""
+    with app.app_context():
+        connection = db.session.connection()
+        if not search_available(connection):
+            print("Full-text search needs SQLite; skipping")
+            return
+        try:
+            create_search_index(connection)
+            print("Created review_fts index and triggers")
+            rebuild_search_index(connection)
+            print("Indexed existing reviews")
+        except Exception as e:
+            print(f"Error creating search index: {e}")
+            db.session.rollback()
+            return
+
+        db.session.commit()
+        print("Migration completed successfully!")
+
+def downgrade():
+    """Drop the review full-text index and its triggers."""
+    with app.app_context():
+        connection = db.session.connection()
+        if not search_available(connection):
+            return
+        try:
+            drop_search_index(connection)
+            print("Dropped review_fts index and triggers")
+        except Exception as e:
+            print(f"Error dropping search index: {e}")
+
+        db.session.commit()
+        print("Downgrade completed successfully!")
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'downgrade':
+        downgrade()
+    else:
+        upgrade()
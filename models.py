@@ -1,7 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from datetime import datetime
-from sqlalchemy.dialects.sqlite import JSON
+import hashlib
+from sqlalchemy import JSON
 
 db = SQLAlchemy()
 
@@ -14,16 +15,29 @@ class User(UserMixin, db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     business_id = db.Column(db.Integer, db.ForeignKey('business.id'), nullable=True)
 
+    __table_args__ = (
+        db.Index('ix_user_business_role', 'business_id', 'role'),
+    )
+
     # Relationships
     business = db.relationship('Business', back_populates='users')
 
+    def get_id(self):
+        # Sessions also name the password, so changing it signs out every other session
+        return f'{self.id}:{password_fingerprint(self.password)}'
+
+def password_fingerprint(password_hash):
+    return hashlib.sha256(password_hash.encode()).hexdigest()[:16]
+
 class Business(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
+    slug = db.Column(db.String(100), unique=True, index=True)  # public URL /b/<slug>/; set from name on insert
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
     branding_color = db.Column(db.String(7), default="#007bff")  # Hex color code
     logo_url = db.Column(db.String(200))
+    tag_taxonomy = db.Column(JSON, nullable=True)  # {tag: [keywords]}; None uses tagging.DEFAULT_TAXONOMY
     
     # Relationships
     users = db.relationship('User', back_populates='business')
@@ -46,6 +60,14 @@ class Review(db.Model):
     improvement_feedback = db.Column(db.Text, nullable=True)
     tags = db.Column(JSON, nullable=True)  # Stores tags as JSON array
     priority = db.Column(db.String(20), default='normal')  # low, normal, high, urgent
+
+    # Listings are per business, newest first, optionally filtered (see migrations/add_review_indexes.py)
+    __table_args__ = (
+        db.Index('ix_review_business_created', 'business_id', 'created_at', 'id'),
+        db.Index('ix_review_business_status_created', 'business_id', 'status', 'created_at', 'id'),
+        db.Index('ix_review_business_rating_created', 'business_id', 'rating', 'created_at', 'id'),
+        db.Index('ix_review_business_sentiment_created', 'business_id', 'sentiment', 'created_at', 'id'),
+    )
     
     # Relationships
     business = db.relationship('Business', back_populates='reviews')
@@ -55,9 +77,90 @@ class ReviewResponse(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     text = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    review_id = db.Column(db.Integer, db.ForeignKey('review.id'), nullable=False)
+    review_id = db.Column(db.Integer, db.ForeignKey('review.id'), nullable=False, index=True)
     responder_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     
     # Relationships
     review = db.relationship('Review', back_populates='response')
     responder = db.relationship('User')
+
+class SentimentJob(db.Model):
+    """Outbox entry for sentiment classification that still has to happen."""
+    id = db.Column(db.Integer, primary_key=True)
+    review_id = db.Column(db.Integer, db.ForeignKey('review.id'), nullable=False)
+    status = db.Column(db.String(20), default='queued')  # queued, processing; done jobs are deleted
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    completed_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_sentiment_job_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+    # Relationships
+    review = db.relationship('Review')
+
+class BusinessStats(db.Model):
+    """Running review aggregates for a business, maintained by review_stats."""
+    business_id = db.Column(db.Integer, db.ForeignKey('business.id'), primary_key=True)
+    review_count = db.Column(db.Integer, default=0, nullable=False)
+    rating_sum = db.Column(db.Integer, default=0, nullable=False)
+    rating_1 = db.Column(db.Integer, default=0, nullable=False)
+    rating_2 = db.Column(db.Integer, default=0, nullable=False)
+    rating_3 = db.Column(db.Integer, default=0, nullable=False)
+    rating_4 = db.Column(db.Integer, default=0, nullable=False)
+    rating_5 = db.Column(db.Integer, default=0, nullable=False)
+    status_new = db.Column(db.Integer, default=0, nullable=False)
+    status_read = db.Column(db.Integer, default=0, nullable=False)
+    status_responded = db.Column(db.Integer, default=0, nullable=False)
+    priority_high = db.Column(db.Integer, default=0, nullable=False)
+    priority_urgent = db.Column(db.Integer, default=0, nullable=False)
+    sentiment_positive = db.Column(db.Integer, default=0, nullable=False)
+    sentiment_neutral = db.Column(db.Integer, default=0, nullable=False)
+    sentiment_negative = db.Column(db.Integer, default=0, nullable=False)
+    sentiment_pending = db.Column(db.Integer, default=0, nullable=False)
+    last_review_at = db.Column(db.DateTime, nullable=True)
+
+    @property
+    def avg_rating(self):
+        return self.rating_sum / self.review_count if self.review_count else 0
+
+class BusinessStatCounter(db.Model):
+    """Per-business review counts keyed by a source or a tag."""
+    business_id = db.Column(db.Integer, db.ForeignKey('business.id'), primary_key=True)
+    dimension = db.Column(db.String(20), primary_key=True)  # source, tag
+    key = db.Column(db.String(100), primary_key=True)
+    count = db.Column(db.Integer, default=0, nullable=False)
+    rating_sum = db.Column(db.Integer, default=0, nullable=False)
+
+class ReviewDailyRollup(db.Model):
+    """Review volume, rating and sentiment totals per business, day and source."""
+    business_id = db.Column(db.Integer, db.ForeignKey('business.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    source = db.Column(db.String(50), primary_key=True, default='')  # '' when the review has no source
+    review_count = db.Column(db.Integer, default=0, nullable=False)
+    rating_sum = db.Column(db.Integer, default=0, nullable=False)
+    sentiment_positive = db.Column(db.Integer, default=0, nullable=False)
+    sentiment_neutral = db.Column(db.Integer, default=0, nullable=False)
+    sentiment_negative = db.Column(db.Integer, default=0, nullable=False)
+    sentiment_pending = db.Column(db.Integer, default=0, nullable=False)
+
+class ImportCheckpoint(db.Model):
+    """How far an import of a file has got, so an interrupted run can resume."""
+    id = db.Column(db.Integer, primary_key=True)
+    source_path = db.Column(db.String(500), nullable=False)
+    business_id = db.Column(db.Integer, db.ForeignKey('business.id'), nullable=False)
+    format = db.Column(db.String(10), nullable=False)  # json, ndjson, csv
+    position = db.Column(db.BigInteger, default=0, nullable=False)  # byte offset (ndjson) or records (json, csv)
+    records = db.Column(db.Integer, default=0, nullable=False)
+    imported = db.Column(db.Integer, default=0, nullable=False)
+    status = db.Column(db.String(20), default='running')  # running, completed
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('source_path', 'business_id', name='uq_import_checkpoint_source_business'),
+    )
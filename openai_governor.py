@@ -0,0 +1,267 @@
+"""Host-wide admission control for OpenAI requests.
+
+Every process on the host shares one SQLite file. Through it they
+enforce requests per minute, tokens per minute and a cap on requests in
+flight, all together. A caller takes a ticket and waits in line until the
+budget allows its request. Tickets are served strictly in arrival order,
+and the caller gives up with GovernorTimeout once its deadline passes.
+Waiting callers block on a condition that is signalled when a request in
+this process finishes, and poll the shared state for the rest. The wait
+ends as soon as a request can go out, not after a fixed sleep.
+
+A 429 from OpenAI pauses admission for every process (see pause), and
+stats() reports queue depth, usage and wait times.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'openai_governor.db')
+
+WINDOW = 60  # seconds covered by the per-minute budgets
+LEASE_SECONDS = 120  # a request still in flight after this long is assumed dead
+TICKET_STALE_SECONDS = 5  # tickets of waiters that stopped polling are dropped
+MIN_POLL, MAX_POLL = 0.01, 0.25
+
+class GovernorTimeout(Exception):
+    pass
+
+class Permit:
+    """Permission to send one request; release it when the response arrives."""
+
+    def __init__(self, governor, lease_id, grant_id, waited):
+        self.governor = governor
+        self.lease_id = lease_id
+        self.grant_id = grant_id
+        self.waited = waited
+        self.tokens_used = None
+
+    def record_usage(self, tokens):
+        """Replace the estimated token count with what the response reported."""
+        self.tokens_used = tokens
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.governor.release(self)
+
+class OpenAIGovernor:
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, requests_per_minute=50, tokens_per_minute=40000,
+                 max_concurrency=4, timeout=30):
+        self.db_path = db_path
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._local = threading.local()
+        self._released = threading.Condition()
+        self._stats_lock = threading.Lock()
+        self._waits = deque(maxlen=1000)  # seconds waited by recently admitted requests
+        self.waiting = 0
+        self.admitted = 0
+        self.timeouts = 0
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            if self.db_path != ':memory:':
+                os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS governor_ticket (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT, tokens INTEGER NOT NULL, seen_at REAL NOT NULL);
+                CREATE TABLE IF NOT EXISTS governor_lease (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT, expires_at REAL NOT NULL);
+                CREATE TABLE IF NOT EXISTS governor_grant (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT, granted_at REAL NOT NULL, tokens INTEGER NOT NULL);
+                CREATE INDEX IF NOT EXISTS ix_governor_grant_granted_at ON governor_grant (granted_at);
+                CREATE TABLE IF NOT EXISTS governor_state (key TEXT PRIMARY KEY, value REAL NOT NULL);
+            ''')
+            self._local.conn = conn
+        return conn
+
+    def _take_ticket(self, tokens):
+        conn = self._connection()
+        return conn.execute(
+            'INSERT INTO governor_ticket (tokens, seen_at) VALUES (?, ?)', (tokens, time.time())
+        ).lastrowid
+
+    def _drop_ticket(self, ticket):
+        self._connection().execute('DELETE FROM governor_ticket WHERE id = ?', (ticket,))
+
+    def _touch_ticket(self, ticket):
+        """Tell other processes this waiter is still polling; returns the time recorded."""
+        now = time.time()
+        self._connection().execute('UPDATE governor_ticket SET seen_at = ? WHERE id = ?', (now, ticket))
+        return now
+
+    def _check_admission(self, conn, ticket, tokens, now):
+        """(True, None) if ticket is first in line and the budgets allow it, else (False, seconds to wait)."""
+        head = conn.execute(
+            'SELECT MIN(id) FROM governor_ticket WHERE seen_at >= ?', (now - TICKET_STALE_SECONDS,)
+        ).fetchone()[0]
+        if head != ticket:
+            return False, MIN_POLL
+
+        row = conn.execute("SELECT value FROM governor_state WHERE key = 'paused_until'").fetchone()
+        if row and row[0] > now:
+            return False, row[0] - now
+
+        in_flight = conn.execute('SELECT COUNT(*) FROM governor_lease WHERE expires_at >= ?', (now,)).fetchone()[0]
+        if in_flight >= self.max_concurrency:
+            return False, MAX_POLL
+
+        requests, used_tokens, oldest = conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(tokens), 0), MIN(granted_at) FROM governor_grant WHERE granted_at > ?',
+            (now - WINDOW,)
+        ).fetchone()
+        if requests + 1 > self.requests_per_minute or used_tokens + tokens > self.tokens_per_minute:
+            # Budget frees up as the oldest grants leave the window
+            return False, oldest + WINDOW - now
+        return True, None
+
+    def _try_admit(self, ticket, tokens):
+        """Admit ticket if it is first in line and the budgets allow it.
+
+        Returns (lease_id, grant_id) on success, or (None, seconds to wait).
+        Waiters check in a read transaction, which in WAL mode runs alongside
+        everyone else. The write lock is taken only when a slot looks free,
+        and the check is repeated under it.
+        """
+        conn = self._connection()
+        conn.execute('BEGIN')
+        try:
+            admissible, wait = self._check_admission(conn, ticket, tokens, time.time())
+        finally:
+            conn.execute('ROLLBACK')  # read only
+        if not admissible:
+            return None, wait
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            now = time.time()
+            conn.execute('DELETE FROM governor_ticket WHERE seen_at < ?', (now - TICKET_STALE_SECONDS,))
+            conn.execute('DELETE FROM governor_lease WHERE expires_at < ?', (now,))
+            conn.execute('DELETE FROM governor_grant WHERE granted_at <= ?', (now - WINDOW,))
+            admissible, wait = self._check_admission(conn, ticket, tokens, now)
+            if admissible:
+                conn.execute('DELETE FROM governor_ticket WHERE id = ?', (ticket,))
+                lease_id = conn.execute(
+                    'INSERT INTO governor_lease (expires_at) VALUES (?)', (now + LEASE_SECONDS,)
+                ).lastrowid
+                grant_id = conn.execute(
+                    'INSERT INTO governor_grant (granted_at, tokens) VALUES (?, ?)', (now, tokens)
+                ).lastrowid
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        if not admissible:
+            return None, wait  # another process got the slot first
+        return lease_id, grant_id
+
+    def acquire(self, tokens, timeout=None):
+        """Wait in line for permission to send a request of about tokens tokens.
+
+        Raises GovernorTimeout if it is not granted within timeout seconds
+        (the governor's default when None).
+        """
+        tokens = max(1, min(int(tokens), self.tokens_per_minute))
+        started = time.monotonic()
+        deadline = started + (self.timeout if timeout is None else timeout)
+        with self._stats_lock:
+            self.waiting += 1
+        try:
+            ticket = self._take_ticket(tokens)
+            seen_at = time.time()
+            try:
+                while True:
+                    if time.time() - seen_at >= TICKET_STALE_SECONDS / 2:
+                        seen_at = self._touch_ticket(ticket)
+                    lease_id, result = self._try_admit(ticket, tokens)
+                    if lease_id is not None:
+                        waited = time.monotonic() - started
+                        with self._stats_lock:
+                            self.admitted += 1
+                            self._waits.append(waited)
+                        return Permit(self, lease_id, result, waited)
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        with self._stats_lock:
+                            self.timeouts += 1
+                        raise GovernorTimeout(
+                            f"No OpenAI capacity within {time.monotonic() - started:.1f}s "
+                            f"({self.requests_per_minute} requests and {self.tokens_per_minute} tokens per minute, "
+                            f"{self.max_concurrency} concurrent)"
+                        )
+                    # Woken early when a request in this process finishes
+                    with self._released:
+                        self._released.wait(min(max(result, MIN_POLL), MAX_POLL, remaining))
+            except BaseException:
+                self._drop_ticket(ticket)
+                raise
+        finally:
+            with self._stats_lock:
+                self.waiting -= 1
+
+    def permit(self, tokens, timeout=None):
+        """acquire() for use as ``with governor.permit(tokens) as permit:``."""
+        return self.acquire(tokens, timeout)
+
+    def release(self, permit):
+        conn = self._connection()
+        conn.execute('DELETE FROM governor_lease WHERE id = ?', (permit.lease_id,))
+        if permit.tokens_used is not None:
+            conn.execute('UPDATE governor_grant SET tokens = ? WHERE id = ?', (permit.tokens_used, permit.grant_id))
+        with self._released:
+            self._released.notify_all()
+
+    def pause(self, seconds):
+        """Stop admitting requests in every process for seconds, e.g. after a 429."""
+        until = time.time() + seconds
+        self._connection().execute(
+            "INSERT INTO governor_state (key, value) VALUES ('paused_until', ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = MAX(value, excluded.value)",
+            (until,)
+        )
+
+    def stats(self):
+        """Shared queue and budget usage, plus wait times seen by this process."""
+        conn = self._connection()
+        now = time.time()
+        queued = conn.execute(
+            'SELECT COUNT(*) FROM governor_ticket WHERE seen_at >= ?', (now - TICKET_STALE_SECONDS,)
+        ).fetchone()[0]
+        in_flight = conn.execute('SELECT COUNT(*) FROM governor_lease WHERE expires_at >= ?', (now,)).fetchone()[0]
+        requests, tokens = conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(tokens), 0) FROM governor_grant WHERE granted_at > ?', (now - WINDOW,)
+        ).fetchone()
+        row = conn.execute("SELECT value FROM governor_state WHERE key = 'paused_until'").fetchone()
+
+        with self._stats_lock:
+            waits = sorted(self._waits)
+            local = {'waiting': self.waiting, 'admitted': self.admitted, 'timeouts': self.timeouts}
+
+        def percentile(fraction):
+            return round(waits[min(len(waits) - 1, int(fraction * len(waits)))], 3) if waits else 0
+
+        return {
+            'queue_depth': queued,
+            'in_flight': in_flight,
+            'requests_last_minute': requests,
+            'tokens_last_minute': tokens,
+            'paused_for': round(max(0, row[0] - now), 1) if row else 0,
+            'limits': {
+                'requests_per_minute': self.requests_per_minute,
+                'tokens_per_minute': self.tokens_per_minute,
+                'max_concurrency': self.max_concurrency,
+                'timeout': self.timeout
+            },
+            'process': dict(local, wait_p50=percentile(0.5), wait_p95=percentile(0.95),
+                            wait_max=round(waits[-1], 3) if waits else 0)
+        }
@@ -0,0 +1,71 @@
+from datetime import datetime
+from flask import current_app
+from itsdangerous import URLSafeSerializer, BadSignature
+from sqlalchemy import tuple_
+from models import Review
+
+class InvalidCursor(ValueError):
+    pass
+
+def _serializer():
+    return URLSafeSerializer(current_app.secret_key, salt='review-cursor')
+
+def encode_cursor(review):
+    """Opaque, signed cursor pointing at a review's (created_at, id) position."""
+    return _serializer().dumps([review.created_at.isoformat(), review.id])
+
+def decode_cursor(cursor):
+    try:
+        created_at, review_id = _serializer().loads(cursor)
+        return datetime.fromisoformat(created_at), int(review_id)
+    except (BadSignature, TypeError, ValueError) as e:
+        raise InvalidCursor(str(e))
+
+class KeysetPage:
+    """One page of reviews in (created_at, id) order, with cursors to its neighbours."""
+
+    def __init__(self, items, next_cursor, prev_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+def keyset_paginate(query, per_page, after=None, before=None, descending=True):
+    """Seek to the page after or before a cursor in (created_at, id) order, newest first by default.
+
+    Unlike LIMIT/OFFSET, the cost of a page does not depend on how deep it is:
+    the (business_id, created_at, id) index is entered at the cursor position.
+    """
+    position = tuple_(Review.created_at, Review.id)
+    newest_first = [Review.created_at.desc(), Review.id.desc()]
+    oldest_first = [Review.created_at.asc(), Review.id.asc()]
+    older = lambda cursor: position < decode_cursor(cursor)
+    newer = lambda cursor: position > decode_cursor(cursor)
+    if descending:
+        forward, backward, ahead, behind = newest_first, oldest_first, older, newer
+    else:
+        forward, backward, ahead, behind = oldest_first, newest_first, newer, older
+
+    if before:
+        rows = query.filter(behind(before)).order_by(*backward).limit(per_page + 1).all()
+        items = list(reversed(rows[:per_page]))
+        has_prev, has_next = len(rows) > per_page, True
+    else:
+        if after:
+            query = query.filter(ahead(after))
+        rows = query.order_by(*forward).limit(per_page + 1).all()
+        items = rows[:per_page]
+        has_prev, has_next = after is not None, len(rows) > per_page
+
+    return KeysetPage(
+        items,
+        next_cursor=encode_cursor(items[-1]) if items and has_next else None,
+        prev_cursor=encode_cursor(items[0]) if items and has_prev else None
+    )
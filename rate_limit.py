@@ -0,0 +1,316 @@
+"""Sliding-window rate limiting with pluggable shared backends.
+
+Each key keeps two counters: hits in the current fixed window and hits in
+the previous one. The request rate is estimated by weighting the previous
+window by how much of it still overlaps the sliding window, which is close
+to an exact sliding log while storing three integers per key instead of one
+timestamp per request. Every request counts, including rejected ones, so a
+client that keeps retrying stays limited until it slows down.
+
+Backends, chosen with RATE_LIMIT_BACKEND:
+    memory                  counters in this process (default)
+    sqlite[:///path]        a SQLite file shared by every process on the host
+    redis://host:port[/db]  Redis, or anything speaking its protocol such as
+                            resp_server.py
+"""
+import math
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import wraps
+from urllib.parse import urlparse
+from flask import request, jsonify, make_response
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'rate_limit.db')
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+def parse_rule(rule):
+    """'5/minute', '5 per minute' or '100/30s' -> (limit, period in seconds)."""
+    count, _, period = rule.replace(' per ', '/').partition('/')
+    period = period.strip()
+    if period.endswith('s') and period[:-1] in PERIODS:
+        period = period[:-1]
+    if period in PERIODS:
+        return int(count), PERIODS[period]
+    if period.endswith('s') and period[:-1].isdigit():
+        return int(count), int(period[:-1])
+    raise ValueError(f"Invalid rate limit rule '{rule}'")
+
+class MemoryBackend:
+    """Counters in a dict; keys idle for two windows are evicted as new ones arrive."""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._counters = OrderedDict()  # key -> [window, current, previous, expires_at]
+        self._lock = threading.Lock()
+        self._next_eviction = 0
+
+    def hit(self, key, period, now):
+        window = int(now // period)
+        with self._lock:
+            entry = self._counters.get(key)
+            if entry is None:
+                entry = self._counters[key] = [window, 0, 0, 0]
+            else:
+                self._counters.move_to_end(key)
+            if entry[0] != window:
+                entry[2] = entry[1] if entry[0] == window - 1 else 0
+                entry[0], entry[1] = window, 0
+            entry[1] += 1
+            entry[3] = (window + 2) * period
+            if now >= self._next_eviction or len(self._counters) > self.max_keys:
+                self._evict(now)
+            return entry[1], entry[2]
+
+    def _evict(self, now):
+        # Least recently used first, so stop at the first live entry
+        self._next_eviction = now + 1
+        counters = self._counters
+        while counters:
+            oldest = next(iter(counters.values()))
+            if oldest[3] > now and len(counters) <= self.max_keys:
+                break
+            counters.popitem(last=False)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+
+class SQLiteBackend:
+    """Counters in a SQLite table, updated with one atomic upsert per hit."""
+
+    CLEANUP_EVERY = 1000  # hits between deletions of expired rows
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._hits = 0
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS rate_limit ('
+                'key TEXT PRIMARY KEY, window INTEGER NOT NULL, current INTEGER NOT NULL, '
+                'previous INTEGER NOT NULL, expires_at REAL NOT NULL)'
+            )
+            self._local.conn = conn
+        return conn
+
+    def hit(self, key, period, now):
+        window = int(now // period)
+        conn = self._connection()
+        # Every expression on the right-hand side sees the row as it was before the update
+        current, previous = conn.execute(
+            '''INSERT INTO rate_limit (key, window, current, previous, expires_at) VALUES (?1, ?2, 1, 0, ?3)
+               ON CONFLICT (key) DO UPDATE SET
+                   previous = CASE WHEN window = ?2 THEN previous WHEN window = ?2 - 1 THEN current ELSE 0 END,
+                   current = CASE WHEN window = ?2 THEN current + 1 ELSE 1 END,
+                   window = ?2,
+                   expires_at = ?3
+               RETURNING current, previous''',
+            (key, window, (window + 2) * period)
+        ).fetchone()
+        self._hits += 1
+        if self._hits % self.CLEANUP_EVERY == 0:
+            conn.execute('DELETE FROM rate_limit WHERE expires_at < ?', (now,))
+        return current, previous
+
+    def reset(self):
+        self._connection().execute('DELETE FROM rate_limit')
+
+class RESPError(Exception):
+    pass
+
+class RESPBackend:
+    """Counters in Redis (or resp_server.py), one key per window, in one pipelined round trip."""
+
+    def __init__(self, host='localhost', port=6379, db=0, prefix='ratelimit:', timeout=1.0):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.prefix = prefix
+        self.timeout = timeout
+        self._local = threading.local()
+
+    @classmethod
+    def from_url(cls, url):
+        parsed = urlparse(url)
+        db = int(parsed.path.strip('/') or 0)
+        return cls(parsed.hostname or 'localhost', parsed.port or 6379, db)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn = self._local.conn = (sock, sock.makefile('rb'))
+            if self.db:
+                self._execute([('SELECT', self.db)])
+        return conn
+
+    @staticmethod
+    def _encode(command):
+        parts = [f'*{len(command)}\r\n'.encode()]
+        for arg in command:
+            arg = str(arg).encode()
+            parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        return b''.join(parts)
+
+    @classmethod
+    def _read_reply(cls, reader):
+        line = reader.readline()
+        if not line:
+            raise ConnectionError('Connection closed by server')
+        kind, payload = line[:1], line[1:-2]
+        if kind == b'+':
+            return payload.decode()
+        if kind == b'-':
+            raise RESPError(payload.decode())
+        if kind == b':':
+            return int(payload)
+        if kind == b'$':
+            length = int(payload)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)
+            return data[:-2].decode()
+        if kind == b'*':
+            length = int(payload)
+            return None if length < 0 else [cls._read_reply(reader) for _ in range(length)]
+        raise RESPError(f'Unexpected reply {line!r}')
+
+    def _execute(self, commands):
+        """Send commands in one write and read all replies."""
+        try:
+            sock, reader = self._connection()
+            sock.sendall(b''.join(self._encode(command) for command in commands))
+            replies = []
+            for _ in commands:
+                # Read every reply even after an error so the stream stays in step
+                try:
+                    replies.append(self._read_reply(reader))
+                except RESPError as e:
+                    replies.append(e)
+        except (OSError, ConnectionError):
+            self._close()
+            raise
+        for reply in replies:
+            if isinstance(reply, RESPError):
+                raise reply
+        return replies
+
+    def _close(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn:
+            conn[1].close()
+            conn[0].close()
+
+    def hit(self, key, period, now):
+        window = int(now // period)
+        current_key = f'{self.prefix}{key}:{window}'
+        current, _, previous = self._execute([
+            ('INCR', current_key),
+            ('EXPIRE', current_key, period * 2),
+            ('GET', f'{self.prefix}{key}:{window - 1}')
+        ])
+        return current, int(previous or 0)
+
+    def reset(self):
+        self._execute([('FLUSHDB',)])
+
+def backend_from_url(url):
+    """Backend for a RATE_LIMIT_BACKEND value."""
+    url = url or 'memory'
+    if url == 'memory':
+        return MemoryBackend()
+    if url == 'sqlite':
+        return SQLiteBackend()
+    if url.startswith('sqlite:///'):
+        return SQLiteBackend(url[len('sqlite:///'):])
+    if url.startswith('redis://'):
+        return RESPBackend.from_url(url)
+    raise ValueError(f"Unknown rate limit backend '{url}'")
+
+@dataclass(slots=True)
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: int  # seconds until a request would be allowed again
+
+class RateLimiter:
+    """Sliding-window counter limits on top of a counter backend."""
+
+    def __init__(self, backend=None):
+        self.backend = backend or MemoryBackend()
+        self.rejections = 0
+        self.errors = 0
+
+    def hit(self, key, limit, period, now=None):
+        """Count a request for key and decide whether it is within limit per period.
+
+        If the backend cannot be reached the request is allowed; an outage
+        of the counter store should not take the site down with it.
+        """
+        now = time.time() if now is None else now
+        try:
+            current, previous = self.backend.hit(key, period, now)
+        except Exception as e:
+            self.errors += 1
+            print(f"Rate limit backend error: {e}")
+            return RateLimitResult(True, limit, limit, 0)
+
+        elapsed = (now % period) / period
+        estimate = previous * (1 - elapsed) + current
+        if estimate <= limit:
+            return RateLimitResult(True, limit, int(limit - estimate), 0)
+
+        self.rejections += 1
+        if current > limit:
+            wait = period * (1 - elapsed)  # until this window becomes the previous one
+        else:
+            # Until the previous window has slid out far enough
+            wait = ((1 - (limit - current) / previous) - elapsed) * period
+        return RateLimitResult(False, limit, 0, max(1, math.ceil(wait)))
+
+    def limit(self, rule, scope=None, key=None, methods=('POST',)):
+        """Decorate a view with a limit such as '5/minute' per client address.
+
+        scope names the counter (the view name by default), so routes can
+        share a limit by passing the same scope. key is a function returning
+        the client identifier. Only requests with one of methods count.
+        """
+        count, period = parse_rule(rule)
+
+        def decorator(view):
+            name = scope or view.__name__
+
+            @wraps(view)
+            def decorated_function(*args, **kwargs):
+                if request.method in methods:
+                    client = key() if key else request.remote_addr
+                    result = self.hit(f'{name}:{client}', count, period)
+                    if not result.allowed:
+                        return too_many_requests(result)
+                return view(*args, **kwargs)
+            return decorated_function
+        return decorator
+
+def too_many_requests(result):
+    message = 'Too many requests. Please try again later.'
+    response = make_response(jsonify({'error': message}) if request.is_json else message, 429)
+    response.headers['Retry-After'] = str(result.retry_after)
+    return response
+
+limiter = RateLimiter(backend_from_url(os.getenv('RATE_LIMIT_BACKEND', 'memory')))
@@ -0,0 +1,180 @@
+"""A small in-memory server speaking the Redis protocol (RESP).
+
+It implements the commands the shared rate limiter needs, so
+several app processes can share counters on a host without installing
+Redis. It keeps everything in memory and is not a Redis replacement.
+
+Usage: python resp_server.py [--host 127.0.0.1] [--port 6379]
+"""
+import argparse
+import socket
+import socketserver
+import threading
+import time
+
+class Store:
+    """Key/value data with per-key expiry, evicted lazily on access and by a periodic sweep."""
+
+    SWEEP_INTERVAL = 10
+
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.lock = threading.Lock()
+        self.last_sweep = time.monotonic()
+
+    def _live(self, key, now):
+        expires_at = self.expires.get(key)
+        if expires_at is not None and expires_at <= now:
+            self.data.pop(key, None)
+            del self.expires[key]
+        return key in self.data
+
+    def _sweep(self, now):
+        if now - self.last_sweep < self.SWEEP_INTERVAL:
+            return
+        self.last_sweep = now
+        for key in [key for key, expires_at in self.expires.items() if expires_at <= now]:
+            self.data.pop(key, None)
+            del self.expires[key]
+
+    def execute(self, command, args):
+        now = time.monotonic()
+        with self.lock:
+            self._sweep(now)
+            if command == 'PING':
+                return 'PONG' if not args else args[0]
+            if command == 'GET':
+                return self.data[args[0]] if self._live(args[0], now) else None
+            if command == 'SET':
+                self.data[args[0]] = args[1]
+                self.expires.pop(args[0], None)
+                if len(args) >= 4 and args[2].upper() == 'EX':
+                    self.expires[args[0]] = now + int(args[3])
+                return 'OK'
+            if command in ('INCR', 'INCRBY', 'DECR', 'DECRBY'):
+                amount = int(args[1]) if command.endswith('BY') else 1
+                if command.startswith('DECR'):
+                    amount = -amount
+                value = int(self.data[args[0]]) if self._live(args[0], now) else 0
+                self.data[args[0]] = str(value + amount)
+                return value + amount
+            if command == 'EXPIRE':
+                if not self._live(args[0], now):
+                    return 0
+                self.expires[args[0]] = now + int(args[1])
+                return 1
+            if command == 'TTL':
+                if not self._live(args[0], now):
+                    return -2
+                expires_at = self.expires.get(args[0])
+                return -1 if expires_at is None else max(0, round(expires_at - now))
+            if command == 'DEL':
+                deleted = 0
+                for key in args:
+                    if self._live(key, now):
+                        del self.data[key]
+                        self.expires.pop(key, None)
+                        deleted += 1
+                return deleted
+            if command in ('FLUSHDB', 'FLUSHALL'):
+                self.data.clear()
+                self.expires.clear()
+                return 'OK'
+            if command == 'DBSIZE':
+                return len(self.data)
+            if command == 'SELECT':
+                return 'OK'  # a single database serves every index
+            raise ValueError(f"unknown command '{command}'")
+
+def encode(reply):
+    if reply is None:
+        return b'$-1\r\n'
+    if isinstance(reply, Exception):
+        return f'-ERR {reply}\r\n'.encode()
+    if isinstance(reply, int):
+        return b':%d\r\n' % reply
+    if reply in ('OK', 'PONG'):
+        return f'+{reply}\r\n'.encode()
+    data = str(reply).encode()
+    return b'$%d\r\n%s\r\n' % (len(data), data)
+
+def parse_commands(buffer):
+    """Split complete commands off the front of buffer; returns (commands, rest)."""
+    commands = []
+    while buffer:
+        end = buffer.find(b'\r\n')
+        if end < 0:
+            break
+        if not buffer.startswith(b'*'):
+            commands.append(buffer[:end].decode().split())  # inline command, e.g. from telnet
+            buffer = buffer[end + 2:]
+            continue
+        count = int(buffer[1:end])
+        position = end + 2
+        args = []
+        for _ in range(count):
+            end = buffer.find(b'\r\n', position)
+            if end < 0:
+                return commands, buffer
+            length = int(buffer[position + 1:end])
+            start = end + 2
+            if len(buffer) < start + length + 2:
+                return commands, buffer
+            args.append(buffer[start:start + length].decode())
+            position = start + length + 2
+        commands.append(args)
+        buffer = buffer[position:]
+    return commands, buffer
+
+class RESPHandler(socketserver.BaseRequestHandler):
+    """Answers every complete command received so far with a single write, so pipelines cost one round trip."""
+
+    def handle(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        buffer = b''
+        while True:
+            try:
+                data = self.request.recv(65536)
+            except ConnectionError:
+                return
+            if not data:
+                return
+            try:
+                commands, buffer = parse_commands(buffer + data)
+            except ValueError:
+                self.request.sendall(encode(ValueError('protocol error')))
+                return
+            replies = []
+            for args in commands:
+                if not args:
+                    continue
+                command = args[0].upper()
+                if command == 'QUIT':
+                    replies.append(encode('OK'))
+                    self.request.sendall(b''.join(replies))
+                    return
+                try:
+                    replies.append(encode(self.server.store.execute(command, args[1:])))
+                except (ValueError, IndexError) as e:
+                    replies.append(encode(e))
+            if replies:
+                self.request.sendall(b''.join(replies))
+
+class RESPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address):
+        super().__init__(address, RESPHandler)
+        self.store = Store()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='In-memory RESP server for shared rate limit counters.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6379)
+    args = parser.parse_args()
+
+    with RESPServer((args.host, args.port)) as server:
+        print(f"Serving RESP on {args.host}:{args.port}")
+        server.serve_forever()
@@ -0,0 +1,178 @@
+"""Streaming export of a business's reviews.
+
+Rows are read in chunks from a streaming cursor (a server-side cursor on
+PostgreSQL) and written out one chunk at a time. Memory stays the same
+whatever the export size. The export uses its own connection and a single
+read transaction. With WAL (see database.py) that read does not block
+review submissions while a large export runs.
+
+Formats:
+    csv       one row per review, with the contact details in their own columns
+    ndjson    one JSON object per review
+    columnar  gzip-compressed, one JSON object per chunk of up to CHUNK_SIZE
+              reviews, mapping each column to its list of values
+
+The csv and ndjson fields use the same names as the import files, so an
+export can be imported again with import_reviews.py.
+
+Usage: python review_export.py BUSINESS [--format csv|ndjson|columnar] [--start DATE] [--end DATE]
+                               [--rating N] [--sentiment S] [--output FILE]
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+import zlib
+from datetime import date, datetime, timedelta
+from sqlalchemy import select
+from models import db, Review
+
+CHUNK_SIZE = 1000
+
+FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'columnar': ('application/gzip', 'columns.json.gz')
+}
+
+COLUMNS = [
+    ('id', Review.id),
+    ('timestamp', Review.created_at),
+    ('rating', Review.rating),
+    ('feedback', Review.text),
+    ('sentiment', Review.sentiment),
+    ('status', Review.status),
+    ('priority', Review.priority),
+    ('source', Review.source),
+    ('tags', Review.tags),
+    ('improvement_feedback', Review.improvement_feedback),
+    ('customer_name', Review.customer_name),
+    ('contact_info', Review.contact_info)
+]
+FIELDS = [name for name, _ in COLUMNS]
+CONTACT_FIELDS = ('name', 'email', 'phone')
+CSV_FIELDS = FIELDS[:-1] + [f'contact_{field}' for field in CONTACT_FIELDS]
+
+class InvalidExport(ValueError):
+    pass
+
+def parse_filters(values):
+    """Validate export filters given as strings (query args or CLI options)."""
+    filters = {}
+    for name in ('start', 'end'):
+        if values.get(name):
+            try:
+                filters[name] = date.fromisoformat(values[name])
+            except ValueError:
+                raise InvalidExport(f"{name} must be a date like 2026-01-31")
+    if values.get('rating'):
+        if str(values['rating']) not in ('1', '2', '3', '4', '5'):
+            raise InvalidExport('rating must be between 1 and 5')
+        filters['rating'] = int(values['rating'])
+    if values.get('sentiment') and values['sentiment'] != 'all':
+        filters['sentiment'] = values['sentiment']
+    return filters
+
+def export_query(business_id, filters):
+    """The reviews to export, oldest first, as plain rows rather than ORM objects."""
+    query = select(*[column.label(name) for name, column in COLUMNS]).where(Review.business_id == business_id)
+    if 'start' in filters:
+        query = query.where(Review.created_at >= datetime.combine(filters['start'], datetime.min.time()))
+    if 'end' in filters:
+        # end is inclusive
+        query = query.where(Review.created_at < datetime.combine(filters['end'] + timedelta(days=1),
+                                                                 datetime.min.time()))
+    if 'rating' in filters:
+        query = query.where(Review.rating == filters['rating'])
+    if 'sentiment' in filters:
+        query = query.where(Review.sentiment == filters['sentiment'])
+    return query.order_by(Review.created_at, Review.id)
+
+def iter_chunks(engine, query, chunk_size=CHUNK_SIZE):
+    """Lists of row dicts, chunk_size at a time, from one streaming read."""
+    with engine.connect() as connection:
+        result = connection.execution_options(stream_results=True, yield_per=chunk_size).execute(query)
+        for rows in result.mappings().partitions(chunk_size):
+            yield [
+                dict(row, timestamp=row['timestamp'].isoformat() if row['timestamp'] else None)
+                for row in rows
+            ]
+
+def csv_chunks(chunks):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    for rows in chunks:
+        for row in rows:
+            contact_info = row['contact_info'] or {}
+            row.update({f'contact_{field}': contact_info.get(field) for field in CONTACT_FIELDS})
+            row['tags'] = ';'.join(row['tags'] or [])
+            writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def ndjson_chunks(chunks):
+    for rows in chunks:
+        yield ''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows)
+
+def columnar_chunks(chunks):
+    # Values of one column sit next to each other, which compresses far better than rows
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # gzip container
+    for rows in chunks:
+        group = {name: [row[name] for row in rows] for name in FIELDS}
+        data = compressor.compress((json.dumps(group, ensure_ascii=False) + '\n').encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+ENCODERS = {'csv': csv_chunks, 'ndjson': ndjson_chunks, 'columnar': columnar_chunks}
+
+def export_reviews(engine, business_id, format='csv', filters=None, chunk_size=CHUNK_SIZE):
+    """Generator of the export file's pieces: str for csv and ndjson, bytes for columnar."""
+    if format not in ENCODERS:
+        raise InvalidExport(f"format must be one of {', '.join(ENCODERS)}")
+    query = export_query(business_id, filters or {})
+    return ENCODERS[format](iter_chunks(engine, query, chunk_size))
+
+def export_filename(business_id, format):
+    return f"reviews-{business_id}-{date.today().isoformat()}.{FORMATS[format][1]}"
+
+if __name__ == '__main__':
+    from app import app
+    from import_reviews import resolve_business
+
+    parser = argparse.ArgumentParser(description="Export a business's reviews.")
+    parser.add_argument('business', help='business id or name')
+    parser.add_argument('--format', choices=sorted(ENCODERS), default='csv')
+    parser.add_argument('--start', help='first day to include (YYYY-MM-DD)')
+    parser.add_argument('--end', help='last day to include (YYYY-MM-DD)')
+    parser.add_argument('--rating', type=int)
+    parser.add_argument('--sentiment')
+    parser.add_argument('--output', '-o', help='file to write (default: stdout)')
+    args = parser.parse_args()
+
+    with app.app_context():
+        business = resolve_business(args.business)
+        if business is None:
+            sys.exit(f"Business '{args.business}' not found")
+        try:
+            filters = parse_filters(vars(args))
+        except InvalidExport as e:
+            sys.exit(str(e))
+        pieces = export_reviews(db.engine, business.id, args.format, filters)
+
+        binary = args.format == 'columnar'
+        if args.output:
+            output = open(args.output, 'wb') if binary else open(args.output, 'w', newline='', encoding='utf-8')
+        else:
+            output = sys.stdout.buffer if binary else sys.stdout
+        try:
+            for piece in pieces:
+                output.write(piece)
+        finally:
+            if args.output:
+                output.close()
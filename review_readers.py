@@ -0,0 +1,172 @@
+"""Streaming readers for review import files.
+
+Each reader is an iterable of review records (dicts in the reviews.json
+shape) that keeps constant memory regardless of file size. ``position``
+always points just past the last record yielded, so an import can store
+it as a checkpoint and later construct the reader with ``start=position``
+to continue where it stopped.
+"""
+import csv
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+READ_SIZE = 1 << 20  # bytes per read for the JSON array parser
+# A decode error this close to the end of the buffer may be a token cut by the
+# block boundary: 'false' or a \uXXXX escape
+TRUNCATED_TAIL = 5
+
+def truncated(error, length):
+    """True when a JSONDecodeError means the data ended, not that it is malformed."""
+    return error.msg.startswith('Unterminated string') or length - error.pos <= TRUNCATED_TAIL
+
+class NDJSONReader:
+    """One JSON object per line; position is a byte offset."""
+    format = 'ndjson'
+
+    def __init__(self, path, start=0):
+        self.path = path
+        self.position = start
+        self.records = 0
+        self.errors = 0
+
+    def __iter__(self):
+        with open(self.path, 'rb') as f:
+            f.seek(self.position)
+            while True:
+                line = f.readline()
+                if not line:
+                    break
+                self.position = f.tell()
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    logger.error(f"Invalid JSON line ending at byte {self.position}: {e}")
+                    self.errors += 1
+                    continue
+                self.records += 1
+                yield record
+
+class CSVReader:
+    """CSV with a header row; position is the number of data rows consumed.
+
+    Columns follow the JSON fields (timestamp, rating, feedback, sentiment,
+    source, improvement_feedback, contact_info). Contact details may also be
+    given as contact_name, contact_email and contact_phone columns.
+    """
+    format = 'csv'
+
+    def __init__(self, path, start=0):
+        self.path = path
+        self.position = start
+        self.records = 0
+        self.errors = 0
+
+    def __iter__(self):
+        start = self.position
+        with open(self.path, newline='', encoding='utf-8') as f:
+            for index, row in enumerate(csv.DictReader(f), 1):
+                if index <= start:
+                    continue
+                self.position = index
+                try:
+                    record = self.to_record(row)
+                except ValueError as e:
+                    logger.error(f"Invalid CSV row {index}: {e}")
+                    self.errors += 1
+                    continue
+                self.records += 1
+                yield record
+
+    @staticmethod
+    def to_record(row):
+        record = {key: value for key, value in row.items() if value not in (None, '')}
+        if 'rating' in record:
+            record['rating'] = int(record['rating'])
+        contact = {field: record.pop(f'contact_{field}') for field in ('name', 'email', 'phone')
+                   if f'contact_{field}' in record}
+        if contact and 'contact_info' not in record:
+            record['contact_info'] = contact
+        return record
+
+class JSONArrayReader:
+    """A top-level JSON array parsed incrementally; position is the number of elements consumed."""
+    format = 'json'
+
+    def __init__(self, path, start=0):
+        self.path = path
+        self.position = start
+        self.records = 0
+        self.errors = 0
+
+    def __iter__(self):
+        decoder = json.JSONDecoder()
+        start = self.position
+        index = 0
+        with open(self.path, encoding='utf-8') as f:
+            buffer = ''
+            offset = 0  # parse position inside buffer
+            eof = False
+            opened = False
+
+            def fill():
+                # Drop what was parsed already and append the next block
+                nonlocal buffer, offset, eof
+                chunk = f.read(READ_SIZE)
+                buffer = buffer[offset:] + chunk
+                offset = 0
+                eof = not chunk
+
+            while True:
+                while offset < len(buffer) and buffer[offset] in ' \t\r\n,':
+                    if buffer[offset] == ',' and not opened:
+                        raise ValueError("Expected a JSON array")
+                    offset += 1
+                if offset >= len(buffer):
+                    if eof:
+                        raise ValueError("Unterminated JSON array" if opened else "Empty JSON file")
+                    fill()
+                    continue
+                if not opened:
+                    if buffer[offset] != '[':
+                        raise ValueError("Expected a JSON array")
+                    offset += 1
+                    opened = True
+                    continue
+                if buffer[offset] == ']':
+                    return
+                try:
+                    record, offset = decoder.raw_decode(buffer, offset)
+                except json.JSONDecodeError as e:
+                    if eof or not truncated(e, len(buffer)):
+                        raise ValueError(f"Invalid element {index + 1}: {e}") from e
+                    fill()  # the element continues in the next block
+                    continue
+                index += 1
+                if index <= start:
+                    continue
+                self.position = index
+                self.records += 1
+                yield record
+
+READERS = {reader.format: reader for reader in (NDJSONReader, CSVReader, JSONArrayReader)}
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.ndjson', '.jsonl'):
+        return 'ndjson'
+    if extension == '.csv':
+        return 'csv'
+    return 'json'
+
+def open_reader(path, format=None, start=0):
+    """Reader for path, with the format taken from the extension unless given."""
+    format = format or detect_format(path)
+    if format not in READERS:
+        raise ValueError(f"Unsupported format '{format}', expected one of {', '.join(READERS)}")
+    return READERS[format](path, start)
@@ -0,0 +1,167 @@
+"""Full-text search over reviews with SQLite FTS5.
+
+review_fts is an external-content FTS5 index over review text, improvement
+feedback and customer name. It stores only the index and reads the indexed
+columns back from the review_fts_source view when highlighting. Triggers on
+review keep it in sync with every insert, update and delete, including
+bulk SQL. The view also exposes the business as a "b<id>" token, which
+every query matches, so a search is scoped to one business inside the
+index rather than by filtering every matching review afterwards.
+
+The index is created together with the review table. For an existing
+database run the migration, and rebuild it from the review table with:
+
+Usage: python review_search.py rebuild
+"""
+import html
+import re
+from sqlalchemy import DDL, event, text
+from models import db, Review
+
+SEARCH_COLUMNS = ('text', 'improvement_feedback', 'customer_name')
+# bm25 weights in SEARCH_COLUMNS order, then business_key (never ranked)
+RANK_WEIGHTS = (5.0, 3.0, 10.0, 0.0)
+SNIPPET_TOKENS = 24
+MARK_START, MARK_END = '\x02', '\x03'  # escaped and turned into <mark> after highlighting
+
+CREATE_STATEMENTS = [
+    '''CREATE VIEW IF NOT EXISTS review_fts_source AS
+       SELECT id, text, improvement_feedback, customer_name, 'b' || business_id AS business_key
+       FROM review''',
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS review_fts USING fts5(
+           text, improvement_feedback, customer_name, business_key,
+           content='review_fts_source', content_rowid='id',
+           tokenize='unicode61 remove_diacritics 2'
+       )''',
+    f'''INSERT INTO review_fts(review_fts, rank)
+        VALUES ('rank', 'bm25({", ".join(map(str, RANK_WEIGHTS))})')''',
+    '''CREATE TRIGGER IF NOT EXISTS review_fts_insert AFTER INSERT ON review BEGIN
+           INSERT INTO review_fts(rowid, text, improvement_feedback, customer_name, business_key)
+           VALUES (new.id, new.text, new.improvement_feedback, new.customer_name, 'b' || new.business_id);
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS review_fts_delete AFTER DELETE ON review BEGIN
+           INSERT INTO review_fts(review_fts, rowid, text, improvement_feedback, customer_name, business_key)
+           VALUES ('delete', old.id, old.text, old.improvement_feedback, old.customer_name, 'b' || old.business_id);
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS review_fts_update
+       AFTER UPDATE OF text, improvement_feedback, customer_name, business_id ON review BEGIN
+           INSERT INTO review_fts(review_fts, rowid, text, improvement_feedback, customer_name, business_key)
+           VALUES ('delete', old.id, old.text, old.improvement_feedback, old.customer_name, 'b' || old.business_id);
+           INSERT INTO review_fts(rowid, text, improvement_feedback, customer_name, business_key)
+           VALUES (new.id, new.text, new.improvement_feedback, new.customer_name, 'b' || new.business_id);
+       END''',
+]
+
+DROP_STATEMENTS = [
+    'DROP TRIGGER IF EXISTS review_fts_update',
+    'DROP TRIGGER IF EXISTS review_fts_delete',
+    'DROP TRIGGER IF EXISTS review_fts_insert',
+    'DROP TABLE IF EXISTS review_fts',
+    'DROP VIEW IF EXISTS review_fts_source',
+]
+
+for statement in CREATE_STATEMENTS:
+    event.listen(Review.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+for statement in DROP_STATEMENTS:
+    event.listen(Review.__table__, 'before_drop', DDL(statement).execute_if(dialect='sqlite'))
+
+def search_available(connection):
+    return connection.dialect.name == 'sqlite'
+
+def create_search_index(connection):
+    for statement in CREATE_STATEMENTS:
+        connection.execute(text(statement))
+
+def drop_search_index(connection):
+    for statement in DROP_STATEMENTS:
+        connection.execute(text(statement))
+
+def rebuild_search_index(connection):
+    """Re-index every review and merge the index into as few segments as possible."""
+    connection.execute(text("INSERT INTO review_fts(review_fts) VALUES ('rebuild')"))
+    connection.execute(text("INSERT INTO review_fts(review_fts) VALUES ('optimize')"))
+
+TERM_RE = re.compile(r'"([^"]*)"|(\S+)')
+WORD_RE = re.compile(r'\w+')
+
+def build_match_query(query, business_id):
+    """Turn free text into an FTS5 query scoped to one business.
+
+    Words are matched as terms (all of them must appear), "quoted text" as
+    a phrase, and a trailing * makes a word a prefix search. FTS5 operators
+    typed by the user are treated as plain words, so no input is a syntax
+    error. Returns None when the query has nothing to search for.
+    """
+    terms = []
+    for phrase, word in TERM_RE.findall(query):
+        words = WORD_RE.findall(phrase or word)
+        if not words:
+            continue
+        term = '"' + ' '.join(words) + '"'
+        if word and word.endswith('*') and len(words) == 1:
+            term += '*'
+        terms.append(term)
+    if not terms:
+        return None
+    columns = ' '.join(SEARCH_COLUMNS)
+    return f"business_key : b{int(business_id)} AND {{{columns}}} : ({' AND '.join(terms)})"
+
+def marked_html(value):
+    """Escape highlighted text and turn the match markers into <mark> tags."""
+    if value is None:
+        return None
+    return html.escape(value).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+def search_reviews(business_id, query, filters=None, rating=None, limit=20, offset=0):
+    """Reviews of one business matching query, best match first.
+
+    Returns (review, rank, highlights) tuples, where highlights holds HTML
+    with the matches wrapped in <mark> for each searched column: a snippet
+    of the review text and the other columns in full.
+    """
+    match = build_match_query(query, business_id)
+    if match is None:
+        return []
+
+    conditions = ['review_fts MATCH :match']
+    params = {'match': match, 'business_id': business_id, 'limit': limit, 'offset': offset}
+    for name, value in (filters or {}).items():
+        conditions.append(f'review.{name} = :{name}')
+        params[name] = value
+    if rating:
+        conditions.append('review.rating = :rating')
+        params['rating'] = rating
+
+    mark = f"'{MARK_START}', '{MARK_END}'"
+    rows = db.session.execute(text(f'''
+        SELECT review.id, review_fts.rank,
+               snippet(review_fts, 0, {mark}, '...', {SNIPPET_TOKENS}),
+               highlight(review_fts, 1, {mark}),
+               highlight(review_fts, 2, {mark})
+        FROM review_fts JOIN review ON review.id = review_fts.rowid
+        WHERE {' AND '.join(conditions)} AND review.business_id = :business_id
+        ORDER BY review_fts.rank
+        LIMIT :limit OFFSET :offset
+    '''), params).all()
+
+    reviews = {review.id: review for review in Review.query.filter(Review.id.in_([row[0] for row in rows]))}
+    results = []
+    for review_id, rank, *highlights in rows:
+        results.append((reviews[review_id], rank, dict(zip(SEARCH_COLUMNS, map(marked_html, highlights)))))
+    return results
+
+if __name__ == '__main__':
+    import sys
+    from app import app
+
+    if sys.argv[1:] != ['rebuild']:
+        sys.exit(__doc__.strip().splitlines()[-1])
+    with app.app_context():
+        connection = db.session.connection()
+        if not search_available(connection):
+            sys.exit("Full-text search needs SQLite with FTS5")
+        create_search_index(connection)
+        rebuild_search_index(connection)
+        db.session.commit()
+        count = db.session.execute(text('SELECT COUNT(*) FROM review_fts')).scalar()
+        print(f"Rebuilt the search index for {count} reviews")
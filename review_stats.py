@@ -0,0 +1,308 @@
+"""Incrementally maintained per-business review statistics.
+
+Importing this module registers ORM listeners on Review that keep
+BusinessStats, BusinessStatCounter and ReviewDailyRollup in step with
+every insert, update and delete made through the session. Bulk statements
+bypass the ORM, so code using them must call rebuild_business_stats and
+rebuild_daily_rollups afterwards; running this file rebuilds both from the
+review table, which is also how historical data is backfilled.
+
+Usage: python review_stats.py [business_id ...]
+"""
+from collections import Counter
+from datetime import date, datetime
+from sqlalchemy import event, inspect, select, update, insert, delete, func, case
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, Review, Business, BusinessStats, BusinessStatCounter, ReviewDailyRollup
+
+TRACKED_FIELDS = ('business_id', 'rating', 'status', 'priority', 'sentiment', 'source', 'tags', 'created_at')
+RATINGS = (1, 2, 3, 4, 5)
+STATUSES = ('new', 'read', 'responded')
+PRIORITIES = ('high', 'urgent')
+SENTIMENTS = ('positive', 'neutral', 'negative', 'pending')
+
+stats_table = BusinessStats.__table__
+counter_table = BusinessStatCounter.__table__
+rollup_table = ReviewDailyRollup.__table__
+review_table = Review.__table__
+
+def review_contributions(state):
+    """Return the column increments and counter keys one review adds to its business."""
+    rating = state['rating'] or 0
+    columns = {'review_count': 1, 'rating_sum': rating}
+    if rating in RATINGS:
+        columns[f'rating_{rating}'] = 1
+    if state['status'] in STATUSES:
+        columns[f"status_{state['status']}"] = 1
+    if state['priority'] in PRIORITIES:
+        columns[f"priority_{state['priority']}"] = 1
+    if state['sentiment'] in SENTIMENTS:
+        columns[f"sentiment_{state['sentiment']}"] = 1
+
+    counters = []
+    if state['source']:
+        counters.append(('source', state['source']))
+    for tag in sorted(set(state['tags'] or [])):
+        counters.append(('tag', str(tag)))
+    return columns, counters
+
+UPSERT_DIALECTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+def add_to_row(connection, table, keys, increments):
+    """Add increments to the row identified by keys, creating it if it does not exist.
+
+    One INSERT ... ON CONFLICT DO UPDATE, so two transactions creating the same
+    row at once both count instead of one failing on the primary key. Other
+    engines fall back to an UPDATE followed by an INSERT.
+    """
+    dialect_insert = UPSERT_DIALECTS.get(connection.dialect.name)
+    if dialect_insert is not None:
+        statement = dialect_insert(table).values(**keys, **increments)
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={name: table.c[name] + statement.excluded[name] for name in increments}
+        ))
+        return
+
+    result = connection.execute(
+        update(table)
+        .where(*[table.c[name] == value for name, value in keys.items()])
+        .values({name: table.c[name] + value for name, value in increments.items()})
+    )
+    if result.rowcount == 0:
+        connection.execute(insert(table).values(**keys, **increments))
+
+def apply_review_delta(connection, state, sign):
+    """Add (sign=1) or remove (sign=-1) one review's contribution to the aggregates."""
+    business_id = state['business_id']
+    columns, counters = review_contributions(state)
+    result = connection.execute(
+        update(stats_table)
+        .where(stats_table.c.business_id == business_id)
+        .values({name: stats_table.c[name] + sign * value for name, value in columns.items()})
+    )
+    if result.rowcount == 0:
+        # No aggregate yet; get_business_stats builds it from the table on first read
+        return
+
+    rating = state['rating'] or 0
+    for dimension, key in counters:
+        keys = {'business_id': business_id, 'dimension': dimension, 'key': key}
+        if sign > 0:
+            add_to_row(connection, counter_table, keys, {'count': 1, 'rating_sum': rating})
+        else:
+            connection.execute(
+                update(counter_table)
+                .where(*[counter_table.c[name] == value for name, value in keys.items()])
+                .values(count=counter_table.c.count - 1, rating_sum=counter_table.c.rating_sum - rating)
+            )
+
+def rollup_key(state):
+    created_at = state['created_at'] or datetime.utcnow()
+    return state['business_id'], created_at.date(), state['source'] or ''
+
+def apply_rollup_delta(connection, state, sign):
+    """Add or remove one review's contribution to its daily rollup bucket."""
+    business_id, day, source = rollup_key(state)
+    rating = state['rating'] or 0
+    columns = {'review_count': 1, 'rating_sum': rating}
+    if state['sentiment'] in SENTIMENTS:
+        columns[f"sentiment_{state['sentiment']}"] = 1
+
+    keys = {'business_id': business_id, 'day': day, 'source': source}
+    if sign > 0:
+        add_to_row(connection, rollup_table, keys, columns)
+    else:
+        connection.execute(
+            update(rollup_table)
+            .where(*[rollup_table.c[name] == value for name, value in keys.items()])
+            .values({name: rollup_table.c[name] - value for name, value in columns.items()})
+        )
+
+def current_state(target):
+    return {field: getattr(target, field) for field in TRACKED_FIELDS}
+
+def previous_state(target):
+    """The tracked values as they were before the pending flush."""
+    attrs = inspect(target).attrs
+    state = {}
+    for field in TRACKED_FIELDS:
+        history = attrs[field].history
+        state[field] = history.deleted[0] if history.deleted else getattr(target, field)
+    return state
+
+def refresh_last_review_at(connection, business_id):
+    """Re-read the newest review time; an index seek on (business_id, created_at)."""
+    newest = select(func.max(review_table.c.created_at))\
+        .where(review_table.c.business_id == business_id)\
+        .scalar_subquery()
+    connection.execute(
+        update(stats_table)
+        .where(stats_table.c.business_id == business_id)
+        .values(last_review_at=newest)
+    )
+
+@event.listens_for(Review, 'after_insert')
+def review_inserted(mapper, connection, target):
+    state = current_state(target)
+    apply_review_delta(connection, state, 1)
+    apply_rollup_delta(connection, state, 1)
+    refresh_last_review_at(connection, state['business_id'])
+
+@event.listens_for(Review, 'after_update')
+def review_updated(mapper, connection, target):
+    attrs = inspect(target).attrs
+    if not any(attrs[field].history.has_changes() for field in TRACKED_FIELDS):
+        return
+    before = previous_state(target)
+    after = current_state(target)
+    apply_review_delta(connection, before, -1)
+    apply_review_delta(connection, after, 1)
+    apply_rollup_delta(connection, before, -1)
+    apply_rollup_delta(connection, after, 1)
+    if attrs['created_at'].history.has_changes() or attrs['business_id'].history.has_changes():
+        refresh_last_review_at(connection, before['business_id'])
+        refresh_last_review_at(connection, after['business_id'])
+
+@event.listens_for(Review, 'after_delete')
+def review_deleted(mapper, connection, target):
+    state = previous_state(target)
+    apply_review_delta(connection, state, -1)
+    apply_rollup_delta(connection, state, -1)
+    refresh_last_review_at(connection, state['business_id'])
+
+def count_where(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+def rebuild_business_stats(connection, business_id):
+    """Recompute a business's aggregates from the review table."""
+    connection.execute(delete(stats_table).where(stats_table.c.business_id == business_id))
+    connection.execute(delete(counter_table).where(counter_table.c.business_id == business_id))
+
+    columns = {
+        'review_count': func.count(review_table.c.id),
+        'rating_sum': func.coalesce(func.sum(review_table.c.rating), 0),
+        'last_review_at': func.max(review_table.c.created_at)
+    }
+    for rating in RATINGS:
+        columns[f'rating_{rating}'] = count_where(review_table.c.rating == rating)
+    for status in STATUSES:
+        columns[f'status_{status}'] = count_where(review_table.c.status == status)
+    for priority in PRIORITIES:
+        columns[f'priority_{priority}'] = count_where(review_table.c.priority == priority)
+    for sentiment in SENTIMENTS:
+        columns[f'sentiment_{sentiment}'] = count_where(review_table.c.sentiment == sentiment)
+
+    row = connection.execute(
+        select(*[expression.label(name) for name, expression in columns.items()])
+        .where(review_table.c.business_id == business_id)
+    ).mappings().one()
+    connection.execute(insert(stats_table).values(business_id=business_id, **dict(row)))
+
+    counters = []
+    sources = connection.execute(
+        select(review_table.c.source, func.count(), func.sum(review_table.c.rating))
+        .where(review_table.c.business_id == business_id, review_table.c.source.isnot(None))
+        .group_by(review_table.c.source)
+    )
+    for source, count, rating_sum in sources:
+        counters.append({'business_id': business_id, 'dimension': 'source', 'key': source,
+                         'count': count, 'rating_sum': rating_sum or 0})
+
+    tag_counts = Counter()
+    tag_ratings = Counter()
+    tagged = connection.execute(
+        select(review_table.c.tags, review_table.c.rating)
+        .where(review_table.c.business_id == business_id, review_table.c.tags.isnot(None))
+    )
+    for tags, rating in tagged:
+        for tag in set(tags or []):
+            tag_counts[str(tag)] += 1
+            tag_ratings[str(tag)] += rating or 0
+    for tag, count in tag_counts.items():
+        counters.append({'business_id': business_id, 'dimension': 'tag', 'key': tag,
+                         'count': count, 'rating_sum': tag_ratings[tag]})
+
+    if counters:
+        connection.execute(insert(counter_table), counters)
+
+def rebuild_daily_rollups(connection, business_id):
+    """Recompute a business's daily rollup buckets from the review table."""
+    connection.execute(delete(rollup_table).where(rollup_table.c.business_id == business_id))
+
+    day = func.date(review_table.c.created_at)
+    source = func.coalesce(review_table.c.source, '')
+    columns = [
+        day.label('day'),
+        source.label('source'),
+        func.count(review_table.c.id).label('review_count'),
+        func.coalesce(func.sum(review_table.c.rating), 0).label('rating_sum')
+    ]
+    for sentiment in SENTIMENTS:
+        columns.append(count_where(review_table.c.sentiment == sentiment).label(f'sentiment_{sentiment}'))
+
+    rows = []
+    for row in connection.execute(
+        select(*columns)
+        .where(review_table.c.business_id == business_id, review_table.c.created_at.isnot(None))
+        .group_by(day, source)
+    ).mappings():
+        row = dict(row, business_id=business_id)
+        if isinstance(row['day'], str):
+            row['day'] = date.fromisoformat(row['day'])
+        rows.append(row)
+    if rows:
+        connection.execute(insert(rollup_table), rows)
+
+def get_business_stats(business_id):
+    """Return the BusinessStats row, building it first if it does not exist yet."""
+    stats = db.session.get(BusinessStats, business_id)
+    if stats is None:
+        rebuild_business_stats(db.session.connection(), business_id)
+        db.session.commit()
+        stats = db.session.get(BusinessStats, business_id)
+    return stats
+
+def get_all_business_stats():
+    """BusinessStats for every business keyed by business id, building any that are missing."""
+    stats = {row.business_id: row for row in BusinessStats.query.all()}
+    missing = [business_id for (business_id,) in db.session.query(Business.id).all()
+               if business_id not in stats]
+    if missing:
+        connection = db.session.connection()
+        for business_id in missing:
+            rebuild_business_stats(connection, business_id)
+        db.session.commit()
+        stats = {row.business_id: row for row in BusinessStats.query.all()}
+    return stats
+
+def top_counters(business_id, dimension, limit=None):
+    """Counters of one dimension, most frequent first."""
+    query = BusinessStatCounter.query.filter(
+        BusinessStatCounter.business_id == business_id,
+        BusinessStatCounter.dimension == dimension,
+        BusinessStatCounter.count > 0
+    ).order_by(BusinessStatCounter.count.desc(), BusinessStatCounter.key)
+    if limit:
+        query = query.limit(limit)
+    return query.all()
+
+def rebuild_all(business_ids=None):
+    """Rebuild aggregates and daily rollups for the given businesses, or for all of them."""
+    if not business_ids:
+        business_ids = [business_id for (business_id,) in db.session.query(Business.id).all()]
+    connection = db.session.connection()
+    for business_id in business_ids:
+        rebuild_business_stats(connection, business_id)
+        rebuild_daily_rollups(connection, business_id)
+    db.session.commit()
+    return business_ids
+
+if __name__ == '__main__':
+    import sys
+    from app import app
+
+    with app.app_context():
+        db.create_all()
+        rebuilt = rebuild_all([int(arg) for arg in sys.argv[1:]])
+        print(f"Rebuilt review statistics and daily rollups for {len(rebuilt)} businesses")
@@ -0,0 +1,28 @@
+import os
+from flask import current_app
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+
+# Long enough to fill in the follow-up forms, short enough that a leaked token goes stale
+REVIEW_TOKEN_MAX_AGE = int(os.getenv('REVIEW_TOKEN_MAX_AGE', 3600))
+
+class InvalidReviewToken(ValueError):
+    pass
+
+def _serializer():
+    return URLSafeTimedSerializer(current_app.secret_key, salt='review-token')
+
+def issue_review_token(review_id, business_id):
+    """Signed token that lets the submitter add follow-up details to this review only."""
+    return _serializer().dumps([review_id, business_id])
+
+def read_review_token(token, max_age=REVIEW_TOKEN_MAX_AGE):
+    """Return (review_id, business_id) from a token, or raise InvalidReviewToken."""
+    if not token:
+        raise InvalidReviewToken('missing review token')
+    try:
+        review_id, business_id = _serializer().loads(token, max_age=max_age)
+        return int(review_id), int(business_id)
+    except SignatureExpired:
+        raise InvalidReviewToken('review token expired')
+    except (BadSignature, TypeError, ValueError) as e:
+        raise InvalidReviewToken(str(e))
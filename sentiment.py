@@ -0,0 +1,329 @@
+import hashlib
+import json
+import os
+import time
+import openai
+import local_sentiment
+from metrics import openai_request_seconds, openai_retries, sentiment_fallbacks
+from sentiment_cache import SentimentCache, DEFAULT_DB_PATH
+from openai_governor import OpenAIGovernor, GovernorTimeout, DEFAULT_DB_PATH as GOVERNOR_DB_PATH
+
+# Host-wide OpenAI budget, shared by every web and worker process
+MAX_REQUESTS_PER_MINUTE = int(os.getenv('OPENAI_MAX_REQUESTS_PER_MINUTE', 50))  # Adjust based on your OpenAI plan
+MAX_TOKENS_PER_MINUTE = int(os.getenv('OPENAI_MAX_TOKENS_PER_MINUTE', 40000))
+MAX_CONCURRENT_REQUESTS = int(os.getenv('OPENAI_MAX_CONCURRENCY', 4))
+OPENAI_QUEUE_TIMEOUT = float(os.getenv('OPENAI_QUEUE_TIMEOUT', 30))  # seconds a caller waits for capacity
+RATE_LIMIT_PAUSE = 2  # seconds every process holds off after a 429, times the attempt number
+
+SENTIMENT_VALUES = ('positive', 'neutral', 'negative')
+PENDING_SENTIMENT = 'pending'
+
+SENTIMENT_MODEL = "gpt-3.5-turbo"
+SENTIMENT_PROMPT = "You are a sentiment analysis expert. Analyze the following review and respond with ONLY one word: 'positive', 'neutral', or 'negative'."
+
+# Batched classification packs several reviews into one chat completion
+BATCH_PROMPT = "You are a sentiment analysis expert. You will receive numbered reviews. Respond with ONLY a JSON object mapping each review number to 'positive', 'neutral', or 'negative', for example {\"1\": \"positive\", \"2\": \"negative\"}."
+SENTIMENT_BATCH_SIZE = int(os.getenv('SENTIMENT_BATCH_SIZE', 20))
+SENTIMENT_BATCH_TOKEN_BUDGET = int(os.getenv('SENTIMENT_BATCH_TOKEN_BUDGET', 2000))  # prompt tokens per request
+BATCH_ITEM_OVERHEAD_TOKENS = 4  # the "12. " prefix and separator of each item
+BATCH_RESPONSE_TOKENS_PER_ITEM = 6  # '"12": "negative", '
+
+# Cached results are only reused while the model and both prompts stay the same;
+# single and batch answers share the cache
+PROMPT_VERSION = hashlib.sha256(
+    f"{SENTIMENT_MODEL}\n{SENTIMENT_PROMPT}\n{BATCH_PROMPT}".encode('utf-8')
+).hexdigest()[:12]
+
+# 'hybrid' answers locally when the lexicon model is confident and asks OpenAI otherwise;
+# 'local' never calls OpenAI and 'remote' never uses the local model
+SENTIMENT_ENGINE = os.getenv('SENTIMENT_ENGINE', 'hybrid')
+LOCAL_SENTIMENT_MIN_CONFIDENCE = float(os.getenv('LOCAL_SENTIMENT_MIN_CONFIDENCE', 0.7))
+
+sentiment_cache = SentimentCache(
+    PROMPT_VERSION,
+    max_entries=int(os.getenv('SENTIMENT_CACHE_SIZE', 10000)),
+    ttl=int(os.getenv('SENTIMENT_CACHE_TTL', 7 * 24 * 3600)),
+    db_path=os.getenv('SENTIMENT_CACHE_DB', DEFAULT_DB_PATH) or None  # empty disables the SQLite tier
+)
+
+openai_governor = OpenAIGovernor(
+    os.getenv('OPENAI_GOVERNOR_DB', GOVERNOR_DB_PATH),
+    requests_per_minute=MAX_REQUESTS_PER_MINUTE,
+    tokens_per_minute=MAX_TOKENS_PER_MINUTE,
+    max_concurrency=MAX_CONCURRENT_REQUESTS,
+    timeout=OPENAI_QUEUE_TIMEOUT
+)
+
+def rating_sentiment(rating):
+    """Rating-only sentiment, used as a provisional answer and as the last-resort fallback."""
+    if rating >= 4:
+        return 'positive'
+    elif rating <= 2:
+        return 'negative'
+    return 'neutral'
+
+def review_priority(rating, sentiment):
+    """Priority for a review once its sentiment is known."""
+    if rating <= 2 or sentiment == 'negative':
+        return 'high'
+    return 'normal'
+
+def local_sentiment_answer(feedback):
+    """Return the local model's sentiment when the engine settings allow using it, else None."""
+    if SENTIMENT_ENGINE == 'remote':
+        return None
+    sentiment, confidence = local_sentiment.classify(feedback)
+    if SENTIMENT_ENGINE == 'local' or confidence >= LOCAL_SENTIMENT_MIN_CONFIDENCE:
+        return sentiment
+    return None
+
+def provisional_sentiment(rating, feedback):
+    """Fast sentiment for routing a submission before the final answer is known."""
+    if SENTIMENT_ENGINE == 'remote':
+        return rating_sentiment(rating)
+    sentiment, confidence = local_sentiment.classify(feedback)
+    if confidence >= LOCAL_SENTIMENT_MIN_CONFIDENCE:
+        return sentiment
+    return rating_sentiment(rating)
+
+def classify_sentiment(feedback):
+    """Classify feedback locally or with OpenAI. Raises if no valid answer could be obtained."""
+    local = local_sentiment_answer(feedback)
+    if local is not None:
+        return local
+
+    cached = sentiment_cache.get(feedback)
+    if cached is not None:
+        return cached
+
+    if not os.getenv('OPENAI_API_KEY'):
+        raise ValueError("OpenAI API key is required for sentiment analysis")
+
+    max_retries = 3
+    # Prompt, review and the one-token answer, for the tokens-per-minute budget
+    tokens = estimate_tokens(SENTIMENT_PROMPT) + estimate_tokens(feedback) + 1
+
+    for attempt in range(max_retries):
+        try:
+            # Waits in line for OpenAI capacity; raises GovernorTimeout past the deadline
+            with openai_governor.permit(tokens) as permit:
+                response = create_completion(
+                    'single',
+                    model=SENTIMENT_MODEL,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": SENTIMENT_PROMPT
+                        },
+                        {
+                            "role": "user",
+                            "content": feedback
+                        }
+                    ],
+                    temperature=0,
+                    max_tokens=1,
+                    timeout=10  # 10 second timeout
+                )
+                record_usage(permit, response)
+
+            sentiment = response.choices[0].message.content.strip().lower()
+
+            # Validate sentiment value
+            if sentiment not in SENTIMENT_VALUES:
+                print(f"WARNING: Invalid sentiment '{sentiment}' from OpenAI, retrying...")
+                raise ValueError("Invalid sentiment value")
+
+            sentiment_cache.set(feedback, sentiment)
+            return sentiment
+
+        except openai.RateLimitError:
+            print(f"WARNING: OpenAI rate limit hit, attempt {attempt + 1}/{max_retries}")
+            if attempt < max_retries - 1:
+                openai_retries.inc(reason='rate_limited')
+                openai_governor.pause(RATE_LIMIT_PAUSE * (attempt + 1))  # every process backs off
+            else:
+                raise
+
+        except openai.APITimeoutError:
+            print(f"WARNING: OpenAI API timeout, attempt {attempt + 1}/{max_retries}")
+            if attempt == max_retries - 1:
+                raise
+            openai_retries.inc(reason='timeout')
+
+        except ValueError as e:
+            print(f"WARNING: OpenAI returned invalid data, attempt {attempt + 1}/{max_retries}")
+            if attempt == max_retries - 1:
+                raise
+            openai_retries.inc(reason='invalid_answer')
+
+def create_completion(kind, **params):
+    """openai.chat.completions.create, timed for the metrics by kind and outcome."""
+    started = time.perf_counter()
+    outcome = 'error'
+    try:
+        response = openai.chat.completions.create(**params)
+        outcome = 'ok'
+        return response
+    except openai.RateLimitError:
+        outcome = 'rate_limited'
+        raise
+    except openai.APITimeoutError:
+        outcome = 'timeout'
+        raise
+    finally:
+        openai_request_seconds.observe(time.perf_counter() - started, kind=kind, outcome=outcome)
+
+def record_usage(permit, response):
+    """Charge the governor with the tokens OpenAI reports instead of the estimate."""
+    usage = getattr(response, 'usage', None)
+    if usage is not None and getattr(usage, 'total_tokens', None):
+        permit.record_usage(usage.total_tokens)
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token) for budgeting batches."""
+    return len(text) // 4 + 1
+
+def plan_batches(texts, batch_size=None, token_budget=None):
+    """Split texts into lists of indexes bounded by item count and prompt tokens."""
+    batch_size = batch_size or SENTIMENT_BATCH_SIZE
+    token_budget = token_budget or SENTIMENT_BATCH_TOKEN_BUDGET
+    batch = []
+    batch_tokens = estimate_tokens(BATCH_PROMPT)
+    for index, text in enumerate(texts):
+        tokens = estimate_tokens(text) + BATCH_ITEM_OVERHEAD_TOKENS
+        if batch and (len(batch) >= batch_size or batch_tokens + tokens > token_budget):
+            yield batch
+            batch = []
+            batch_tokens = estimate_tokens(BATCH_PROMPT)
+        batch.append(index)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+def parse_batch_response(content, count):
+    """Parse a batch answer into {item_number: sentiment}.
+
+    Only items with a well-formed number and a valid label are returned; the
+    caller re-classifies anything missing on its own.
+    """
+    try:
+        data = json.loads(content)
+    except (TypeError, ValueError):
+        return {}
+    if not isinstance(data, dict):
+        return {}
+
+    labels = {}
+    for key, value in data.items():
+        try:
+            number = int(key)
+        except (TypeError, ValueError):
+            continue
+        if not 1 <= number <= count or not isinstance(value, str):
+            continue
+        value = value.strip().lower()
+        if value in SENTIMENT_VALUES:
+            labels[number] = value
+    return labels
+
+def request_batch(texts):
+    """Classify several texts in one chat completion. Returns {item_number: sentiment}."""
+    if not os.getenv('OPENAI_API_KEY'):
+        raise ValueError("OpenAI API key is required for sentiment analysis")
+
+    numbered = "\n".join(f"{number}. {' '.join(text.split())}" for number, text in enumerate(texts, 1))
+    max_tokens = len(texts) * BATCH_RESPONSE_TOKENS_PER_ITEM + 10
+    tokens = estimate_tokens(BATCH_PROMPT) + estimate_tokens(numbered) + max_tokens
+    with openai_governor.permit(tokens) as permit:
+        try:
+            response = create_completion(
+                'batch',
+                model=SENTIMENT_MODEL,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": BATCH_PROMPT
+                    },
+                    {
+                        "role": "user",
+                        "content": numbered
+                    }
+                ],
+                temperature=0,
+                max_tokens=max_tokens,
+                timeout=30
+            )
+        except openai.RateLimitError:
+            openai_governor.pause(RATE_LIMIT_PAUSE)
+            raise
+        record_usage(permit, response)
+    return parse_batch_response(response.choices[0].message.content, len(texts))
+
+def classify_sentiments(texts, batch_size=None, token_budget=None, before_call=None):
+    """Classify many texts with as few OpenAI calls as possible.
+
+    Confident local answers and cached texts never reach OpenAI, identical
+    texts are sent once, and the rest are packed into batches. Items a batch
+    fails to label fall back to a single classify_sentiment call, unless the
+    governor has already timed out. Returns a list aligned with texts where
+    items that could not be classified at all are None.
+
+    before_call, if given, runs before each OpenAI request; the outbox worker
+    renews its lease there.
+    """
+    results = [None] * len(texts)
+
+    # Group indexes by cache key so duplicates cost one classification
+    pending = {}
+    for index, text in enumerate(texts):
+        local = local_sentiment_answer(text)
+        if local is not None:
+            results[index] = local
+            continue
+        cached = sentiment_cache.get(text)
+        if cached is not None:
+            results[index] = cached
+        else:
+            pending.setdefault(sentiment_cache.key(text), []).append(index)
+
+    unique = [indexes[0] for indexes in pending.values()]
+    unique_texts = [texts[index] for index in unique]
+    labels = [None] * len(unique)
+
+    saturated = False  # once the governor times out, further calls would only queue behind it
+    for batch in plan_batches(unique_texts, batch_size, token_budget):
+        if saturated:
+            break
+        if before_call:
+            before_call()
+        try:
+            answers = request_batch([unique_texts[i] for i in batch])
+        except GovernorTimeout as e:
+            print(f"WARNING: No OpenAI capacity for {len(batch)} reviews: {e}")
+            saturated = True
+            answers = {}
+        except Exception as e:
+            print(f"WARNING: Batch sentiment request for {len(batch)} reviews failed: {e}")
+            answers = {}
+        for number, i in enumerate(batch, 1):
+            if number in answers:
+                labels[i] = answers[number]
+                sentiment_cache.set(unique_texts[i], answers[number])
+
+    for i, text in enumerate(unique_texts):
+        if labels[i] is None and not saturated:
+            sentiment_fallbacks.inc(fallback='single_request')
+            if before_call:
+                before_call()
+            try:
+                labels[i] = classify_sentiment(text)
+            except GovernorTimeout as e:
+                print(f"WARNING: No OpenAI capacity: {e}")
+                saturated = True
+            except Exception as e:
+                print(f"WARNING: Sentiment classification failed: {e}")
+
+    for i, indexes in enumerate(pending.values()):
+        for index in indexes:
+            results[index] = labels[i]
+    return results
@@ -0,0 +1,151 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'sentiment_cache.db')
+PURGE_INTERVAL = 3600  # seconds between sweeps of expired rows from the SQLite tier
+
+def normalize_text(text):
+    """Collapse case and whitespace so trivially different texts share an entry."""
+    return ' '.join((text or '').lower().split())
+
+class SentimentCache:
+    """Two-tier cache of sentiment results keyed by normalized text and prompt version.
+
+    The first tier is an in-process LRU with a size limit and TTL. The second
+    tier is a SQLite table that survives restarts and is shared by every
+    process on the host. Rows older than persistent_ttl are deleted by a sweep
+    that writes run at most once per PURGE_INTERVAL. Pass ``db_path=None`` to
+    keep the cache in memory only.
+    """
+
+    def __init__(self, version, max_entries=10000, ttl=7 * 24 * 3600,
+                 persistent_ttl=90 * 24 * 3600, db_path=DEFAULT_DB_PATH):
+        self.version = version
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.persistent_ttl = persistent_ttl
+        self.db_path = db_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self._next_purge = 0  # time.monotonic() after which set() sweeps expired rows
+
+    def key(self, text):
+        payload = f"{self.version}\n{normalize_text(text)}".encode('utf-8')
+        return hashlib.sha256(payload).hexdigest()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            if self.db_path != ':memory:':
+                os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS sentiment_cache ('
+                'key TEXT PRIMARY KEY, sentiment TEXT NOT NULL, created_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_sentiment_cache_created_at ON sentiment_cache (created_at)')
+            self._local.conn = conn
+        return conn
+
+    def _remember(self, key, sentiment, stored_at):
+        with self._lock:
+            self._entries[key] = (sentiment, stored_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, text):
+        """Return the cached sentiment for text, or None."""
+        key = self.key(text)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry[1] < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[0]
+                del self._entries[key]
+
+        if self.db_path:
+            try:
+                row = self._connection().execute(
+                    'SELECT sentiment, created_at FROM sentiment_cache WHERE key = ?', (key,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                print(f"WARNING: Sentiment cache lookup failed: {e}")
+                row = None
+            if row and now - row[1] < self.persistent_ttl:
+                self._remember(key, row[0], now)
+                with self._lock:
+                    self.persistent_hits += 1
+                return row[0]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, text, sentiment):
+        key = self.key(text)
+        now = time.time()
+        self._remember(key, sentiment, now)
+        if self.db_path:
+            try:
+                conn = self._connection()
+                conn.execute(
+                    'INSERT OR REPLACE INTO sentiment_cache (key, sentiment, created_at) VALUES (?, ?, ?)',
+                    (key, sentiment, now)
+                )
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"WARNING: Sentiment cache write failed: {e}")
+            if time.monotonic() >= self._next_purge:
+                self._next_purge = time.monotonic() + PURGE_INTERVAL
+                self.purge_expired()
+
+    def purge_expired(self):
+        """Delete rows older than persistent_ttl from the SQLite tier. Returns the number deleted."""
+        if not self.db_path:
+            return 0
+        try:
+            conn = self._connection()
+            deleted = conn.execute('DELETE FROM sentiment_cache WHERE created_at < ?',
+                                   (time.time() - self.persistent_ttl,)).rowcount
+            conn.commit()
+            return deleted
+        except sqlite3.Error as e:
+            print(f"WARNING: Sentiment cache purge failed: {e}")
+            return 0
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.db_path:
+            conn = self._connection()
+            conn.execute('DELETE FROM sentiment_cache')
+            conn.commit()
+
+    def stats(self):
+        """Hit/miss counters and sizes for sizing the cache."""
+        with self._lock:
+            lookups = self.memory_hits + self.persistent_hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'persistent_hits': self.persistent_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.memory_hits + self.persistent_hits) / lookups, 4) if lookups else 0.0,
+                'memory_entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'version': self.version
+            }
@@ -0,0 +1,233 @@
+import argparse
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import or_, and_
+from models import db, Review, SentimentJob
+from sentiment import (classify_sentiments, provisional_sentiment, review_priority, PENDING_SENTIMENT,
+                       SENTIMENT_BATCH_SIZE)
+from metrics import sentiment_jobs, sentiment_fallbacks
+
+# 'processing' jobs older than this were abandoned by a dead worker. A live worker
+# renews its lease before each OpenAI call, and one call (governor wait, client
+# retries and classify_sentiment's own attempts) stays well below it.
+LEASE_SECONDS = 600
+LEASE_RENEW_AFTER = LEASE_SECONDS // 4
+BASE_RETRY_DELAY = 5  # seconds
+MAX_RETRY_DELAY = 900  # seconds
+# Failed jobs are retried until they succeed; from this attempt on, a review still
+# pending shows the provisional sentiment meanwhile
+PROVISIONAL_AFTER = int(os.getenv('SENTIMENT_PROVISIONAL_AFTER', 3))
+
+def enqueue_sentiment_job(review):
+    """Add an outbox entry for the review to the current session.
+
+    The job is committed in the same transaction as the review, so a stored
+    review always has its classification work recorded.
+    """
+    job = SentimentJob(review=review)
+    db.session.add(job)
+    return job
+
+def retry_delay(attempts):
+    """Exponential backoff for failed classifications, capped at MAX_RETRY_DELAY."""
+    return min(BASE_RETRY_DELAY * 2 ** max(attempts - 1, 0), MAX_RETRY_DELAY)
+
+def claim_jobs(limit=1):
+    """Claim up to limit runnable jobs for this worker.
+
+    Claiming is a compare-and-set UPDATE, so several threads or processes can
+    drain the same outbox without handing out a job twice.
+    """
+    now = datetime.utcnow()
+    stale_before = now - timedelta(seconds=LEASE_SECONDS)
+    candidates = SentimentJob.query.filter(or_(
+        and_(SentimentJob.status == 'queued', SentimentJob.next_attempt_at <= now),
+        and_(SentimentJob.status == 'processing', SentimentJob.locked_at < stale_before)
+    )).order_by(SentimentJob.next_attempt_at).limit(limit * 2).all()
+
+    claimed_ids = []
+    for job in candidates:
+        claimed = SentimentJob.query.filter_by(
+            id=job.id,
+            status=job.status,
+            locked_at=job.locked_at
+        ).update({'status': 'processing', 'locked_at': now}, synchronize_session=False)
+        if claimed:
+            claimed_ids.append(job.id)
+            if len(claimed_ids) >= limit:
+                break
+    db.session.commit()
+    if not claimed_ids:
+        return []
+    return SentimentJob.query.filter(SentimentJob.id.in_(claimed_ids)).all()
+
+class Lease:
+    """The claim a worker holds on its jobs, identified by their locked_at."""
+
+    def __init__(self, jobs):
+        self.ids = [job.id for job in jobs]
+        self.locked_at = jobs[0].locked_at if jobs else None
+
+    def held(self, job_id):
+        return SentimentJob.query.filter_by(id=job_id, status='processing', locked_at=self.locked_at)
+
+    def renew(self):
+        """Push locked_at forward so another worker does not reclaim the jobs mid-batch."""
+        now = datetime.utcnow()
+        if not self.ids or (now - self.locked_at).total_seconds() < LEASE_RENEW_AFTER:
+            return
+        SentimentJob.query.filter(
+            SentimentJob.id.in_(self.ids),
+            SentimentJob.status == 'processing',
+            SentimentJob.locked_at == self.locked_at
+        ).update({'locked_at': now})
+        db.session.commit()
+        self.locked_at = now
+
+def process_jobs(jobs):
+    """Classify the jobs' reviews in batches and store the results.
+
+    Returns the number of jobs that completed. Completed jobs are deleted in
+    the same commit that stores the sentiment, so the outbox only holds work
+    still to do. Jobs whose review could not be classified are re-queued with
+    a capped backoff, however long OpenAI stays unavailable. Every write is
+    conditioned on the lease still being held, so a job reclaimed by another
+    worker is left to that worker.
+    """
+    lease = Lease(jobs)
+    review_ids = {job.id: job.review_id for job in jobs}
+    reviews = {review.id: review for review in Review.query.filter(Review.id.in_(review_ids.values())).all()}
+
+    runnable = [job_id for job_id, review_id in review_ids.items() if review_id in reviews]
+    sentiments = classify_sentiments([reviews[review_ids[job_id]].text or '' for job_id in runnable],
+                                     before_call=lease.renew)
+    results = dict(zip(runnable, sentiments))
+
+    now = datetime.utcnow()
+    completed = 0
+    retried = 0
+    for job_id, review_id in review_ids.items():
+        review = reviews.get(review_id)
+        sentiment = results.get(job_id)
+        if review is None or sentiment is not None:
+            # Classified, or the review was deleted and nothing is left to classify
+            if not lease.held(job_id).delete():
+                continue
+            completed += 1
+            if review is not None:
+                review.sentiment = sentiment
+                if review.priority != 'urgent':
+                    review.priority = review_priority(review.rating, sentiment)
+            continue
+
+        attempts = (db.session.get(SentimentJob, job_id).attempts or 0) + 1
+        if not lease.held(job_id).update({
+            'status': 'queued',
+            'attempts': attempts,
+            'locked_at': None,
+            'last_error': 'Sentiment classification failed',
+            'next_attempt_at': now + timedelta(seconds=retry_delay(attempts))
+        }):
+            continue
+        print(f"WARNING: Sentiment job {job_id} failed (attempt {attempts}), retrying later")
+        retried += 1
+        if attempts >= PROVISIONAL_AFTER and review.sentiment == PENDING_SENTIMENT:
+            review.sentiment = provisional_sentiment(review.rating, review.text or '')
+            sentiment_fallbacks.inc(fallback='provisional')
+    db.session.commit()
+    sentiment_jobs.inc(completed, outcome='done')
+    sentiment_jobs.inc(retried, outcome='retry')
+    return completed
+
+def requeue_failed_jobs():
+    """Queue jobs that earlier versions gave up on as 'failed'. Returns the number requeued."""
+    requeued = SentimentJob.query.filter_by(status='failed').update(
+        {'status': 'queued', 'next_attempt_at': datetime.utcnow(), 'completed_at': None},
+        synchronize_session=False)
+    db.session.commit()
+    return requeued
+
+def run_next_batch(app, batch_size=None):
+    """Claim and process one batch of jobs. Returns False when the outbox is empty."""
+    with app.app_context():
+        try:
+            jobs = claim_jobs(batch_size or SENTIMENT_BATCH_SIZE)
+            if not jobs:
+                return False
+            process_jobs(jobs)
+            return True
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error in sentiment worker: {e}")
+            return False
+
+class SentimentWorkerPool:
+    """Background threads that drain the sentiment outbox."""
+
+    def __init__(self, app, workers=None, poll_interval=2.0):
+        self.app = app
+        self.workers = int(os.getenv('SENTIMENT_WORKERS', 2)) if workers is None else workers
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        """Start the worker threads once per process (also after a fork)."""
+        if self._threads and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._threads and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stopping.clear()
+            self._threads = []
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'sentiment-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def notify(self):
+        """Wake idle workers because new jobs were committed."""
+        self._wakeup.set()
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _run(self):
+        while not self._stopping.is_set():
+            if not run_next_batch(self.app):
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+if __name__ == '__main__':
+    from app import app
+
+    # SENTIMENT_WORKERS is usually 0 when this runs, to keep the web processes from classifying
+    parser = argparse.ArgumentParser(description='Drain the sentiment outbox in a separate process.')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('SENTIMENT_WORKER_THREADS', 2)),
+                        help='worker threads (default: SENTIMENT_WORKER_THREADS or 2)')
+    parser.add_argument('--requeue-failed', action='store_true', help="first queue jobs marked 'failed' again")
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error('--workers must be at least 1')
+
+    if args.requeue_failed:
+        with app.app_context():
+            print(f"Requeued {requeue_failed_jobs()} failed jobs")
+    pool = SentimentWorkerPool(app, workers=args.workers)
+    pool.ensure_started()
+    print(f"Sentiment worker running with {pool.workers} threads. Press Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pool.stop()
@@ -79,7 +79,7 @@ document.addEventListener('DOMContentLoaded', function() {
             if (!isValid) return;
 
             try {
-                const response = await fetch('/submit_review', {
+                const response = await fetch(reviewForm.dataset.action || '/submit_review', {
                     method: 'POST',
                     headers: {
                         'Content-Type': 'application/json',
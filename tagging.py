@@ -0,0 +1,174 @@
+"""Keyword tagging of review text.
+
+A taxonomy maps each tag to the words and phrases that indicate it, e.g.
+``{"pricing": ["price", "expensive", "too much"]}``. The tag name itself
+also counts as a keyword. A taxonomy is compiled once into hash tables of
+words and phrases, and a review is tagged by splitting its text into words
+in one regex pass and looking them up, so the cost does not grow with the
+number of keywords. Matching is by whole words, so "time" no longer
+matches inside "sometimes". Businesses can override the default taxonomy
+through Business.tag_taxonomy.
+
+Usage:
+    python tagging.py retag [business_id ...]
+    python tagging.py set-taxonomy BUSINESS_ID taxonomy.json
+"""
+import json
+import re
+from functools import lru_cache
+from sqlalchemy import select, update, bindparam
+
+DEFAULT_TAXONOMY = {
+    'service': ['staff', 'friendly', 'rude', 'helpful', 'customer service'],
+    'quality': ['professional', 'thorough', 'painless', 'gentle', 'botched'],
+    'pricing': ['price', 'prices', 'expensive', 'cost', 'costs', 'costly', 'overpriced',
+                'affordable', 'bill', 'billing', 'insurance'],
+    'timing': ['wait', 'waited', 'waiting', 'time', 'late', 'delay', 'delayed', 'on time',
+               'appointment', 'schedule', 'rescheduled'],
+}
+
+RETAG_CHUNK_SIZE = 1000
+
+def rating_tag(rating):
+    if rating >= 4:
+        return 'positive'
+    if rating <= 2:
+        return 'negative'
+    return 'neutral'
+
+WORD_RE = re.compile(r"\w+(?:'\w+)*")
+
+def tokenize(text):
+    return WORD_RE.findall(text.lower())
+
+class Tagger:
+    """A taxonomy compiled into word and phrase lookup tables."""
+
+    def __init__(self, taxonomy):
+        self.tag_order = list(taxonomy)
+        self.word_tags = {}  # single word -> tags
+        self.phrases = {}  # first word -> [(remaining words, tags)]
+        phrase_tags = {}
+        for tag, keywords in taxonomy.items():
+            for keyword in [tag, *keywords]:
+                words = tuple(tokenize(keyword))
+                if len(words) == 1:
+                    self.word_tags.setdefault(words[0], set()).add(tag)
+                elif words:
+                    phrase_tags.setdefault(words, set()).add(tag)
+        for words, tags in phrase_tags.items():
+            self.phrases.setdefault(words[0], []).append((words[1:], tags))
+        self.first_words = set(self.word_tags) | set(self.phrases)
+
+    def match(self, text):
+        """Taxonomy tags found in text, in taxonomy order."""
+        if not text:
+            return []
+        words = tokenize(text)
+        present = self.first_words.intersection(words)
+        if not present:
+            return []
+        found = set()
+        for word in present:
+            found.update(self.word_tags.get(word, ()))
+        if any(word in self.phrases for word in present):
+            for index, word in enumerate(words):
+                for rest, tags in self.phrases.get(word, ()):
+                    if tuple(words[index + 1:index + 1 + len(rest)]) == rest:
+                        found.update(tags)
+        return [tag for tag in self.tag_order if tag in found]
+
+    def tag(self, text, rating):
+        """The rating tag followed by the taxonomy tags found in text."""
+        return [rating_tag(rating), *self.match(text)]
+
+@lru_cache(maxsize=256)
+def _compiled(taxonomy_json):
+    return Tagger(json.loads(taxonomy_json))
+
+def get_tagger(taxonomy=None):
+    """Compiled tagger for a taxonomy, shared by every caller with the same one."""
+    return _compiled(json.dumps(taxonomy or DEFAULT_TAXONOMY, sort_keys=True))
+
+def tagger_for_business(business):
+    return get_tagger(business.tag_taxonomy if business else None)
+
+def retag_business(business, chunk_size=RETAG_CHUNK_SIZE):
+    """Recompute tags for all of a business's reviews; returns the number of reviews changed.
+
+    Reviews are read in id order one chunk at a time and only changed rows
+    are written back, with one executemany per chunk.
+    """
+    from models import db, Review
+    from review_stats import rebuild_business_stats
+
+    tagger = tagger_for_business(business)
+    review_table = Review.__table__
+    statement = update(review_table)\
+        .where(review_table.c.id == bindparam('review_id'))\
+        .values(tags=bindparam('new_tags'))
+    changed = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(Review.id, Review.text, Review.rating, Review.tags)
+            .where(Review.business_id == business.id, Review.id > last_id)
+            .order_by(Review.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        updates = []
+        for row in rows:
+            tags = tagger.tag(row.text, row.rating)
+            if tags != row.tags:
+                updates.append({'review_id': row.id, 'new_tags': tags})
+        if updates:
+            db.session.execute(statement, updates)
+            db.session.commit()
+            changed += len(updates)
+
+    # Core updates bypass the ORM listeners that maintain the tag counters
+    rebuild_business_stats(db.session.connection(), business.id)
+    db.session.commit()
+    return changed
+
+if __name__ == '__main__':
+    import argparse
+    from app import app
+    from models import db, Business
+
+    parser = argparse.ArgumentParser(description='Review tagging commands.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    retag = commands.add_parser('retag', help='recompute tags for existing reviews')
+    retag.add_argument('business_ids', nargs='*', type=int, help='businesses to retag (default: all)')
+    set_taxonomy = commands.add_parser('set-taxonomy', help="replace a business's taxonomy and retag it")
+    set_taxonomy.add_argument('business_id', type=int)
+    set_taxonomy.add_argument('file', help='JSON object mapping tags to keyword lists, or "default"')
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.command == 'set-taxonomy':
+            business = db.session.get(Business, args.business_id)
+            if not business:
+                parser.error(f"Business {args.business_id} not found")
+            if args.file == 'default':
+                business.tag_taxonomy = None
+            else:
+                with open(args.file) as f:
+                    taxonomy = json.load(f)
+                if not isinstance(taxonomy, dict) or not all(isinstance(v, list) for v in taxonomy.values()):
+                    parser.error("The taxonomy must map each tag to a list of keywords")
+                business.tag_taxonomy = taxonomy
+            db.session.commit()
+            businesses = [business]
+        elif args.business_ids:
+            businesses = [db.session.get(Business, business_id) for business_id in args.business_ids]
+            businesses = [business for business in businesses if business]
+        else:
+            businesses = Business.query.all()
+
+        for business in businesses:
+            changed = retag_business(business)
+            print(f"Retagged {business.name}: {changed} reviews changed")
@@ -0,0 +1,123 @@
+"""In-process cache of the businesses served by the public review pages.
+
+Public pages live under /b/<slug>/ and the unprefixed routes serve the
+default business. Both resolve their tenant from this cache, so the public
+flow needs no business query per request. Every business is loaded in one
+query on first use. The snapshot is dropped whenever a Business row is
+inserted, updated or deleted through the ORM in this process. Other
+processes pick up changes when their copy reaches TENANT_CACHE_TTL.
+"""
+import os
+import re
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, object_session
+from models import db, Business
+from tagging import get_tagger
+
+TENANT_CACHE_TTL = int(os.getenv('TENANT_CACHE_TTL', 60))
+DEFAULT_BUSINESS_SLUG = os.getenv('DEFAULT_BUSINESS_SLUG')  # unprefixed URLs; the oldest business if unset
+
+def slugify(name):
+    """'Keem Smile Dentistry' -> 'keem-smile-dentistry'."""
+    text = unicodedata.normalize('NFKD', name or '').encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-') or 'business'
+
+def unique_slug(connection, name, exclude_id=None, reserved=()):
+    """A slug for name that no other business, nor reserved, uses yet."""
+    base = slugify(name)
+    query = select(Business.slug).where(Business.slug.like(f'{base}%'))
+    if exclude_id is not None:
+        query = query.where(Business.id != exclude_id)
+    taken = set(connection.execute(query).scalars()) | set(reserved)
+    slug, number = base, 2
+    while slug in taken:
+        slug, number = f'{base}-{number}', number + 1
+    return slug
+
+def branding_color(value):
+    """value if it is a hex colour that is safe to put in a stylesheet, else None."""
+    return value if value and re.fullmatch(r'#[0-9a-fA-F]{3}(?:[0-9a-fA-F]{3})?', value) else None
+
+@dataclass(frozen=True)
+class Tenant:
+    """The business fields the public pages need, detached from the session."""
+    id: int
+    slug: str
+    name: str
+    branding_color: str  # None when unset or not a valid hex colour
+    logo_url: str
+    is_active: bool
+    tag_taxonomy: dict
+
+    @property
+    def tagger(self):
+        return get_tagger(self.tag_taxonomy)
+
+class TenantCache:
+
+    def __init__(self, ttl=TENANT_CACHE_TTL, default_slug=DEFAULT_BUSINESS_SLUG):
+        self.ttl = ttl
+        self.default_slug = default_slug
+        self._lock = threading.Lock()
+        self._snapshot = None  # (loaded_at, {slug: Tenant}, default Tenant)
+        self.loads = 0
+
+    def _load(self):
+        businesses = db.session.execute(select(Business).order_by(Business.id)).scalars().all()
+        tenants = {}
+        for business in businesses:
+            tenants[business.slug] = Tenant(
+                business.id, business.slug, business.name, branding_color(business.branding_color),
+                business.logo_url, bool(business.is_active), business.tag_taxonomy
+            )
+        default = tenants.get(self.default_slug) if self.default_slug else None
+        if default is None and tenants:
+            default = next(iter(tenants.values()))
+        self.loads += 1
+        return time.monotonic(), tenants, default
+
+    def _current(self):
+        snapshot = self._snapshot
+        if snapshot is None or time.monotonic() - snapshot[0] > self.ttl:
+            with self._lock:
+                snapshot = self._snapshot
+                if snapshot is None or time.monotonic() - snapshot[0] > self.ttl:
+                    snapshot = self._snapshot = self._load()
+        return snapshot
+
+    def get(self, slug):
+        """The active tenant for slug, or None."""
+        tenant = self._current()[1].get(slug)
+        return tenant if tenant and tenant.is_active else None
+
+    def default(self):
+        return self._current()[2]
+
+    def invalidate(self):
+        self._snapshot = None
+
+tenant_cache = TenantCache()
+
+@event.listens_for(Business, 'before_insert')
+def assign_slug(mapper, connection, target):
+    if not target.slug:
+        # Businesses inserted in the same flush are not in the table yet
+        pending = {obj.slug for obj in object_session(target).new if isinstance(obj, Business) and obj.slug}
+        target.slug = unique_slug(connection, target.name, reserved=pending)
+
+@event.listens_for(Business, 'after_insert')
+@event.listens_for(Business, 'after_update')
+@event.listens_for(Business, 'after_delete')
+def business_changed(mapper, connection, target):
+    tenant_cache.invalidate()
+    # Again after commit, in case another request reloaded the old rows in between
+    object_session(target).info['tenants_changed'] = True
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_after_commit(session):
+    if session.info.pop('tenants_changed', False):
+        tenant_cache.invalidate()
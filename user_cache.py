@@ -0,0 +1,104 @@
+"""In-process cache of logged-in users for Flask-Login.
+
+Flask-Login loads the user on every authenticated request. This cache
+answers from memory in the steady state. It keeps a small immutable
+Principal per user instead of a live ORM object, so nothing is tied to a
+session that has been closed. An entry is dropped when its User row is
+updated or deleted through the ORM in this process. Otherwise it expires
+after USER_CACHE_TTL seconds, which bounds how long another process can
+keep serving a changed role, business or password.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from models import db, User, password_fingerprint
+
+USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 30))
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """The user fields the views read, usable as Flask-Login's current_user."""
+    id: int
+    email: str
+    name: str
+    role: str
+    business_id: int
+    password_fingerprint: str
+
+    is_authenticated = True
+    is_active = True
+    is_anonymous = False
+
+    def get_id(self):
+        return f'{self.id}:{self.password_fingerprint}'
+
+class UserCache:
+
+    def __init__(self, ttl=USER_CACHE_TTL, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # user id -> (loaded_at, Principal)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self, user_id):
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        return Principal(user.id, user.email, user.name, user.role, user.business_id,
+                         password_fingerprint(user.password))
+
+    def get(self, user_id):
+        """The Principal for user_id, or None if there is no such user."""
+        now = time.monotonic()
+        entry = self._entries.get(user_id)
+        if entry is not None and now - entry[0] <= self.ttl:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        principal = self._load(user_id)
+        if principal is not None:
+            with self._lock:
+                self._entries[user_id] = (now, principal)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return principal
+
+    def invalidate(self, user_id=None):
+        """Forget one user, or everyone when user_id is None."""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+user_cache = UserCache()
+
+def load_user(session_id):
+    """Flask-Login user loader for ids made by User.get_id()."""
+    user_id, _, fingerprint = session_id.partition(':')
+    if not user_id.isdigit():
+        return None
+    principal = user_cache.get(int(user_id))
+    # Sessions from before a password change no longer match
+    if principal is None or principal.password_fingerprint != fingerprint:
+        return None
+    return principal
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def user_changed(mapper, connection, target):
+    user_cache.invalidate(target.id)
+    # Again after commit, in case another request reloaded the old row in between
+    object_session(target).info.setdefault('changed_users', set()).add(target.id)
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_after_commit(session):
+    for user_id in session.info.pop('changed_users', ()):
+        user_cache.invalidate(user_id)